@@ -3,30 +3,71 @@ from GraphicsView_GUI import Ui_Form
 import PyQt5.QtGui as qtg
 import PyQt5.QtCore as qtc
 import PyQt5.QtWidgets as qtw
+from PyQt5 import sip
+import collections
+import gc
 import math
 import sys
-import numpy as np
-import scipy as sp
-from scipy import optimize
+from time import perf_counter_ns
+from Linkage_Kinematics import FourBar, FourBarMotionTable
+from Linkage_Profiler import PROFILER
+#endregion
+
+#region constants
+#the fields of a RigidLink's state, in order.  All are float64 so a row can be viewed as a plain array of floats.
+LINK_FIELDS = (('startX', '<f8'), ('startY', '<f8'), ('endX', '<f8'), ('endY', '<f8'), ('length', '<f8'),
+               ('angle', '<f8'))
+#how close, in screen pixels, the mouse has to be to a joint or link to hover over or grab it
+SNAP_PIXELS = 8
+#level of detail: links thinner than LOD_SIMPLE_PIXELS on screen (pivots narrower than it) are drawn without their
+#center line, pivot circles and hatching, and below LOD_LINE_PIXELS as a single line (a dot for a pivot).  This only
+#pays when zoomed far out: a frame of many small items paints about 1.6 times faster at zoom 0.1, and at zoom 0.25 or
+#more it makes no measurable difference (see Linkage_Benchmarks.benchLevelOfDetail), since the per-item paint call
+#costs more than what is left off.
+LOD_SIMPLE_PIXELS = 8
+LOD_LINE_PIXELS = 3
+#half the opening angle of an overlay arrowhead, in radians
+ARROW_HEAD_ANGLE = math.radians(25)
+#the MainWindow attributes saved with a scene file and set again when it is loaded (see saveScene), and the table of
+#the file each comes from
+SCENE_ROLES = {'pivot0': 'pivots', 'pivot1': 'pivots', 'link0': 'links', 'link1': 'links', 'link2': 'links',
+               'link3': 'links'}
+#decoration items added per turn of the event loop by a streaming loadScene
+SCENE_LOAD_BATCH = 10000
 #endregion
 
 #region class definitions
 class RigidLink(qtw.QGraphicsItem):
+    #the attributes are slots rather than entries in the instance __dict__.  sip still gives the wrapper a __dict__ (it
+    #stays empty), so this saves a few hundred bytes a link, not most of it.
+    __slots__ = ('pen', 'brush', 'name', 'radius', 'state', 'store', 'row', 'DX', 'DY', 'rect', 'path', 'outline',
+                 'placement', 'centerLinePen', 'centerLine', 'linePen', 'pivotStart', 'pivotEnd')
+
     def __init__(self, stX, stY, enX, enY, radius=10, parent=None, pen=None, brush=None, name='RigidLink' ):
         """
         This is a custom class for drawing a rigid link.  The paint function executes everytime the scene
-        which holds the link is updated.  The steps to making the link are:
+        which holds the link is updated, so what it draws is built once and cached until the link moves.  The steps
+        to making the link are:
         1. Specify the pen, brush, start and end x,y coordinates of the link and radius by unpacking arguments
-        2. Compute the length and angle of the link (also sets self.DX, self.DY)
-        3. Compute the rectangle that will contain the link (i.e., its bounding box)
-        4. Setup the transformation that will rotate and then translate the link
+        2. Work out the length and angle of the link (see linkAngle)
 
-        *Note:  The paint function is called each time the scene changes.  I draw a link aligned with the x-axis first
-        with the start point at 0,0 and end point at length, 0. Then, the path painter draws the centerline and the
-        start and end pivot points, then the start semicircle, a line to the end semicircle, the end semicircle,
-        and a line back to the start semicircle.  Finally, the link is rotated about 0,0 and then translated to startX,
-        startY.  In this way, the bounding rectangle gets transformed and this helps with detecting the item in the
-        graphics view when the mouse hovers.
+        The end points are properties.  Setting any of them goes through setEndpoints, which tells the scene the
+        geometry is about to change (so its index and the dirty regions stay correct) and drops what was built from
+        the old end points.  Nothing else is done when a link moves: boundingRect works out the rectangle around the
+        link in the scene the next time Qt asks for it, and paint builds the outline path, center line, pivot circles,
+        placement transform and tooltip the next time the link is drawn.  So a link that moves while it is off screen
+        costs a few attribute writes, and one that moves several times between frames is only built once.
+
+        The end points, length and angle are held in state, a row of floats in the order of LINK_FIELDS.  A link on
+        its own keeps them in a list.  A LinkStore keeps the state of many links in one numpy array and makes each
+        link's state a view of its row, so the links can be read and moved all at once (see LinkStore.setEndpoints).
+
+        *Note:  I draw a link aligned with the x-axis first with the start point at 0,0 and end point at length, 0.
+        Then, the path painter draws the centerline and the start and end pivot points, then the start semicircle,
+        a line to the end semicircle, the end semicircle, and a line back to the start semicircle.  Finally, the link
+        is rotated about 0,0 and then translated to startX, startY.  The item itself is not transformed: it is in scene
+        coordinates and paint applies the rotation and translation, so that moving a link never has to set a
+        transform on the item.  shape() maps the outline to the scene for hit tests on the exact link.
 
         :param stX:
         :param stY:
@@ -43,22 +84,153 @@ class RigidLink(qtw.QGraphicsItem):
         self.pen = pen
         self.brush = brush
         self.name = name
-        self.startX = stX
-        self.startY = stY
-        self.endX = enX
-        self.endY = enY
+        self.state = [stX, stY, enX, enY, 0.0, 0.0]
+        self.store = None
+        self.row = None
         self.radius = radius
+        self.rect = None
+        self.path = None
+        self.outline = None
         #step 2
-        self.angle = self.linkAngle()
-        #step 3
-        self.rect=qtc.QRectF(-self.radius, -self.radius,self.length+self.radius, self.radius )
-        #step 4 setup transform
-        self.transform = qtg.QTransform()
-        self.transform.reset()
+        self.linkAngle()
+
+    #region state properties
+    #plain floats whether state is a list or a LinkStore row
+    @property
+    def startX(self):
+        return float(self.state[0])
+
+    @startX.setter
+    def startX(self, value):
+        self.setEndpoints(value, self.state[1], self.state[2], self.state[3])
+
+    @property
+    def startY(self):
+        return float(self.state[1])
+
+    @startY.setter
+    def startY(self, value):
+        self.setEndpoints(self.state[0], value, self.state[2], self.state[3])
+
+    @property
+    def endX(self):
+        return float(self.state[2])
+
+    @endX.setter
+    def endX(self, value):
+        self.setEndpoints(self.state[0], self.state[1], value, self.state[3])
+
+    @property
+    def endY(self):
+        return float(self.state[3])
+
+    @endY.setter
+    def endY(self, value):
+        self.setEndpoints(self.state[0], self.state[1], self.state[2], value)
+
+    @property
+    def length(self):
+        return float(self.state[4])
+
+    @length.setter
+    def length(self, value):
+        self.state[4] = value
+
+    @property
+    def angle(self):
+        return float(self.state[5])
+
+    @angle.setter
+    def angle(self, value):
+        self.state[5] = value
+    #endregion
+
+    def setEndpoints(self, stX, stY, enX, enY):
+        """
+        Moves both ends of the link at once.
+        """
+        self.prepareMove()
+        self.state[0:4] = (stX, stY, enX, enY)
+        self.linkAngle()
+
+    def prepareMove(self):
+        """
+        Tells the scene the geometry is about to change and drops everything built from it, so boundingRect and paint
+        build it again.  Call it before changing the state: the scene has to hear about the change while boundingRect
+        still returns the old rectangle.
+        """
+        self.prepareGeometryChange()
+        self.rect = None
+        self.path = None
+        self.outline = None
+
+    def buildDrawing(self):
+        """
+        Builds everything paint needs from the state: the outline path, center line and pivot circles (all in link
+        coordinates, i.e., aligned with the x-axis), the transform that places them in the scene and the tooltip.
+        """
+        #plain floats from here on (state may be a numpy row)
+        startX, startY, endX, endY, length, angle = (float(v) for v in self.state)
+        r = self.radius
+        #define bounding rectangles for the radiused ends of the link
+        rectSt = qtc.QRectF(-r, -r, 2*r, 2*r)
+        rectEn = qtc.QRectF(length-r, -r, 2*r, 2*r)
+        path = qtg.QPainterPath()
+        path.arcMoveTo(rectSt,90)
+        path.arcTo(rectSt, 90,180)
+        path.lineTo(length,r)
+        path.arcMoveTo(rectEn, 270)
+        path.arcTo(rectEn, 270, 180)
+        path.lineTo(0, -r)
+        #a center line in a faded version of the link color, and what is left of the link when it is only a few
+        #pixels wide (see linkPens)
+        self.centerLinePen, self.linePen = linkPens(self.pen)
+        self.centerLine = qtc.QLineF(0, 0, length, 0)
+        #some circles at the end points
+        self.pivotStart=qtc.QRectF(-r/6, -r/6, r/3, r/3)
+        self.pivotEnd=qtc.QRectF(length-r/6, -r/6, r/3, r/3)
+        #Now work out the transformation that places the link.  Note: transformations are by matrix multiplication
+        #[newPt]=[T][R][oldPt].  In 2D [R] is the 2x2 rotation matrix.  Hence [R][oldPt] is (2x2)*(2x1)=(2x1)=[rotatedPt]
+        #[T] is the 2x2 translation matrix.  Hence [T][rotatedPt] = [newPt]
+        self.placement = qtg.QTransform()
+        self.placement.translate(startX, startY)
+        self.placement.rotate(-angle*180/math.pi)
+        stTT=self.name+"\nstart: ({:0.3f}, {:0.3f})\nend:({:0.3f},{:0.3f})\nlength: {:0.3f}\nangle: {:0.3f}".format(startX, startY, endX, endY, length, angle*180/math.pi)
+        self.setToolTip(stTT)
+        #set last, it marks the drawing as built
+        self.path = path
+
+    def setPen(self, pen):
+        """
+        Changes the outline pen.  The center line color and the stroke margin of the bounding rectangle come from the
+        pen, so the geometry is dropped and built again, which also schedules the repaint.
+        """
+        self.prepareMove()
+        self.pen = pen
+
+    def setBrush(self, brush):
+        self.brush = brush
+        self.update()
 
     def boundingRect(self):
-        boundingRect = self.transform.mapRect(self.rect)
-        return boundingRect
+        """
+        The rectangle around the link in the scene: its end points widened by the radius, which is what a capsule
+        covers at any angle, and by half the outline's stroke, or moving the link leaves a trail behind.
+        """
+        if self.rect is None:
+            startX, startY, endX, endY = self.state[0:4]
+            margin = self.radius + (0.5*max(self.pen.widthF(), 1.0) if self.pen is not None else 0.5)
+            self.rect = qtc.QRectF(min(startX, endX) - margin, min(startY, endY) - margin,
+                                   abs(endX - startX) + 2*margin, abs(endY - startY) + 2*margin)
+        return self.rect
+
+    def shape(self):
+        #the outline in the scene, so that e.g. scene.items(point) only finds the link when the point is on it
+        if self.outline is None:
+            if self.path is None:
+                self.buildDrawing()
+            self.outline = self.placement.map(self.path)
+        return self.outline
 
     def deltaY(self):
         self.DY=self.endY-self.startY
@@ -83,70 +255,126 @@ class RigidLink(qtw.QGraphicsItem):
 
     def paint(self, painter, option, widget=None):
         """
-        This function creates a path painter the paints a semicircle around the start point (ccw), a straight line
-        offset from the main axis of the link, a semicircle around the end point (ccw), and a straight line offset from
-        the main axis.  It then assigns a pen and brush.  Finally, it draws a circle at the start and end points to
-        indicate the pivot points.
+        This function draws the center line, the outline path (a semicircle around the start point (ccw), a
+        straight line offset from the main axis of the link, a semicircle around the end point (ccw), and a straight
+        line offset from the main axis) with the link's pen and brush, and a circle at the start and end points to
+        indicate the pivot points.  What is drawn is built by buildDrawing the first time the link is painted after
+        it moved.
+
+        How much is drawn depends on how wide the link is on screen (see LOD_SIMPLE_PIXELS and LOD_LINE_PIXELS): zoomed
+        out, the dashed center line and the pivot circles are left off, and further out the link is one line.
         :param painter:
         :param option:
         :param widget:
         :return:
         """
-        #instantiate a QPainterPath object
-        path = qtg.QPainterPath()
-        # compute linkLength from startX, startY, endX, endY
-        len = self.linkLength()
-        # compute the angle of the link from deltaY & deltaX
-        angLink = self.linkAngle()*180/math.pi
-
-        #define bounding rectangles for the radiused ends of the link
-        rectSt = qtc.QRectF(-self.radius, -self.radius, 2*self.radius, 2*self.radius)
-        rectEn = qtc.QRectF(self.length-self.radius, -self.radius, 2*self.radius, 2*self.radius)
-
-        #draw a center line
-        centerLinePen= qtg.QPen()
-        centerLinePen.setStyle(qtc.Qt.DashDotLine)
-        r,g,b,a=self.pen.color().getRgb()
-        centerLinePen.setColor(qtg.QColor(r,g,b,128))
-        centerLinePen.setWidth(1)
-        p1=qtc.QPointF(0,0)
-        p2=qtc.QPointF(len,0)
-        painter.setPen(centerLinePen)
-        painter.drawLine(p1,p2)
-
-        path.arcMoveTo(rectSt,90)
-        path.arcTo(rectSt, 90,180)
-        path.lineTo(self.length,self.radius)
-        path.arcMoveTo(rectEn, 270)
-        path.arcTo(rectEn, 270, 180)
-        path.lineTo(0, -self.radius)
-        if self.pen is not None:
-            painter.setPen(self.pen)  # Red color pen
-        if self.brush is not None:
-            painter.setBrush(self.brush)
-        painter.drawPath(path)
-        #draw some circles at the end points
-        pivotStart=qtc.QRectF(-self.radius/6, -self.radius/6, self.radius/3, self.radius/3)
-        pivotEnd=qtc.QRectF(self.length-self.radius/6, -self.radius/6, self.radius/3, self.radius/3)
-        painter.drawEllipse(pivotStart)
-        painter.drawEllipse(pivotEnd)
-        #redefine the bounding rectangle
-        self.rect=qtc.QRectF(-self.radius,-self.radius, self.length+2*self.radius,2*self.radius)
-        #Now perform transformations on the object.  Note: transformations are by matrix multiplication [newPt]=[T][R][oldPt]
-        #in 2D [R] is the 2x2 rotation matrix.  Hence [R][oldPt] is (2x2)*(2x1)=(2x1)=[rotatedPt]
-        #[T] is the 2x2 translation matrix.  Hence [T][rotatedPt] = [newPt]
-        self.transform.reset()
-        self.transform.translate(self.startX, self.startY)
-        self.transform.rotate(-angLink)
-        self.setTransform(self.transform)
-        self.transform.reset()
-        stTT=self.name+"\nstart: ({:0.3f}, {:0.3f})\nend:({:0.3f},{:0.3f})\nlength: {:0.3f}\nangle: {:0.3f}".format(self.startX, self.startY, self.endX, self.endY, self.length, self.angle*180/math.pi)
-        self.setToolTip(stTT)
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        if self.path is None:
+            self.buildDrawing()
+        world = painter.worldTransform()
+        width = 2*self.radius*option.levelOfDetailFromTransform(world)
+        painter.setWorldTransform(self.placement*world)
+        if width < LOD_LINE_PIXELS:
+            painter.setPen(self.linePen)
+            painter.drawLine(self.centerLine)
+        else:
+            if width >= LOD_SIMPLE_PIXELS:
+                painter.setPen(self.centerLinePen)
+                painter.drawLine(self.centerLine)
+            if self.pen is not None:
+                painter.setPen(self.pen)  # Red color pen
+            if self.brush is not None:
+                painter.setBrush(self.brush)
+            painter.drawPath(self.path)
+            if width >= LOD_SIMPLE_PIXELS:
+                painter.drawEllipse(self.pivotStart)
+                painter.drawEllipse(self.pivotEnd)
+        painter.setWorldTransform(world)
+        if t0: PROFILER.record('paint RigidLink', t0)
         # brPen=qtg.QPen()
         # brPen.setWidth(0)
         # painter.setPen(brPen)
         # painter.drawRect(self.boundingRect())
 
+class LinkStore:
+    def __init__(self, links=()):
+        """
+        The state of many RigidLinks (see LINK_FIELDS) in one contiguous numpy structured array, one row per link.
+        Each link's state becomes a view of its row, so reading a link goes straight to the array and the whole set
+        can be read (e.g. store.array['endX']) or moved at once.  setEndpoints writes new end points for any number
+        of links in one array assignment and computes their lengths and angles in one vectorized pass; per link, it
+        only tells the scene the link is moving (the links build their drawing when they are next painted, see
+        RigidLink).  A solver that produces all joint positions together (see
+        Linkage_Mechanism.Mechanism.applyToItems) hands them over this way.
+        :param links: RigidLink items to adopt
+        """
+        import numpy as np
+        self.links = []
+        self.array = np.zeros(0, dtype=list(LINK_FIELDS))
+        self.add(links)
+
+    def __len__(self):
+        return len(self.links)
+
+    def add(self, links):
+        """
+        Adopts more links.  The array is reallocated once for the lot and every link's view is rebound to it.
+        :param links: RigidLink items
+        :return: their rows
+        """
+        import numpy as np
+        links = list(links)
+        first = len(self.links)
+        array = np.zeros(first + len(links), dtype=self.array.dtype)
+        array[:first] = self.array
+        self.array = array
+        self.links += links
+        rows = self.floats()
+        rows[first:] = [[float(v) for v in link.state] for link in links]
+        for row, link in enumerate(self.links):
+            link.store = self
+            link.row = row
+            link.state = rows[row]
+        return list(range(first, len(self.links)))
+
+    def floats(self):
+        """
+        :return: the array viewed as an (n, len(LINK_FIELDS)) float64 array
+        """
+        import numpy as np
+        return self.array.view(np.float64).reshape(len(self.array), len(LINK_FIELDS))
+
+    def endpoints(self, rows=None):
+        """
+        :param rows: row indices, defaults to all
+        :return: (n, 4) array of startX, startY, endX, endY
+        """
+        floats = self.floats()
+        return (floats if rows is None else floats[rows])[:, :4]
+
+    def setEndpoints(self, rows, ends):
+        """
+        Moves many links at once.
+        :param rows: row indices of the links
+        :param ends: (n, 4) array-like of startX, startY, endX, endY
+        """
+        import numpy as np
+        rows = np.asarray(rows, dtype=int)
+        links = self.links
+        #before the write, as RigidLink.prepareMove
+        for row in rows.tolist():
+            links[row].prepareMove()
+        floats = self.floats()
+        floats[rows, :4] = ends
+        dx = floats[rows, 2] - floats[rows, 0]
+        dy = floats[rows, 3] - floats[rows, 1]
+        length = np.hypot(dx, dy)
+        #the same angle as RigidLink.linkAngle, including 0 for a zero length link
+        with np.errstate(invalid='ignore', divide='ignore'):
+            angle = np.where(length == 0.0, 0.0, np.arccos(np.clip(dx/length, -1.0, 1.0)) * np.where(dy > 0, -1, 1))
+        floats[rows, 4] = length
+        floats[rows, 5] = angle
+
 class RigidPivotPoint(qtw.QGraphicsItem):
     def __init__(self, ptX, ptY, pivotHeight, pivotWidth, parent=None, pen=None, brush=None, rotation=0, name='RigidPivotPoint'):
         super().__init__(parent)
@@ -157,30 +385,48 @@ class RigidPivotPoint(qtw.QGraphicsItem):
         self.height = pivotHeight
         self.width = pivotWidth
         self.radius = min(self.height, self.width) / 4
-        self.rect = qtc.QRectF(self.x - self.width / 2, self.y - self.radius, self.width, self.height + self.radius)
         self.rotationAngle = rotation
         self.name = name
         self.transformation = qtg.QTransform()
         stTT = self.name +"\nx={:0.3f}, y={:0.3f}".format(self.x, self.y)
         self.setToolTip(stTT)
+        self.updateGeometry()
 
-    def boundingRect(self):
-        bounding_rect = self.transformation.mapRect(self.rect)
-        return bounding_rect
-
-    def rotate(self, angle):
-        self.rotationAngle=angle
+    def updateGeometry(self):
+        """
+        Builds what paint draws (in pivot coordinates, with the pivot point at 0,0): the outline path, the pivot hole,
+        the ground line and the hatched support.  Also sets the bounding rectangle and the transform that places the
+        pivot in the scene.  This runs when the pivot is built, rotated or restyled, never in paint.
+        """
+        self.prepareGeometryChange()
+        #pivots of the same size and stroke share their outline (many do, e.g. in a loaded scene)
+        margin = 0.5*max(self.pen.widthF(), 1.0) if self.pen is not None else 0.5
+        key = (self.height, self.width, margin)
+        shape = PIVOT_SHAPES.get(key)
+        if shape is None:
+            shape = PIVOT_SHAPES[key] = self.buildShape(margin)
+        self.path, self.pivotPtRect, self.groundLine, self.support, self.rect = shape
+        #what is left of the pivot when it is only a few pixels wide
+        self.dotColor = self.pen.color() if self.pen is not None else qtg.QColor(qtc.Qt.black)
+        self.transformation.reset()
+        self.transformation.translate(self.x, self.y)
+        self.transformation.rotate(self.rotationAngle)
+        self.setTransform(self.transformation)
+        self.transformation.reset()
 
-    def paint(self, painter, option, widget=None):
-        path = qtg.QPainterPath()
+    def buildShape(self, margin):
+        """
+        :param margin: half the width of the outline's stroke
+        :return: the outline path, the pivot hole, the ground line, the support and the bounding rectangle
+        """
         radius = min(self.height,self.width)/2
-
         H=math.sqrt(math.pow(self.width/2,2)+math.pow(self.height,2))
         phi=math.asin(radius/H)
         theta=math.asin(self.height/H)
         ang=math.pi-phi-theta
         l=H*math.cos(phi)
 
+        path = qtg.QPainterPath()
         x1=self.width/2
         y1=self.height
         path.moveTo(x1,y1)
@@ -194,37 +440,485 @@ class RigidPivotPoint(qtw.QGraphicsItem):
         x4=-self.width/2
         y4=+self.height
         path.lineTo(x4,y4)
-        #path.arcTo(pivotRect,ang*180/math.pi, 90)
-        if self.pen is not None:
-            painter.setPen(self.pen)  # Red color pen
-        if self.brush is not None:
-            painter.setBrush(self.brush)
-        painter.drawPath(path)
-
         pivotPtRect=qtc.QRectF(-radius/4, -radius/4, radius/2,radius/2)
-        painter.drawEllipse(pivotPtRect)
         x5=-self.width
         x6=+self.width
-        painter.drawLine(x5,y4,x6,y4)
-        penOutline = qtg.QPen(qtc.Qt.NoPen)
-        hatchbrush = qtg.QBrush(qtc.Qt.BDiagPattern)
-        painter.setPen(penOutline)
-        painter.setBrush(hatchbrush)
+        groundLine = qtc.QLineF(x5,y4,x6,y4)
         support = qtc.QRectF(x5,y4,self.width*2, self.height)
-        painter.drawRect(support)
-        self.rect=qtc.QRectF(-self.width,-self.radius, self.width*2, self.height*2+self.radius)
-        self.transformation.reset()
-        self.transformation.translate(self.x, self.y)
-        self.transformation.rotate(self.rotationAngle)
-        self.setTransform(self.transformation)
 
-        self.transformation.reset()
+        #the arc around the pivot point has radius min(height, width)/2 and the hatched support reaches down to 2*height
+        top = radius
+        rect=qtc.QRectF(-self.width,-top, self.width*2, self.height*2+top).adjusted(-margin, -margin, margin, margin)
+        return path, pivotPtRect, groundLine, support, rect
+
+    def boundingRect(self):
+        bounding_rect = self.transformation.mapRect(self.rect)
+        return bounding_rect
+
+    def rotate(self, angle):
+        self.rotationAngle=angle
+        self.updateGeometry()
+
+    def moveTo(self, x, y):
+        self.x = x
+        self.y = y
+        self.setToolTip(self.name +"\nx={:0.3f}, y={:0.3f}".format(self.x, self.y))
+        self.updateGeometry()
+
+    def setPen(self, pen):
+        self.pen = pen
+        self.updateGeometry()
+
+    def setBrush(self, brush):
+        self.brush = brush
+        self.update()
+
+    def paint(self, painter, option, widget=None):
+        """
+        Draws the geometry built by updateGeometry, with as much detail as the pivot's size on screen calls for (see
+        LOD_SIMPLE_PIXELS and LOD_LINE_PIXELS): the hatched support, which is slow to fill, and the pivot hole are left
+        off when zoomed out, and further out the pivot is a dot.
+        """
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        detail = option.levelOfDetailFromTransform(painter.worldTransform())
+        width = self.width*detail
+        if width < LOD_LINE_PIXELS:
+            half = 0.5*LOD_LINE_PIXELS/max(detail, 1e-9)
+            painter.fillRect(qtc.QRectF(-half, -half, 2*half, 2*half), self.dotColor)
+        else:
+            if self.pen is not None:
+                painter.setPen(self.pen)  # Red color pen
+            if self.brush is not None:
+                painter.setBrush(self.brush)
+            painter.drawPath(self.path)
+            painter.drawLine(self.groundLine)
+            if width >= LOD_SIMPLE_PIXELS:
+                painter.drawEllipse(self.pivotPtRect)
+                painter.setPen(PIVOT_OUTLINE_PEN)
+                painter.setBrush(PIVOT_HATCH_BRUSH)
+                painter.drawRect(self.support)
+        if t0: PROFILER.record('paint RigidPivotPoint', t0)
         # brPen=qtg.QPen()
         # brPen.setWidth(0)
         # painter.setPen(brPen)
         # painter.drawRect(self.boundingRect())
 
 
+class OverlayItem(qtw.QGraphicsItem):
+    def __init__(self, pen=None, headSize=6.0, markerSize=4.0, parent=None, name='OverlayItem'):
+        """
+        A batched layer of arrows, markers and a polyline drawn in one style, e.g. the velocity vectors of every joint
+        or the path traced by a coupler point.  It is one item however many arrows and markers it shows: the data
+        come in as numpy arrays and are written straight into Qt point buffers (a sip.array of QPointF for the line
+        segments, QPolygonF for the markers and the polyline) through numpy views of their memory, so an update is a
+        few whole-array operations and paint is one drawLines, one drawPoints and one drawPolyline call.  The buffers
+        are only reallocated when the number of elements changes, so updating the same arrows every frame creates no
+        items and no Qt objects.
+
+        An arrow is three segments, the shaft and the two sides of an open head, so all arrows go in one drawLines
+        call.  Markers are drawn as points with a wide pen: round caps (the default) give dots and square caps give
+        squares.
+        :param pen: pen for the arrows and the polyline; its color and cap style are used for the markers
+        :param headSize: arrowhead length in scene units (shorter arrows get a head half their length)
+        :param markerSize: marker diameter in scene units
+        :param parent:
+        :param name:
+        """
+        super().__init__(parent)
+        self.pen = qtg.QPen(qtc.Qt.darkRed) if pen is None else qtg.QPen(pen)
+        self.headSize = headSize
+        self.markerSize = markerSize
+        self.name = name
+        self.markerPen = qtg.QPen(self.pen)
+        self.markerPen.setWidthF(markerSize)
+        if pen is None or pen.capStyle() != qtc.Qt.SquareCap:
+            self.markerPen.setCapStyle(qtc.Qt.RoundCap)
+        #segment end points in pairs, markers and the polyline, with numpy views of each buffer
+        self.lines = sip.array(qtc.QPointF, 0)
+        self.markers = qtg.QPolygonF()
+        self.path = qtg.QPolygonF()
+        self.views = {}
+        #the polyline kept as a numpy array, for appendPath
+        self.pathPoints = None
+        self.rect = qtc.QRectF()
+
+    def buffer(self, name, count):
+        """
+        :return: an (count, 2) float64 numpy view of a point buffer, resized (reallocated) only if count changed
+        """
+        import numpy as np
+        view = self.views.get(name)
+        if view is not None and len(view) == count:
+            return view
+        if name == 'lines':
+            self.lines = sip.array(qtc.QPointF, count)
+            memory = self.lines
+        else:
+            polygon = qtg.QPolygonF(count)
+            setattr(self, name, polygon)
+            memory = polygon.data()
+            if memory is None:
+                memory = bytearray()
+            else:
+                memory.setsize(16*count)
+        view = np.frombuffer(memory, dtype=np.float64).reshape(count, 2)
+        self.views[name] = view
+        return view
+
+    def setArrows(self, positions, vectors, scale=1.0):
+        """
+        Shows one arrow per row, from the position along the vector.  Rows with a non-finite value are left out and
+        zero vectors show as nothing.
+        :param positions: (n, 2) array-like of arrow tails in scene coordinates
+        :param vectors: (n, 2) array-like of vectors
+        :param scale: scene units per unit of the vectors
+        """
+        import numpy as np
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        vectors = np.asarray(vectors, dtype=float).reshape(-1, 2) * scale
+        keep = np.isfinite(positions).all(axis=1) & np.isfinite(vectors).all(axis=1)
+        if not keep.all():
+            positions = positions[keep]
+            vectors = vectors[keep]
+        tips = positions + vectors
+        length = np.hypot(vectors[:, 0], vectors[:, 1])[:, np.newaxis]
+        #unit vectors pointing back from the tip, (0, 0) for zero vectors so their heads collapse onto the tip
+        back = -np.divide(vectors, length, out=np.zeros_like(vectors), where=length > 0.0)
+        head = np.minimum(self.headSize, 0.5*length)
+        c = math.cos(ARROW_HEAD_ANGLE)
+        s = math.sin(ARROW_HEAD_ANGLE)
+        side1 = tips + head*np.column_stack((c*back[:, 0] - s*back[:, 1], s*back[:, 0] + c*back[:, 1]))
+        side2 = tips + head*np.column_stack((c*back[:, 0] + s*back[:, 1], -s*back[:, 0] + c*back[:, 1]))
+        lines = self.buffer('lines', 6*len(tips)).reshape(-1, 6, 2)
+        lines[:, 0] = positions
+        lines[:, 1] = tips
+        lines[:, 2] = tips
+        lines[:, 3] = side1
+        lines[:, 4] = tips
+        lines[:, 5] = side2
+        self.updateBounds()
+
+    def setMarkers(self, positions):
+        """
+        :param positions: (n, 2) array-like of marker centers in scene coordinates
+        """
+        import numpy as np
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        positions = positions[np.isfinite(positions).all(axis=1)]
+        self.buffer('markers', len(positions))[:] = positions
+        self.updateBounds()
+
+    def setPath(self, points):
+        """
+        :param points: (n, 2) array-like of the polyline's points in scene coordinates
+        """
+        import numpy as np
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.pathPoints = points[np.isfinite(points).all(axis=1)]
+        self.buffer('path', len(self.pathPoints))[:] = self.pathPoints
+        self.updateBounds()
+
+    def appendPath(self, points, maxPoints=2000):
+        """
+        Extends the polyline, e.g. with the latest position of a coupler point, keeping the last maxPoints points.
+        """
+        import numpy as np
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if self.pathPoints is not None:
+            points = np.concatenate((self.pathPoints, points))
+        self.setPath(points[-maxPoints:])
+
+    def clear(self):
+        for name in ('lines', 'markers', 'path'):
+            self.buffer(name, 0)
+        self.pathPoints = None
+        self.updateBounds()
+
+    def updateBounds(self):
+        """
+        Tells the scene the item changed and recomputes the bounding rectangle from all the buffers.
+        """
+        import numpy as np
+        self.prepareGeometryChange()
+        views = [view for view in self.views.values() if len(view)]
+        if not views:
+            self.rect = qtc.QRectF()
+            return
+        points = np.concatenate(views)
+        (left, top), (right, bottom) = points.min(axis=0), points.max(axis=0)
+        margin = 0.5*max(self.markerSize, self.pen.widthF(), 1.0)
+        self.rect = qtc.QRectF(left, top, right - left, bottom - top).adjusted(-margin, -margin, margin, margin)
+
+    def boundingRect(self):
+        return self.rect
+
+    def paint(self, painter, option, widget=None):
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        painter.setPen(self.pen)
+        if len(self.lines):
+            painter.drawLines(self.lines)
+        if self.path.size() > 1:
+            painter.drawPolyline(self.path)
+        if self.markers.size():
+            painter.setPen(self.markerPen)
+            painter.drawPoints(self.markers)
+        if t0: PROFILER.record('paint OverlayItem', t0)
+
+class GridScene(qtw.QGraphicsScene):
+    def __init__(self, parent=None):
+        """
+        A scene that draws its reference grid in drawBackground instead of holding one item per grid line.  Only the
+        lines inside the exposed rectangle are drawn, and when the view is zoomed out far enough that lines would be
+        closer than minLineSpacing pixels, every other line is skipped (repeatedly) so the grid stays readable.
+        :param parent:
+        """
+        super().__init__(parent)
+        self.gridRect = None
+        self.gridDx = 10
+        self.gridDy = 10
+        self.gridPen = qtg.QPen()
+        self.gridBrush = None
+        self.minLineSpacing = 5
+        #profiling: when a view paint started (set by MainWindow) and whether to draw the timing overlay
+        self.frameStart = 0
+        self.showOverlay = False
+        self.overlayRect = qtc.QRect(0, 0, 300, 80)
+
+    def setGrid(self, left, top, width, height, Dx, Dy, pen=None, brush=None):
+        """
+        Sets up the grid and invalidates the background so it is redrawn (and the view's background cache rebuilt).
+        :param left: left of the grid in scene coords
+        :param top: top of the grid in scene coords
+        :param width:
+        :param height:
+        :param Dx: grid spacing in x direction
+        :param Dy: grid spacing in y direction
+        :param pen: pen for grid lines
+        :param brush: brush for background, or None for no fill
+        """
+        self.gridRect = qtc.QRectF(left, top, width, height)
+        self.gridDx = Dx
+        self.gridDy = Dy
+        self.gridPen = qtg.QPen() if pen is None else pen
+        self.gridBrush = brush
+        self.invalidate(self.gridRect, qtw.QGraphicsScene.BackgroundLayer)
+
+    def setGridStyle(self, pen=None, brush=None):
+        """
+        Changes the grid's pen and brush without changing its layout.
+        """
+        self.gridPen = qtg.QPen() if pen is None else pen
+        self.gridBrush = brush
+        if self.gridRect is not None:
+            self.invalidate(self.gridRect, qtw.QGraphicsScene.BackgroundLayer)
+
+    def drawBackground(self, painter, rect):
+        super().drawBackground(painter, rect)
+        if self.gridRect is None:
+            return
+        exposed = rect.intersected(self.gridRect)
+        if exposed.isEmpty():
+            return
+        painter.setPen(self.gridPen)
+        if self.gridBrush is not None:
+            painter.setBrush(self.gridBrush)
+            painter.drawRect(self.gridRect)
+        #level of detail: pixels per scene unit, and the line spacing that keeps the lines minLineSpacing apart
+        t = painter.worldTransform()
+        scale = max(math.hypot(t.m11(), t.m12()), 1e-9)
+        Dx = self.gridDx
+        while Dx*scale < self.minLineSpacing: Dx *= 2
+        Dy = self.gridDy
+        while Dy*scale < self.minLineSpacing: Dy *= 2
+        left = self.gridRect.left()
+        top = self.gridRect.top()
+        right = self.gridRect.right()
+        bottom = self.gridRect.bottom()
+        lines = []
+        # the vertical grid lines that are exposed
+        x = left + max(math.ceil((exposed.left() - left)/Dx), 0)*Dx
+        while x <= exposed.right() and x <= right:
+            lines.append(qtc.QLineF(x, top, x, bottom))
+            x += Dx
+        # the horizontal grid lines that are exposed
+        y = top + max(math.ceil((exposed.top() - top)/Dy), 0)*Dy
+        while y <= exposed.bottom() and y <= bottom:
+            lines.append(qtc.QLineF(left, y, right, y))
+            y += Dy
+        painter.drawLines(lines)
+
+    def drawForeground(self, painter, rect):
+        """
+        The foreground is drawn last in every view repaint, so this is where a profiled frame ends.  It also draws
+        the profiler overlay in the top left corner of the view when showOverlay is set.
+        """
+        if self.showOverlay:
+            painter.save()
+            painter.resetTransform()  # draw in viewport pixels
+            painter.setPen(qtg.QPen(qtc.Qt.black))
+            painter.setBrush(qtg.QBrush(qtg.QColor(255, 255, 255, 200)))
+            text = PROFILER.summaryText()
+            textRect = painter.fontMetrics().boundingRect(qtc.QRect(8, 6, 1000, 1000), qtc.Qt.AlignLeft, text)
+            box = textRect.adjusted(-4, -2, 4, 2)
+            painter.drawRect(box)
+            painter.drawText(textRect, qtc.Qt.AlignLeft, text)
+            painter.restore()
+            #the area MainWindow's overlay timer repaints
+            self.overlayRect = box.adjusted(-1, -1, 1, 1)
+        if self.frameStart and PROFILER.enabled:
+            PROFILER.record('frame', self.frameStart)
+            self.frameStart = 0
+
+class InputCoalescer(qtc.QObject):
+    def __init__(self, callback, interval=None, parent=None):
+        """
+        Keeps only the latest value posted to it and hands it to callback at most once per timer tick.  The first
+        value after a quiet period goes through immediately and starts the timer; values that arrive before the next
+        tick overwrite each other and only the last one is delivered on the tick.  The timer stops again as soon as a
+        tick finds nothing to deliver, so nothing runs while the input is idle.
+        :param callback: called with the latest value
+        :param interval: tick in ms, defaults to one frame at the primary screen's refresh rate
+        :param parent:
+        """
+        super().__init__(parent)
+        self.callback = callback
+        if interval is None:
+            screen = qtg.QGuiApplication.primaryScreen()
+            rate = screen.refreshRate() if screen is not None else 0
+            interval = 1000.0/rate if rate > 0 else 1000.0/60.0
+        self.timer = qtc.QTimer(self)
+        self.timer.setTimerType(qtc.Qt.PreciseTimer)
+        self.timer.setInterval(max(int(round(interval)), 1))
+        self.timer.timeout.connect(self.tick)
+        self.pending = None
+        self.hasPending = False
+        self.received = 0
+        self.delivered = 0
+
+    @property
+    def dropped(self):
+        """
+        the number of values that were overwritten before they could be delivered
+        """
+        return self.received - self.delivered - (1 if self.hasPending else 0)
+
+    def post(self, value):
+        self.received += 1
+        self.pending = value
+        self.hasPending = True
+        if not self.timer.isActive():
+            self.tick()
+            self.timer.start()
+
+    def tick(self):
+        if not self.hasPending:
+            self.timer.stop()
+            return
+        value = self.pending
+        self.pending = None
+        self.hasPending = False
+        self.delivered += 1
+        self.callback(value)
+
+    def flush(self):
+        """
+        Delivers the pending value now, if there is one.
+        """
+        if self.hasPending:
+            self.tick()
+
+class SolverWorker(qtc.QObject):
+    #generation, request, result; delivered on the thread that connected to it (the GUI thread)
+    solved = qtc.pyqtSignal(int, object, object)
+    #queued to the worker's thread by post
+    wake = qtc.pyqtSignal()
+
+    def __init__(self, solve):
+        """
+        Runs solve(request) on its own QThread.  Requests go through a one-slot mailbox where the latest value wins:
+        post drops any request the worker has not started yet, so however fast requests arrive and however slow a
+        solve is, the worker only ever works on the newest one and never builds a backlog.  Each request is numbered
+        (its generation) and the result comes back through the queued solved signal with that number, so the
+        receiver can tell stale results from fresh ones.
+
+        The mailbox is a deque with maxlen=1, whose append and popleft are atomic, so no lock is taken on either side.
+        :param solve: callable(request) that returns the result.  It runs on the worker thread, so it must not touch
+        any QGraphicsItem; everything it works on has to come with the request.
+        """
+        super().__init__()
+        self.solve = solve
+        self.mailbox = collections.deque(maxlen=1)
+        self.generation = 0
+        self.posted = 0
+        self.superseded = 0
+        self.solves = 0
+        #not self.thread, which would hide QObject.thread()
+        self.solverThread = qtc.QThread()
+        self.moveToThread(self.solverThread)
+        self.wake.connect(self.process)
+        self.solverThread.start()
+
+    def post(self, request):
+        """
+        Hands the worker a new request, replacing one it has not started on.  Called from the GUI thread.
+        """
+        self.generation += 1
+        self.posted += 1
+        if self.mailbox:
+            self.superseded += 1
+        self.mailbox.append((self.generation, request))
+        self.wake.emit()
+
+    def process(self):
+        """
+        Solves whatever is in the mailbox, on the worker thread.  Wakes that find it empty were for requests a
+        previous wake already took.
+        """
+        while self.mailbox:
+            try:
+                generation, request = self.mailbox.popleft()
+            except IndexError:
+                return
+            result = self.solve(request)
+            self.solves += 1
+            self.solved.emit(generation, request, result)
+
+    def cancel(self):
+        """
+        Empties the mailbox.  Called from the GUI thread.
+        :return: the generation of the last request posted, which the receiver drops results up to
+        """
+        self.mailbox.clear()
+        return self.generation
+
+    def stop(self):
+        self.solverThread.quit()
+        self.solverThread.wait()
+
+class RenderProfile:
+    def __init__(self, name, pivotCache=qtw.QGraphicsItem.NoCache, linkCache=qtw.QGraphicsItem.NoCache,
+                 updateMode=qtw.QGraphicsView.MinimalViewportUpdate, openGL=False, antialiasing=False,
+                 backgroundCache=True):
+        """
+        How MainWindow's view renders, so a deployment can be tuned instead of running Qt's defaults (see
+        RENDER_PROFILES and MainWindow.setRenderProfile).
+        :param name:
+        :param pivotCache: QGraphicsItem cache mode for the pivots.  They never move, so DeviceCoordinateCache keeps
+        each one as a pixmap that is only re-rendered when the zoom changes.
+        :param linkCache: cache mode for the links.  They move on every drag step, which invalidates any cache.
+        :param updateMode: QGraphicsView viewport update mode
+        :param openGL: render through a QOpenGLWidget viewport, if an OpenGL context can be created
+        :param antialiasing: antialias lines and curves
+        :param backgroundCache: keep the grid in the view's background pixmap
+        """
+        self.name = name
+        self.pivotCache = pivotCache
+        self.linkCache = linkCache
+        self.updateMode = updateMode
+        self.openGL = openGL
+        self.antialiasing = antialiasing
+        self.backgroundCache = backgroundCache
+
 class MainWindow(Ui_Form, qtw.QWidget):
     def __init__(self):
         """
@@ -243,28 +937,69 @@ class MainWindow(Ui_Form, qtw.QWidget):
         self.pushButton.setMouseTracking(True)
         self.setMouseTracking(True)
 
-        #draws a scene
-        self.buildScene()
+        #draws the linkage now and the grid once the window is up, so the window appears as early as possible
+        self.buildScene(deferDecorations=True)
         self.prevAlpha = self.link1.angle
         self.prevBeta = self.link3.angle
         self.angle1=math.pi
         self.angle2=math.pi
+        #set to drag with a precomputed table of the linkage's motion instead of solving on every move
+        self.useMotionTable = False
+        #keep motion tables and summaries in a Linkage_Cache.LinkageCache (opened when first needed), so a geometry
+        #seen in an earlier session is read back instead of solved again.  The default drag solves in closed form and
+        #does not go through the cache: one solve costs about as much as a table lookup (see benchSolver), and a
+        #drag needs nothing computed ahead, so there is nothing for a warm session to skip.
+        self.useCache = True
+        self.cache = None
+        #set to drag with the general mechanism solver (see mechanismModel), which works for any linkage drawn in the
+        #scene, not only a four-bar
+        self.useMechanism = False
+        #solves on its own thread when set (see setThreadedSolver)
+        self.solverWorker = None
+        #the crank animation (see startAnimation) and the file it records to
+        self.animation = None
+        self.recorder = None
+        #a stored motion being scrubbed through with sld_Frame (see openDataset)
+        self.dataset = None
+        #the linkage and crank angle to put back when the dataset is closed
+        self.datasetRestore = None
+        self.sld_Frame = None
+        #the joint being dragged instead of the crank (see jointAt) and what the mouse is over
+        self.draggedJoint = None
+        self.hovered = None
+        #the links' end points at the press that grabbed draggedJoint, handed to the solver with the drag (see
+        #moveJoint)
+        self.dragEnds = None
+        #joint velocity arrows and the coupler trace, redrawn after every move when on (see setMotionOverlay)
+        self.motionOverlay = False
+        #the point on the coupler that is traced, as (along, offset) (see FourBarPoses.couplerPoint)
+        self.couplerPoint = (0.5, 0.0)
 
         #signals/slots
         self.spnd_Zoom.valueChanged.connect(self.setZoom)
         self.pushButton.clicked.connect(self.pickAColor)
         self.scene.installEventFilter(self)
         self.mouseDown = False
+        #mouse moves can arrive far faster than the screen refreshes, so only the latest one is handled per frame
+        self.moveCoalescer = InputCoalescer(self.handleMouseMove, parent=self)
+        #repaints the profiler overlay a few times a second while it is shown (see setProfiling)
+        self.overlayTimer = qtc.QTimer(self)
+        self.overlayTimer.setInterval(250)
+        self.overlayTimer.timeout.connect(lambda: self.gv_Main.viewport().update(self.scene.overlayRect))
         self.show()
 
     def setupGraphics(self):
-        #create a scene object
-        self.scene = qtw.QGraphicsScene()
+        #create a scene object.  It draws the reference grid as its background.
+        self.scene = GridScene()
         self.scene.setObjectName("MyScene")
         self.scene.setSceneRect(-200, -200, 400, 400)  # xLeft, yTop, Width, Height
+        #counts the times the scene was rebuilt, so decorations still being streamed in stop when it is rebuilt again
+        self.sceneVersion = 0
 
-        #set the scene for the graphics view object
+        #set the scene for the graphics view object.  The default render profile keeps the background (the grid) in a
+        #pixmap that is only redrawn when the view is scrolled, zoomed or the grid changes.
         self.gv_Main.setScene(self.scene)
+        self.setRenderProfile('default')
         #make some pens and brushes for my drawing
         self.setupPensAndBrushes()
 
@@ -306,72 +1041,16 @@ class MainWindow(Ui_Form, qtw.QWidget):
 
     def eventFilter(self, obj, event):
         # I set up an event filter to track mouse position and illustrate difference between scene and screen coords.
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        if t0 and event.type() == qtc.QEvent.Paint:
+            #only installed on the viewport while profiling; the frame ends in GridScene.drawForeground
+            self.scene.frameStart = t0
+            return False
         if obj == self.scene:
             et=event.type()
             if event.type() == qtc.QEvent.GraphicsSceneMouseMove:
-                w=app.topLevelAt(event.screenPos())
-                screenPos=event.screenPos()
-                scenePos=event.scenePos()
-                strScreen="screen x = {}, screen y = {}".format(screenPos.x(), screenPos.y())
-                strScene=":  scene x = {}, scene y = {}".format(scenePos.x(), scenePos.y())
-                self.setWindowTitle(strScreen+strScene)
-                if self.mouseDown:
-                    l1=self.link1.linkLength()
-                    l2=self.link2.linkLength()
-                    l3=self.link3.linkLength()
-
-                    scenePos = event.scenePos()
-                    x=scenePos.x()
-                    y=scenePos.y()
-                    if (x==self.link1.startX):
-                        self.angle1 = math.pi/2 if y<= self.link1.startY else math.pi*3.0/2.0
-                    else:
-                        self.angle1 = math.atan(-(y-self.link1.startY)/(x-self.link1.startX))
-                        self.angle1 += math.pi  if x<self.link1.startX else 0
-                    if (self.link3.endX==self.link3.startX):
-                        self.angle2 = math.pi/2 if self.link3.endY<= self.link3.startY else math.pi*3.0/2.0
-                    else:
-                        self.angle2 = math.atan(-(self.link3.endY-self.link2.startY)/(self.link3.endX-self.link3.startX))
-                        self.angle2 += math.pi  if self.link3.endX<self.link3.startX else 0
-
-                    self.link1.endX=self.link1.startX+math.cos(self.angle1)*l1
-                    self.link1.endY=self.link1.startY-math.sin(self.angle1)*l1
-                    x1=self.link1.endX
-                    y1=self.link1.endY
-                    self.lTest = l2
-                    def fn1(angle2):
-                        x2=self.link3.startX+l3*math.cos(angle2)
-                        y2=self.link3.startY-l3*math.sin(angle2)
-                        self.lTest = math.sqrt(math.pow(x2-x1,2)+math.pow(y2-y1,2))
-                        return l2-self.lTest
-                    result = optimize.fsolve(fn1,[self.angle2])
-                    if abs(self.lTest-l2)>0.001:
-                        self.angle2 = self.prevBeta
-                        self.angle1 = self.prevAlpha
-                        self.link1.endX = self.link1.startX + math.cos(self.angle1) * l1
-                        self.link1.endY = self.link1.startY - math.sin(self.angle1) * l1
-                    else:
-                        self.angle2=result[0]
-                        self.prevAlpha=self.angle1
-                        self.prevBeta=self.angle2
-
-                    #self.link1.endX=scenePos.x()
-                    #self.link1.endY=scenePos.y()
-                    #self.link1.update()
-                    self.link3.endX = self.link3.startX+l3*math.cos(self.angle2)
-                    self.link3.endY = self.link3.startY-l3*math.sin(self.angle2)
-                    self.link2.startX=self.link1.endX
-                    self.link2.startY=self.link1.endY
-                    self.link2.endX=self.link3.endX
-                    self.link2.endY=self.link3.endY
-                    len2=self.link2.linkLength()
-                    self.scene.update()
-                    # centerX = self.tmpCircle.rect().center().x()
-                    # centerY = self.tmpCircle.rect().center().y()
-                    # radius = math.pow(centerX-scenePos.x(),2)+math.pow(centerY-scenePos.y(),2)
-                    # radius = math.sqrt(radius)
-                    # self.tmpCircle.setRect(centerX-radius, centerY-radius, 2*radius, 2*radius)
-                    # self.tmpLn.setLine(centerX, centerY, scenePos.x(),scenePos.y())
+                #the event object is reused by Qt, so keep copies of the positions for the coalescer
+                self.moveCoalescer.post((qtc.QPoint(event.screenPos()), qtc.QPointF(event.scenePos())))
 
             if event.type() == qtc.QEvent.GraphicsSceneWheel:
                 if event.delta()>0:
@@ -388,17 +1067,647 @@ class MainWindow(Ui_Form, qtw.QWidget):
                     # self.tmpCircle.setBrush(self.brushGrid)
                     # self.tmpLn.setPen(self.penGridLines)
                     self.mouseDown = True
+                    #a press on a moving joint drags that joint; anywhere else turns the crank
+                    scenePos = event.scenePos()
+                    self.draggedJoint = self.jointAt(scenePos.x(), scenePos.y())
+                    if self.draggedJoint is not None:
+                        #the closed-form solver may have moved the links since the model last solved.  The model
+                        #belongs to the solver thread while it runs, so it is not resynced here; the end points go
+                        #with the drag instead.
+                        self.mechanismModel()
+                        self.dragEnds = self.linkStore.endpoints().copy()
             if event.type() == qtc.QEvent.GraphicsSceneMouseRelease:
+                #finish the drag at the position the mouse was released at
+                self.moveCoalescer.flush()
                 self.mouseDown = False
+                self.draggedJoint = None
+                self.dragEnds = None
+            if t0: PROFILER.record('eventFilter', t0)
         # pass the event along to the parent widget if there is one.
         return super(MainWindow, self).eventFilter(obj, event)
 
-    def buildScene(self):
+    def setProfiling(self, enabled=True, overlay=False):
+        """
+        Turns the timing hooks on or off.  While on, every eventFilter call, solve, geometry update, item paint and
+        view repaint is recorded in Linkage_Profiler.PROFILER (see PROFILER.exportTrace to save a trace).
+        :param enabled: record timings
+        :param overlay: also show FPS, solve latency and paint counts in the corner of the view
+        """
+        PROFILER.enabled = enabled
+        viewport = self.gv_Main.viewport()
+        if enabled:
+            viewport.installEventFilter(self)
+        else:
+            viewport.removeEventFilter(self)
+        self.scene.showOverlay = enabled and overlay
+        if self.scene.showOverlay:
+            self.overlayTimer.start()
+        else:
+            self.overlayTimer.stop()
+        viewport.update()
+
+    def handleMouseMove(self, positions):
+        """
+        Handles the latest mouse move over the scene (see InputCoalescer): shows the screen and scene coordinates in
+        the window title and, while the left button is down, drags the grabbed joint or the linkage.  With the button
+        up it shows which joint or link is under the mouse.
+        :param positions: (screenPos, scenePos)
+        """
+        screenPos, scenePos = positions
+        strScreen="screen x = {}, screen y = {}".format(screenPos.x(), screenPos.y())
+        strScene=":  scene x = {}, scene y = {}".format(scenePos.x(), scenePos.y())
+        strDropped="  (skipped {} moves)".format(self.moveCoalescer.dropped)
+        strHover=""
+        if self.mouseDown:
+            if self.draggedJoint is not None:
+                self.moveJoint(self.draggedJoint, scenePos.x(), scenePos.y())
+            else:
+                self.dragLinkage(scenePos.x(), scenePos.y())
+        else:
+            strHover=self.hoverAt(scenePos.x(), scenePos.y())
+        self.setWindowTitle(strScreen+strScene+strDropped+strHover)
+
+    def linkageJoints(self):
+        """
+        The joints of the linkage drawn in the scene (see Linkage_SpatialIndex.mergeJoints), found the first time they
+        are needed and again after buildScene or loadFourBar.  The spatial index and the mechanism model are both
+        built from them, so a joint has the same index in each.
+        :return: (links, positions, fixed, starts, ends): the RigidLink items in scene order, then the joints as
+        returned by mergeJoints
+        """
+        if self.linkJoints is None:
+            from Linkage_SpatialIndex import mergeJoints
+            items = self.scene.items(qtc.Qt.AscendingOrder)
+            links = [item for item in items if isinstance(item, RigidLink)]
+            pivots = [item for item in items if isinstance(item, RigidPivotPoint)]
+            self.linkJoints = (links,) + mergeJoints(links, pivots, tolerance=1e-3)
+        return self.linkJoints
+
+    def spatialIndex(self):
+        """
+        A Linkage_SpatialIndex.SpatialGrid of the joints and links of the scene, for finding what is under the mouse
+        without testing every item.  It is built from the items the first time it is needed, without building the
+        mechanism model, and kept up to date as links move (see updateSpatialIndex).
+        :return: a SpatialGrid with keys ('joint', index) and ('link', index), numbered as in linkageJoints
+        """
+        if self.hitIndex is None:
+            from Linkage_SpatialIndex import SpatialGrid
+            links, positions, fixed, starts, ends = self.linkageJoints()
+            #about the length of a link, so most lookups touch one to four cells
+            self.hitIndex = SpatialGrid(cellSize=40.0)
+            self.indexedLinks = {item: k for k, item in enumerate(links)}
+            #joints on links are filed with their links, where the links are now
+            self.updateSpatialIndex(links)
+            for joint in set(range(len(positions))).difference(starts, ends):
+                self.hitIndex.setPoint(('joint', joint), *positions[joint])
+        return self.hitIndex
+
+    def updateSpatialIndex(self, items):
+        """
+        Re-files moved links and their joints in the spatial index.  Entries that stay in the same grid cells, which
+        is most of them for the small moves of a drag, cost a comparison and a tuple.
+        :param items: the RigidLink items that moved
+        """
+        if self.hitIndex is None:
+            return
+        links, positions, fixed, starts, ends = self.linkJoints
+        for item in items:
+            k = self.indexedLinks.get(item)
+            if k is None:
+                continue
+            x0, y0, x1, y1 = item.state[0:4]
+            self.hitIndex.setSegment(('link', k), x0, y0, x1, y1, item.radius)
+            self.hitIndex.setPoint(('joint', starts[k]), x0, y0)
+            self.hitIndex.setPoint(('joint', ends[k]), x1, y1)
+
+    def snapDistance(self):
+        """
+        :return: SNAP_PIXELS in scene units at the current zoom
+        """
+        return SNAP_PIXELS / max(self.gv_Main.transform().m11(), 1e-9)
+
+    def jointAt(self, x, y):
+        """
+        The moving joint nearest to x, y within SNAP_PIXELS, which a press grabs so the drag snaps to it.  The crank
+        tip is left out: a drag that turns the crank goes through moveCrank, as a press anywhere else does.
+        :return: the mechanism's joint index, or None
+        """
+        index = self.spatialIndex()
+        links, positions, fixed, starts, ends = self.linkJoints
+        crankTip = ends[self.indexedLinks[self.link1]]
+        for distance, (kind, joint) in index.query(x, y, self.snapDistance(), kind='point'):
+            if not fixed[joint] and joint != crankTip:
+                return joint
+        return None
+
+    def hoverAt(self, x, y):
+        """
+        Finds the joint, or failing that the link, under the mouse and shows a hand cursor over joints that can be
+        dragged.
+        :return: a description for the window title, or ''
+        """
+        hits = self.spatialIndex().query(x, y, self.snapDistance())
+        links, positions, fixed, starts, ends = self.linkJoints
+        #joints sit on top of the links that meet there
+        hits.sort(key=lambda hit: (hit[1][0] != 'joint', hit[0]))
+        hovered = hits[0][1] if hits else None
+        if hovered != self.hovered:
+            self.hovered = hovered
+            movable = hovered is not None and hovered[0] == 'joint' and not fixed[hovered[1]]
+            self.gv_Main.viewport().setCursor(qtc.Qt.OpenHandCursor if movable else qtc.Qt.ArrowCursor)
+        if hovered is None:
+            return ""
+        if hovered[0] == 'link':
+            return "  over link {} ({})".format(hovered[1], links[hovered[1]].name)
+        return "  over joint {}{}".format(hovered[1], " (ground)" if fixed[hovered[1]] else "")
+
+    def dragLinkage(self, x, y):
+        """
+        The crank (link1) points at x, y and the rest of the linkage follows (see moveCrank).
+        :param x: scene x
+        :param y: scene y
+        """
+        self.moveCrank(math.atan2(-(y-self.link1.startY), x-self.link1.startX))
+
+    def moveCrank(self, angle):
+        """
+        Turns the crank (link1) to angle and places link2 and link3 with the motion table, the closed-form solver or
+        the mechanism model.  If the linkage cannot be assembled there it stays at the last good pose.  With the
+        threaded solver on (see setThreadedSolver) the angle is handed to the solver thread and the links move when
+        its answer comes back.
+        :param angle: crank angle in radians
+        """
+        request = self.crankRequest(angle)
+        if self.solverWorker is not None:
+            self.solverWorker.post(request)
+            return
+        self.applyCrank(angle, self.solveRequest(request), request[3])
+
+    def crankRequest(self, angle):
+        """
+        Everything a crank solve needs, taken on the GUI thread: the solver never reads the window, whose models
+        loadFourBar, buildScene and loadScene replace.  The motion table and the mechanism model are built here if
+        they have to be, since they read the cache and the scene.
+        :param angle: crank angle in radians
+        :return: ('crank', angle, solver, mechanism): a FourBar or FourBarMotionTable and None, or the index of the
+        driven link and the Mechanism
+        """
+        if self.useMechanism:
+            mechanism = self.mechanismModel()
+            return ('crank', angle, mechanism.linkIndex(self.link1), mechanism)
+        return ('crank', angle, self.motionTable() if self.useMotionTable else self.fourBar, None)
+
+    def moveJoint(self, joint, x, y):
+        """
+        Drags a joint of the mechanism model towards x, y; the crank turns and the other links follow as far as the
+        linkage allows (see Linkage_Mechanism.Mechanism.dragJoint).  Goes through the solver thread when it is on.
+        Until a solve has taken them, each request carries the end points the links had when the joint was grabbed
+        (dragEnds), so the solver resyncs the model on its own thread.
+        :param joint: the mechanism's joint index, e.g. from jointAt
+        :param x: scene x
+        :param y: scene y
+        """
+        request = ('joint', joint, x, y, self.dragEnds, self.mechanismModel())
+        if self.solverWorker is not None:
+            self.solverWorker.post(request)
+            return
+        self.dragEnds = None
+        self.applyJoint(self.solveRequest(request), request[5])
+
+    def solveCrank(self, angle, solver, mechanism=None):
+        """
+        Solves the linkage for a crank angle without touching any item or the window, so it can run on the solver
+        thread.
+        :param angle: crank angle in radians
+        :param solver: a FourBar or FourBarMotionTable, or with mechanism the index of its driven link
+        :param mechanism: a Mechanism to solve instead of a four-bar
+        :return: the pose from the motion table or closed-form solver ((xA, yA, xB, yB, theta3, theta4)), the link end
+        points from the mechanism model, or None if the linkage cannot be assembled
+        """
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        if mechanism is not None:
+            mechanism.setDriver(solver, angle)
+            result = mechanism.linkPositions() if mechanism.solve() else None
+        else:
+            result = solver.solve(angle)
+        if t0: PROFILER.record('solve', t0)
+        return result
+
+    def solveJoint(self, joint, x, y, ends, mechanism):
+        """
+        Like solveCrank, for a drag of any joint.  Runs on whichever thread solves.
+        :param ends: end points of the links to start from (see Mechanism.setLinkPositions), or None
+        :param mechanism: the Mechanism to drag
+        :return: the link end points from the mechanism model, or None if the joint cannot follow
+        """
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        if ends is not None:
+            mechanism.setLinkPositions(ends)
+        result = mechanism.linkPositions() if mechanism.dragJoint(joint, x, y) else None
+        if t0: PROFILER.record('solve', t0)
+        return result
+
+    def solveRequest(self, request):
+        """
+        What the solver thread runs: a request from crankRequest or moveJoint, which carries its own models.
+        """
+        if request[0] == 'crank':
+            return self.solveCrank(*request[1:])
+        return self.solveJoint(*request[1:])
+
+    def applyJoint(self, result, mechanism):
+        """
+        Moves the links to a pose found by solveJoint.
+        :param mechanism: the Mechanism that found it
+        """
+        if result is None:
+            return
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        mechanism.applyToItems(result)
+        self.angle1 = self.link1.angle
+        self.angle2 = self.link3.angle
+        self.updateSpatialIndex(self.indexedLinks)
+        if t0: PROFILER.record('geometry', t0)
+        self.prevAlpha=self.angle1
+        self.prevBeta=self.angle2
+        self.updateMotionOverlay()
+
+    def applyCrank(self, angle, result, mechanism=None):
+        """
+        Moves the links to a pose found by solveCrank.
+        :param angle: crank angle in radians
+        :param result: what solveCrank returned for angle
+        :param mechanism: the Mechanism that found it, or None for a four-bar pose
+        """
+        if result is None:
+            #cannot assemble at this crank angle, so stay at the last good pose
+            self.angle1 = self.prevAlpha
+            self.angle2 = self.prevBeta
+            return
+        self.angle1 = angle
+        #each link tells the scene its old and new area, so only those regions are repainted
+        t0 = perf_counter_ns() if PROFILER.enabled else 0
+        if mechanism is not None:
+            mechanism.applyToItems(result)
+            self.angle2 = self.link3.angle
+            self.updateSpatialIndex(self.indexedLinks)
+        else:
+            xA, yA, xB, yB, theta3, self.angle2 = result
+            self.link1.setEndpoints(self.link1.startX, self.link1.startY, xA, yA)
+            self.link3.setEndpoints(self.link3.startX, self.link3.startY, xB, yB)
+            self.link2.setEndpoints(xA, yA, xB, yB)
+            self.updateSpatialIndex((self.link1, self.link2, self.link3))
+        if t0: PROFILER.record('geometry', t0)
+        self.prevAlpha=self.angle1
+        self.prevBeta=self.angle2
+        self.updateMotionOverlay()
+
+    def overlay(self, name, pen=None, headSize=6.0, markerSize=4.0):
+        """
+        The OverlayItem for one style of arrows and markers, created and added above the linkage the first time it is
+        asked for.  Set its data each frame with setArrows, setMarkers, setPath or appendPath; the item is reused.
+        :param name: any key, e.g. 'velocity'
+        :param pen: style used when the item is created
+        :param headSize: arrowhead length in scene units, used when the item is created
+        :param markerSize: marker diameter in scene units, used when the item is created
+        :return: the OverlayItem
+        """
+        item = self.overlays.get(name)
+        if item is None:
+            item = OverlayItem(pen, headSize=headSize, markerSize=markerSize, name=name)
+            item.setZValue(1)
+            self.scene.addItem(item)
+            self.overlays[name] = item
+        return item
+
+    def setMotionOverlay(self, enabled=True, scale=0.5):
+        """
+        Shows the velocity of the crank and rocker tips as arrows and traces the path of the coupler point (its
+        midpoint unless couplerPoint was changed, e.g. by loadFourBar) while the linkage moves.  Velocities are for
+        a crank turning at 1 rad/s.
+        :param enabled:
+        :param scale: seconds of motion an arrow's length stands for
+        """
+        self.motionOverlay = enabled
+        self.motionOverlayScale = scale
+        if enabled:
+            self.overlay('velocity', VELOCITY_PEN)
+            self.overlay('trace', TRACE_PEN).clear()
+            self.updateMotionOverlay()
+        else:
+            for name in ('velocity', 'trace'):
+                if name in self.overlays:
+                    self.overlays[name].clear()
+
+    def updateMotionOverlay(self):
+        """
+        Redraws the motion overlay (see setMotionOverlay) for the current pose.  The velocities are central
+        differences of the closed-form solution about the current crank angle.
+        """
+        if not self.motionOverlay:
+            return
+        h = 1e-4
+        ahead = self.fourBar.solve(self.angle1 + h)
+        behind = self.fourBar.solve(self.angle1 - h)
+        xA, yA, xB, yB = self.link1.endX, self.link1.endY, self.link3.endX, self.link3.endY
+        #looked up through overlay, since rebuilding or loading the scene removes the overlay items
+        velocity = self.overlay('velocity', VELOCITY_PEN)
+        if ahead is None or behind is None:
+            velocity.clear()
+        else:
+            vectors = [[(ahead[i] - behind[i])/(2*h), (ahead[i + 1] - behind[i + 1])/(2*h)] for i in (0, 2)]
+            velocity.setArrows([[xA, yA], [xB, yB]], vectors, scale=self.motionOverlayScale)
+            velocity.setMarkers([[xA, yA], [xB, yB]])
+        along, offset = self.couplerPoint
+        dx = xB - xA
+        dy = yB - yA
+        length = math.hypot(dx, dy) or 1.0
+        #as FourBarPoses.couplerPoint: the left normal of (dx, dy) on screen is (dy, -dx)
+        self.overlay('trace', TRACE_PEN).appendPath([[xA + along*dx + offset*dy/length, yA + along*dy - offset*dx/length]])
+
+    def setThreadedSolver(self, enabled=True):
+        """
+        Moves the solving (solveCrank and solveJoint) to a SolverWorker thread, so that a slow solve never holds up
+        painting or input: the GUI thread only posts crank angles or joint targets and applies the poses that come
+        back.
+        :param enabled: start the solver thread, or stop it and solve on the GUI thread again
+        """
+        if enabled and self.solverWorker is None:
+            self.solverWorker = SolverWorker(self.solveRequest)
+            self.solverWorker.solved.connect(self.onSolved)
+            self.appliedGeneration = 0
+        elif not enabled and self.solverWorker is not None:
+            self.solverWorker.stop()
+            self.solverWorker = None
+
+    def onSolved(self, generation, request, result):
+        """
+        A pose from the solver thread.  Poses older than the last one shown, or posted before the geometry was
+        replaced (see discardSolves), are dropped.
+        """
+        if request[0] == 'joint' and request[4] is not None and request[4] is self.dragEnds:
+            #the solver has resynced the model, so later requests need not
+            self.dragEnds = None
+        if generation <= self.appliedGeneration:
+            return
+        self.appliedGeneration = generation
+        if request[0] == 'crank':
+            self.applyCrank(request[1], result, request[3])
+        else:
+            self.applyJoint(result, request[5])
+
+    def discardSolves(self):
+        """
+        Drops the requests posted to the solver thread so far, for when the geometry they were posted for is replaced:
+        the ones not started are taken out of the mailbox, and a result of one already being solved comes back with a
+        generation onSolved no longer applies.
+        """
+        if getattr(self, 'solverWorker', None) is not None:
+            self.appliedGeneration = self.solverWorker.cancel()
+
+    def closeEvent(self, event):
+        self.setThreadedSolver(False)
+        self.stopAnimation()
+        super().closeEvent(event)
+
+    def startAnimation(self, omega=math.pi, dt=1.0/240.0, record=None):
+        """
+        Turns the crank by itself at an angular velocity profile.  The crank angle is integrated at a fixed time step
+        dt by an AnimationScheduler, and the linkage is redrawn once per screen refresh at the latest angle.
+        :param omega: crank angular velocity in rad/s, a number or a function of time in seconds
+        :param dt: simulation time step in seconds
+        :param record: optional .npy file to stream the trajectory to (see Linkage_Animation.COLUMNS)
+        """
+        from Linkage_Animation import AnimationScheduler, TrajectoryRecorder
+        self.stopAnimation()
+        self.animationOmega = omega
+        self.animationAngle = self.link1.angle
+        self.recorder = None if record is None else TrajectoryRecorder(self.fourBar, record, dt)
+        if self.recorder is not None:
+            self.recorder.append(0.0, self.animationAngle)
+        self.animation = AnimationScheduler(self.stepAnimation, lambda: self.moveCrank(self.animationAngle), dt=dt,
+                                            parent=self)
+        self.animation.start()
+
+    def stepAnimation(self, t, dt):
+        """
+        Advances the crank angle from t to t + dt with the trapezoid rule.
+        """
+        omega = self.animationOmega
+        w0, w1 = (omega(t), omega(t + dt)) if callable(omega) else (omega, omega)
+        self.animationAngle += 0.5*(w0 + w1)*dt
+        if self.recorder is not None:
+            self.recorder.append(t + dt, self.animationAngle)
+
+    def stopAnimation(self):
+        """
+        Stops the animation, if one is running, and finishes its trajectory file.
+        """
+        if self.animation is not None:
+            self.animation.stop()
+            self.animation = None
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def mechanismModel(self):
+        """
+        The scene's links and pivots as a Linkage_Mechanism.Mechanism, driven by link1.  It is built the first time it
+        is needed (numpy and scipy are only loaded then) and again after buildScene.
+        :return: a Mechanism
+        """
+        if self.mechanism is None:
+            from Linkage_Mechanism import Mechanism
+            links, positions, fixed, starts, ends = self.linkageJoints()
+            #the solver moves every link at once through the store
+            self.linkStore = LinkStore(links)
+            mechanism = Mechanism.fromJoints(positions, fixed, starts, ends, items=links)
+            #the links may have moved since their joints were found
+            mechanism.readItems()
+            mechanism.addDriver(self.link1)
+            self.mechanism = mechanism
+        return self.mechanism
+
+    def openDataset(self, folder):
+        """
+        Opens a stored motion (a Linkage_Storage.MotionDataset with the columns xA, yA, xB, yB, e.g. one written by
+        Linkage_Animation.simulate) and shows a slider under the view to scrub through it.  The dataset is memory-mapped,
+        so however large it is only the frames that are shown are read from disk.
+
+        A dataset that carries its FourBar in its metadata is shown on that linkage: it is put in the scene with
+        loadFourBar, and closeDataset puts the linkage that was there back.  A dataset without one has to have been
+        recorded for the linkage in the scene; its first assembled frame is checked against the link lengths.
+        :param folder: the dataset folder
+        """
+        from Linkage_Storage import MotionDataset
+        dataset = MotionDataset(folder)
+        fourBar = dataset.fourBar()
+        if fourBar is None and not self.datasetMatches(dataset, self.fourBar):
+            raise ValueError("{} has no four-bar in its metadata and was not recorded for the linkage in the "
+                             "scene".format(folder))
+        self.stopAnimation()
+        if self.datasetRestore is None:
+            self.datasetRestore = (self.fourBar, self.angle1)
+        if fourBar is not None:
+            self.loadFourBar(fourBar)
+        self.dataset = dataset
+        #a QSlider position is an int, so very long datasets are scrubbed in strides
+        self.datasetStride = max(1, math.ceil(len(self.dataset) / (2**31 - 1)))
+        if self.sld_Frame is None:
+            self.sld_Frame = qtw.QSlider(qtc.Qt.Horizontal, self)
+            self.sld_Frame.setObjectName("sld_Frame")
+            self.verticalLayout.addWidget(self.sld_Frame)
+            self.sld_Frame.valueChanged.connect(lambda value: self.showDatasetFrame(value*self.datasetStride))
+        self.sld_Frame.blockSignals(True)
+        self.sld_Frame.setRange(0, max(len(self.dataset) - 1, 0)//self.datasetStride)
+        self.sld_Frame.setValue(0)
+        self.sld_Frame.blockSignals(False)
+        self.sld_Frame.show()
+        self.showDatasetFrame(0)
+
+    def datasetMatches(self, dataset, fourBar, rows=10000, tolerance=1e-4):
+        """
+        :param dataset: a MotionDataset with the columns xA, yA, xB, yB
+        :param fourBar: the linkage it should have been recorded for
+        :param rows: how many rows to look through for an assembled frame
+        :param tolerance: allowed relative error of the link lengths
+        :return: True if the first assembled frame fits the pivots and link lengths of fourBar (or there is none)
+        """
+        import numpy as np
+        xA, yA, xB, yB = (np.asarray(dataset[name][:rows], dtype=float) for name in ('xA', 'yA', 'xB', 'yB'))
+        assembled = np.flatnonzero(np.isfinite(xA + yA + xB + yB))
+        if assembled.size == 0:
+            return True
+        i = assembled[0]
+        lengths = (math.hypot(xA[i] - fourBar.pivot0X, yA[i] - fourBar.pivot0Y),
+                   math.hypot(xB[i] - xA[i], yB[i] - yA[i]),
+                   math.hypot(xB[i] - fourBar.pivot1X, yB[i] - fourBar.pivot1Y))
+        return all(math.isclose(length, l, rel_tol=tolerance, abs_tol=tolerance)
+                   for length, l in zip(lengths, (fourBar.l1, fourBar.l2, fourBar.l3)))
+
+    def showDatasetFrame(self, index):
+        """
+        Moves the links to a row of the open dataset.  Rows where the linkage could not be assembled are skipped.
+        :param index: row index
+        """
+        if self.dataset is None or len(self.dataset) == 0:
+            return
+        xA, yA, xB, yB = self.dataset.frame(index, ('xA', 'yA', 'xB', 'yB'))
+        if math.isnan(xA + yA + xB + yB):
+            return
+        fourBar = self.fourBar
+        self.link1.setEndpoints(fourBar.pivot0X, fourBar.pivot0Y, xA, yA)
+        self.link3.setEndpoints(fourBar.pivot1X, fourBar.pivot1Y, xB, yB)
+        self.link2.setEndpoints(xA, yA, xB, yB)
+        #a drag after scrubbing carries on from the frame shown
+        self.angle1 = self.prevAlpha = self.link1.angle
+        self.angle2 = self.prevBeta = self.link3.angle
+        self.updateSpatialIndex((self.link1, self.link2, self.link3))
+        self.setWindowTitle("{}  frame {} of {}".format(self.dataset.folder, index, len(self.dataset)))
+
+    def closeDataset(self):
+        """
+        Hides the slider and puts back the linkage and crank angle from before openDataset.
+        """
+        self.dataset = None
+        if self.sld_Frame is not None:
+            self.sld_Frame.hide()
+        if self.datasetRestore is not None:
+            fourBar, angle = self.datasetRestore
+            self.datasetRestore = None
+            self.loadFourBar(fourBar, angle=angle if fourBar.solve(angle) is not None else None)
+
+    def motionTable(self):
+        """
+        The precomputed motion of self.fourBar.  It is built the first time it is needed and rebuilt only after a
+        pivot position, link length or the branch of self.fourBar has changed.  With useCache it comes from the
+        linkage cache when this geometry has been tabulated before, in this session or an earlier one.
+        :return: a FourBarMotionTable
+        """
+        if self.table is None or self.table.fourBar is not self.fourBar or self.table.isStale():
+            cache = self.linkageCache()
+            self.table = FourBarMotionTable(self.fourBar) if cache is None else cache.motionTable(self.fourBar)
+        return self.table
+
+    def loadFourBar(self, fourBar, angle=None, couplerPoint=None):
+        """
+        Puts a four-bar into the scene in place of the one drawn: the ground pivots move to its pivots, link0 joins
+        them, and link1 to link3 take its pose at a crank angle.  The solver models, motion table and hit index of the
+        old geometry are dropped, and so are poses still being solved for it.  Use it to look at a design found by Linkage_Synthesis or Linkage_Explorer, e.g.
+        loadFourBar(result.fourBar(), couplerPoint=result.couplerPoint()).
+        :param fourBar: a FourBar with scalar pivots and lengths
+        :param angle: crank angle in radians, defaults to the current one if the new linkage assembles there, else
+        the first angle of a revolution where it does
+        :param couplerPoint: (along, offset) of the coupler point to trace, or None to keep the current one
+        :return: the crank angle the linkage was put at
+        """
+        if angle is None:
+            angle = self.angle1
+            if fourBar.solve(angle) is None:
+                import numpy as np
+                poses = fourBar.solveBatch(np.deg2rad(np.arange(0.0, 360.0, 1.0)))
+                if not poses.valid.any():
+                    raise ValueError("{} cannot be assembled at any crank angle".format(fourBar.name))
+                angle = float(poses.theta2[poses.valid][0])
+        pose = fourBar.solve(angle)
+        if pose is None:
+            raise ValueError("{} cannot be assembled at crank angle {:0.3f}".format(fourBar.name, angle))
+        self.pivot0.moveTo(fourBar.pivot0X, fourBar.pivot0Y)
+        self.pivot1.moveTo(fourBar.pivot1X, fourBar.pivot1Y)
+        self.link0.setEndpoints(fourBar.pivot0X, fourBar.pivot0Y, fourBar.pivot1X, fourBar.pivot1Y)
+        self.link1.setEndpoints(fourBar.pivot0X, fourBar.pivot0Y, self.link1.endX, self.link1.endY)
+        self.link3.setEndpoints(fourBar.pivot1X, fourBar.pivot1Y, self.link3.endX, self.link3.endY)
+        self.fourBar = fourBar
+        self.table = None
+        self.mechanism = None
+        self.linkJoints = None
+        self.hitIndex = None
+        self.indexedLinks = {}
+        self.dragEnds = None
+        self.discardSolves()
+        if couplerPoint is not None:
+            self.couplerPoint = tuple(couplerPoint)
+        if 'trace' in self.overlays:
+            self.overlays['trace'].clear()
+        self.applyCrank(angle, pose)
+        return angle
+
+    def linkageSummary(self):
+        """
+        :return: the Grashof class and range of motion of self.fourBar (see Linkage_Cache.LinkageCache.summary)
+        """
+        from Linkage_Cache import summarize
+        cache = self.linkageCache()
+        return summarize(self.fourBar) if cache is None else cache.summary(self.fourBar)
+
+    def linkageCache(self):
+        """
+        :return: the LinkageCache, opened the first time it is needed, or None if useCache is off or the cache
+        folder cannot be created
+        """
+        if self.useCache and self.cache is None:
+            from Linkage_Cache import LinkageCache
+            try:
+                self.cache = LinkageCache()
+            except OSError:
+                self.useCache = False
+        return self.cache if self.useCache else None
+
+    def buildScene(self, deferDecorations=False):
+        """
+        Draws the linkage and the decorations around it (the grid).
+        :param deferDecorations: draw the decorations from the event loop, after the window has been shown
+        """
         #clear out the old scene first
         self.scene.clear()
+        self.sceneVersion += 1
+        #a streaming loadScene that was cut short leaves the scene without its index
+        self.scene.setItemIndexMethod(qtw.QGraphicsScene.BspTreeIndex)
 
-        #draw a grid
-        self.drawAGrid(DeltaX=10, DeltaY=10, Height=400, Width=400, Pen=self.penGridLines, Brush=self.brushGrid)
+        if deferDecorations:
+            qtc.QTimer.singleShot(0, self.drawDecorations)
+        else:
+            self.drawDecorations()
         brush = qtg.QBrush()
         brush.setStyle(qtc.Qt.BDiagPattern)
         #self.drawRigidSurface(5,5,45,15, pen=self.penMed,brush=brush)
@@ -412,6 +1721,7 @@ class MainWindow(Ui_Form, qtw.QWidget):
         self.link1=self.drawLinkage(-100,0,-100,-60,5)
         self.link2=self.drawLinkage(-100,-60, 100, -150, 5)
         self.link3=self.drawLinkage(60,-30,100,-150,5)
+        self.resetModels()
 
         #self.link2=self.drawLinkage(5,-5,-55,-60,10, self.penLink)
 
@@ -426,9 +1736,247 @@ class MainWindow(Ui_Form, qtw.QWidget):
         #self.drawATriangle(50,-50,10, pen=self.penMed, brush=self.brushHatch)
         #self.drawAnArrow(0,0,10,-20,pen=self.penMed, brush=self.brushFill)
 
+    def drawDecorations(self):
+        #draw a grid
+        self.drawAGrid(DeltaX=10, DeltaY=10, Height=400, Width=400, Pen=self.penGridLines, Brush=self.brushGrid)
+
+    def resetModels(self, items=None):
+        """
+        Rebuilds what is derived from the links after the scene was rebuilt or loaded: the closed-form solver for the
+        loop, on the branch the linkage is drawn in (the motion table is built from it on the first drag, see
+        motionTable), and drops the solvers, indexes and overlays of the old scene.
+        :param items: the links and pivots of the new scene, if known (see applyItemCaching)
+        """
+        self.fourBar = FourBar.fromLinks(self.link1, self.link2, self.link3)
+        self.table = None
+        self.mechanism = None
+        self.linkStore = None
+        self.linkJoints = None
+        self.hitIndex = None
+        self.indexedLinks = {}
+        #joint numbers and poses of the old scene
+        self.draggedJoint = None
+        self.dragEnds = None
+        self.discardSolves()
+        #the scene was cleared, and the overlay items with it
+        self.overlays = {}
+        #a dataset being scrubbed belongs to the old scene (buildScene runs once before __init__ sets up the slider)
+        self.dataset = None
+        self.datasetRestore = None
+        if getattr(self, 'sld_Frame', None) is not None:
+            self.sld_Frame.hide()
+        self.applyItemCaching(items)
+
+    def saveScene(self, path):
+        """
+        Saves the scene to a compact file (see Linkage_SceneFile): the pivots and links in their current pose, the
+        lines, rectangles, ellipses, polygons and paths drawn around them, the grid, and the pens and brushes of all
+        of it.  Pens and brushes that are attributes of the window (penLink, brushPivot, ...) are saved under their
+        names.  Overlays are not saved; they are drawn again from the pose.
+        :param path: file to write
+        :return: the number of items saved
+        """
+        from Linkage_SceneFile import SceneFile
+        sceneFile = SceneFile()
+        styleNames = {id(value): name for name, value in vars(self).items() if isinstance(value, (qtg.QPen, qtg.QBrush))}
+        roles = {id(getattr(self, role)): role for role in SCENE_ROLES if getattr(self, role, None) is not None}
+
+        def pen(value):
+            return sceneFile.addPen(value, styleNames.get(id(value)))
+
+        def brush(value):
+            return sceneFile.addBrush(value, styleNames.get(id(value)))
+        #bottom to top, so items that share a z value stack the same way when they are added back in this order
+        for item in self.scene.items(qtc.Qt.AscendingOrder):
+            if item.parentItem() is not None:
+                continue
+            z = item.zValue()
+            if isinstance(item, RigidPivotPoint):
+                sceneFile.add('pivots', (item.x, item.y, item.height, item.width, item.rotationAngle, z),
+                              pen(item.pen), brush(item.brush), roles.get(id(item)))
+            elif isinstance(item, RigidLink):
+                sceneFile.add('links', tuple(item.state[:4]) + (item.radius, z), pen(item.pen), brush(item.brush),
+                              roles.get(id(item)))
+            elif isinstance(item, qtw.QGraphicsLineItem):
+                line = item.line().translated(item.pos())
+                sceneFile.add('lines', (line.x1(), line.y1(), line.x2(), line.y2(), z), pen(item.pen()))
+            elif isinstance(item, (qtw.QGraphicsRectItem, qtw.QGraphicsEllipseItem)):
+                rect = item.rect().translated(item.pos())
+                sceneFile.add('rects' if isinstance(item, qtw.QGraphicsRectItem) else 'ellipses',
+                              (rect.left(), rect.top(), rect.width(), rect.height(), z), pen(item.pen()),
+                              brush(item.brush()))
+            elif isinstance(item, qtw.QGraphicsPolygonItem):
+                sceneFile.addPolygon(item.polygon().translated(item.pos()), z, pen(item.pen()), brush(item.brush()))
+            elif isinstance(item, qtw.QGraphicsPathItem):
+                sceneFile.addPath(item.path().translated(item.pos()), z, pen(item.pen()), brush(item.brush()))
+        if self.scene.gridRect is not None:
+            sceneFile.setGrid(self.scene.gridRect, self.scene.gridDx, self.scene.gridDy, pen(self.scene.gridPen),
+                              brush(self.scene.gridBrush))
+        rect = self.scene.sceneRect()
+        sceneFile.sceneRect = [rect.left(), rect.top(), rect.width(), rect.height()]
+        sceneFile.save(path)
+        return len(sceneFile)
+
+    def loadScene(self, path, deferDecorations=False, batchSize=SCENE_LOAD_BATCH):
+        """
+        Replaces the scene with one saved by saveScene.  The items are built table by table with the scene's index
+        turned off, and the index is rebuilt once at the end.  Items that shared a pen or brush when saved share one
+        object again, and the window's named pens and brushes are restyled in place and reused.  A file that does not
+        name every item of SCENE_ROLES is refused before the scene is touched.
+
+        The items are built with the garbage collector paused, and links build what they draw when first painted
+        (see RigidLink), so a load costs about as much as building the scene with drawLinkage, drawPivot and the like:
+        benchSceneFile puts both at 0.2 to 0.3 s for 30,000 items, index included.  The first paint of a scene that
+        is all in view, which builds the links' drawing, takes about another half second.
+
+        With deferDecorations the pivots, links and grid are put up first and the decorations (everything that is not
+        a pivot or link) are added from the event loop, batchSize items per turn, so a large file shows its
+        mechanism at once and stays responsive while the rest streams in.  The index is rebuilt after the last batch.
+        The decorations are added hidden and shown together after the last batch: a batch of visible items spread
+        over the view makes it repaint everything on it, the mechanism included, once per turn.
+        :param path: file written by saveScene
+        :param deferDecorations: stream the decorations in from the event loop
+        :param batchSize: decoration items per turn of the event loop
+        :return: the number of items in the file
+        """
+        from Linkage_SceneFile import SceneFile, MECHANISM_KINDS
+        sceneFile = SceneFile.load(path)
+        missing = sceneFile.missingRoles(SCENE_ROLES)
+        if missing:
+            raise ValueError("{} has no {} for the linkage".format(path, ", ".join(missing)))
+        pens, brushes = sceneFile.makeStyles(vars(self))
+
+        self.scene.clear()
+        self.sceneVersion += 1
+        version = self.sceneVersion
+        self.scene.setItemIndexMethod(qtw.QGraphicsScene.NoIndex)
+        if sceneFile.sceneRect is not None:
+            self.scene.setSceneRect(*sceneFile.sceneRect)
+        items = {kind: self.createSceneItems(sceneFile, kind, 0, len(sceneFile.tables[kind]), pens, brushes)
+                 for kind in MECHANISM_KINDS}
+        for role, (kind, row) in sceneFile.roles.items():
+            if role in SCENE_ROLES:
+                setattr(self, role, items[kind][row])
+        self.resetModels([item for kind in MECHANISM_KINDS for item in items[kind]])
+        self.prevAlpha = self.link1.angle
+        self.prevBeta = self.link3.angle
+        #the grid is drawn as the background, so it goes up with the mechanism and costs no repaint later
+        grid = sceneFile.grid
+        if grid is not None:
+            self.scene.setGrid(*grid['rect'], grid['dx'], grid['dy'],
+                               pen=pens[grid['pen']] if grid['pen'] >= 0 else None,
+                               brush=brushes[grid['brush']] if grid['brush'] >= 0 else None)
+
+        batches = self.decorationBatches(sceneFile, pens, brushes, batchSize, hidden=deferDecorations)
+        if not deferDecorations:
+            #run the generator to the end
+            collections.deque(batches, maxlen=0)
+            self.scene.setItemIndexMethod(qtw.QGraphicsScene.BspTreeIndex)
+        else:
+            def addBatch():
+                #stop if the scene was rebuilt or loaded again while the decorations were streaming in
+                if version != self.sceneVersion:
+                    return
+                if next(batches, None) is None:
+                    self.scene.setItemIndexMethod(qtw.QGraphicsScene.BspTreeIndex)
+                else:
+                    qtc.QTimer.singleShot(0, addBatch)
+            qtc.QTimer.singleShot(0, addBatch)
+        return len(sceneFile)
+
+    def decorationBatches(self, sceneFile, pens, brushes, batchSize, hidden=False):
+        """
+        Adds the decoration items of a scene file, batchSize at a time.
+        :param hidden: add the items hidden and show them all once the last batch is in
+        :return: a generator that adds one batch per step and yields the number of items it added
+        """
+        from Linkage_SceneFile import DECORATION_KINDS
+        paths = sceneFile.paths()
+        added = []
+        #every batch makes the view repaint what is there so far, so batches run across the tables
+        room = batchSize
+        for kind in DECORATION_KINDS:
+            first = 0
+            while first < len(sceneFile.tables[kind]):
+                last = first + room
+                items = self.createSceneItems(sceneFile, kind, first, last, pens, brushes, paths, not hidden)
+                if hidden:
+                    added += items
+                room -= len(items)
+                first = last
+                if room <= 0:
+                    yield batchSize
+                    room = batchSize
+        if room < batchSize:
+            yield batchSize - room
+        #on the step that ends the generator, so the view repaints once for these and the index rebuild after it
+        for item in added:
+            item.setVisible(True)
+
+    def createSceneItems(self, sceneFile, kind, first, last, pens, brushes, paths=None, visible=True):
+        """
+        Builds the items of rows first to last of one table of a scene file and adds them to the scene.
+        :param paths: for the paths table, the generator of its QPainterPaths (see SceneFile.paths), read in order
+        :param visible: add the items hidden if False, so the scene has nothing to repaint for them
+        :return: list of the items
+        """
+        #every item made here is kept, so a garbage collection during the build finds nothing to free, yet with tens
+        #of thousands of items alive each one costs more than building the items does
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            return self.buildSceneItems(sceneFile, kind, first, last, pens, brushes, paths, visible)
+        finally:
+            if collecting:
+                gc.enable()
+
+    def buildSceneItems(self, sceneFile, kind, first, last, pens, brushes, paths, visible):
+        """
+        createSceneItems with the garbage collector off.
+        """
+        rows = sceneFile.tables[kind][first:last].tolist()
+        styles = sceneFile.styles[kind][first:last].tolist()
+        #None at index -1, so a missing pen or brush needs no test per item
+        pens = list(pens) + [None]
+        brushes = list(brushes) + [None]
+        if kind == 'pivots':
+            items = [RigidPivotPoint(x, y, height, width, pen=pens[pen], brush=brushes[brush], rotation=rotation)
+                     for (x, y, height, width, rotation, z), (pen, brush) in zip(rows, styles)]
+        elif kind == 'links':
+            items = [RigidLink(startX, startY, endX, endY, radius, pen=pens[pen], brush=brushes[brush])
+                     for (startX, startY, endX, endY, radius, z), (pen, brush) in zip(rows, styles)]
+        else:
+            if kind == 'lines':
+                items = [qtw.QGraphicsLineItem(*row[:4]) for row in rows]
+            elif kind == 'rects':
+                items = [qtw.QGraphicsRectItem(*row[:4]) for row in rows]
+            elif kind == 'ellipses':
+                items = [qtw.QGraphicsEllipseItem(*row[:4]) for row in rows]
+            elif kind == 'polygons':
+                points = sceneFile.points
+                items = [qtw.QGraphicsPolygonItem(qtg.QPolygonF(
+                    [qtc.QPointF(x, y) for x, y in points[int(start):int(start) + int(count)].tolist()]))
+                    for start, count, z in rows]
+            else:
+                items = [qtw.QGraphicsPathItem(next(paths)) for row in rows]
+            for item, (pen, brush) in zip(items, styles):
+                if pen >= 0:
+                    item.setPen(pens[pen])
+                if brush >= 0 and kind != 'lines':
+                    item.setBrush(brushes[brush])
+        addItem = self.scene.addItem
+        for item, row in zip(items, rows):
+            if row[-1] != 0.0:
+                item.setZValue(row[-1])
+            if not visible:
+                item.setVisible(False)
+            addItem(item)
+        return items
+
     def drawAGrid(self, DeltaX=10, DeltaY=10, Height=200, Width=200, CenterX=0, CenterY=0, Pen=None, Brush=None, SubGrid=None):
         """
-        This makes a grid for reference.  No snapping to grid enabled.
+        This makes a grid for reference.  No snapping to grid enabled.  The grid is not made of items: the scene
+        draws it as its background (see GridScene), thinning out the lines when zoomed out.
         :param DeltaX: grid spacing in x direction
         :param DeltaY: grid spacing in y direction
         :param Height: height of grid (y)
@@ -443,31 +1991,8 @@ class MainWindow(Ui_Form, qtw.QWidget):
         height = self.scene.sceneRect().height() if Height is None else Height
         width = self.scene.sceneRect().width() if Width is None else Width
         left = self.scene.sceneRect().left() if CenterX is None else (CenterX - width / 2.0)
-        right = self.scene.sceneRect().right() if CenterX is None else (CenterX + width / 2.0)
         top = self.scene.sceneRect().top() if CenterY is None else (CenterY - height / 2.0)
-        bottom = self.scene.sceneRect().bottom() if CenterY is None else (CenterY + height / 2.0)
-        Dx = DeltaX
-        Dy = DeltaY
-        pen = qtg.QPen() if Pen is None else Pen
-
-        # make the background rectangle first
-        if Brush is not None:
-            rect = self.drawARectangle(left, top, width, height)
-            rect.setBrush(Brush)
-            rect.setPen(pen)
-
-        # draw the vertical grid lines
-        x = left
-        while x <= right:
-            lVert = self.drawALine(x, top, x, bottom)
-            lVert.setPen(pen)
-            x += Dx
-        # draw the horizontal grid lines
-        y = top
-        while y <= bottom:
-            lHor = self.drawALine(left, y, right, y)
-            lHor.setPen(pen)
-            y += Dy
+        self.scene.setGrid(left, top, width, height, DeltaX, DeltaY, pen=Pen, brush=Brush)
 
     def drawARectangle(self, leftX, topY, widthX, heightY, pen=None, brush=None):
 
@@ -531,12 +2056,24 @@ class MainWindow(Ui_Form, qtw.QWidget):
         return PG
 
     def drawAnArrow(self, startX, startY, endX, endY, pen=None, brush=None):
-        line=qtw.QGraphicsLineItem(startX, startY, endX, endY)
-        p=qtg.QPen() if pen is None else pen
-        line.setPen(pen)
-        angleDeg=180.0/math.pi*math.atan((endY-startY)/(endX-startX))
-        self.scene.addItem(line)
-        self.drawATriangle(endX, endY, 5, angleDeg=angleDeg,pen=pen, brush=brush)
+        """
+        Draws an arrow as one item: the shaft and a triangular head at the end point, in one path.  For many arrows
+        that change every frame use an OverlayItem (see overlay) instead.
+        :return: the QGraphicsPathItem
+        """
+        path=qtg.QPainterPath()
+        path.moveTo(startX, startY)
+        path.lineTo(endX, endY)
+        #atan2 handles vertical arrows and points the head the right way in every quadrant
+        angleDeg=180.0/math.pi*math.atan2(endY-startY, endX-startX)
+        pts=[qtc.QPointF(*self.polarToRect(endX, endY, 5, a+angleDeg)) for a in (0, 120, 240, 0)]
+        path.addPolygon(qtg.QPolygonF(pts))
+        arrow=qtw.QGraphicsPathItem(path)
+        arrow.setPen(qtg.QPen() if pen is None else pen)
+        if brush is not None:
+            arrow.setBrush(brush)
+        self.scene.addItem(arrow)
+        return arrow
 
     def drawRigidSurface(self, centerX, centerY, Width=10, Height=3, pen=None, brush=None):
         """
@@ -568,17 +2105,136 @@ class MainWindow(Ui_Form, qtw.QWidget):
         return pivot
 
     def pickAColor(self):
-        cdb=qtw.QColorDialog(self)
-        c=cdb.getColor()
+        c=qtw.QColorDialog.getColor(self.penGridLines.color(), self)
+        if not c.isValid():
+            return  # the dialog was cancelled
         hsv=c.getHsv()
         self.pushButton.setText(str(hsv))
         self.penGridLines.setColor(qtg.QColor.fromHsv(hsv[0],hsv[1],hsv[2],hsv[3]))
-        self.buildScene()
-        pass
+        self.applyStyle(pen=self.penGridLines)
+
+    def applyStyle(self, pen=None, brush=None):
+        """
+        Pushes a pen and/or brush that was changed in place to everything in the scene drawn with it: the grid and
+        any links or pivots that share the same QPen/QBrush object.  The items are kept as they are, so the linkage
+        stays in its current pose, and Qt repaints the changed regions once when control returns to the event loop.
+        :param pen: a pen that was modified
+        :param brush: a brush that was modified
+        """
+        if (pen is not None and self.scene.gridPen is pen) or (brush is not None and self.scene.gridBrush is brush):
+            self.scene.setGridStyle(self.scene.gridPen, self.scene.gridBrush)
+        for item in self.scene.items():
+            if isinstance(item, (RigidLink, RigidPivotPoint)):
+                if pen is not None and item.pen is pen:
+                    item.setPen(pen)
+                if brush is not None and item.brush is brush:
+                    item.setBrush(brush)
 
     def setZoom(self):
-        self.gv_Main.resetTransform()
-        self.gv_Main.scale(self.spnd_Zoom.value(), self.spnd_Zoom.value())
+        #one transform change instead of a reset followed by a scale
+        zoom = self.spnd_Zoom.value()
+        self.gv_Main.setTransform(qtg.QTransform.fromScale(zoom, zoom))
+
+    def setRenderProfile(self, profile):
+        """
+        Applies a render profile to the view and the items in the scene.  Items drawn later pick it up in buildScene.
+        :param profile: a RenderProfile or the name of one in RENDER_PROFILES
+        :return: True if rendering goes through OpenGL
+        """
+        if isinstance(profile, str):
+            profile = RENDER_PROFILES[profile]
+        self.renderProfile = profile
+        view = self.gv_Main
+        useOpenGL = profile.openGL and openGLAvailable()
+        if useOpenGL != isinstance(view.viewport(), qtw.QOpenGLWidget):
+            #the view takes ownership of the new viewport and deletes the old one
+            view.setViewport(qtw.QOpenGLWidget() if useOpenGL else qtw.QWidget())
+            view.viewport().setMouseTracking(True)
+            if PROFILER.enabled:
+                view.viewport().installEventFilter(self)
+        #a profile's full viewport updates are only worth it on a GL viewport; without GL fall back to minimal updates
+        fallback = profile.openGL and not useOpenGL
+        view.setViewportUpdateMode(qtw.QGraphicsView.MinimalViewportUpdate if fallback else profile.updateMode)
+        view.setRenderHint(qtg.QPainter.Antialiasing, profile.antialiasing)
+        view.setCacheMode(qtw.QGraphicsView.CacheBackground if profile.backgroundCache
+                          else qtw.QGraphicsView.CacheNone)
+        view.resetCachedContent()
+        self.applyItemCaching()
+        return useOpenGL
+
+    def applyItemCaching(self, items=None):
+        """
+        Sets the cache mode of every link and pivot in the scene from the render profile.
+        :param items: only these items, which have just been created (e.g. the ones just loaded), instead of looking
+        through the whole scene
+        """
+        profile = self.renderProfile
+        if items is not None and profile.pivotCache == profile.linkCache == qtw.QGraphicsItem.NoCache:
+            #new items are not cached to begin with
+            return
+        for item in self.scene.items() if items is None else items:
+            if isinstance(item, RigidPivotPoint):
+                item.setCacheMode(self.renderProfile.pivotCache)
+            elif isinstance(item, RigidLink):
+                item.setCacheMode(self.renderProfile.linkCache)
+#endregion
+
+#region function definitions
+def openGLAvailable():
+    """
+    :return: True if an OpenGL context can be created, which is not the case on e.g. the offscreen platform or a
+    machine without GL drivers
+    """
+    return qtg.QOpenGLContext().create()
+
+def linkPens(pen):
+    """
+    The pens a RigidLink draws with besides its own: its center line, dash-dotted in a faded version of the link
+    color, and the line it is reduced to when only a few pixels wide, in the link color at a fixed width on screen.
+    They only depend on the color, so links of the same color share them.
+    :param pen: the link's pen or None
+    :return: centerLinePen, linePen
+    """
+    color = pen.color() if pen is not None else qtg.QColor(qtc.Qt.black)
+    key = (color.rgba(), pen is None, LOD_LINE_PIXELS)
+    pens = LINK_PENS.get(key)
+    if pens is None:
+        centerLinePen = qtg.QPen()
+        centerLinePen.setStyle(qtc.Qt.DashDotLine)
+        if pen is not None:
+            red,green,blue,alpha=color.getRgb()
+            centerLinePen.setColor(qtg.QColor(red,green,blue,128))
+        centerLinePen.setWidth(1)
+        linePen = qtg.QPen(color, LOD_LINE_PIXELS)
+        linePen.setCosmetic(True)
+        linePen.setCapStyle(qtc.Qt.RoundCap)
+        pens = LINK_PENS[key] = (centerLinePen, linePen)
+    return pens
+#endregion
+
+#region globals
+#the pens a link derives from its pen, by color (see linkPens), and the outlines of pivots by size and stroke (see
+#RigidPivotPoint.updateGeometry).  They are only read when painting, so the items drawn alike share them.
+LINK_PENS = {}
+PIVOT_SHAPES = {}
+PIVOT_OUTLINE_PEN = qtg.QPen(qtc.Qt.NoPen)
+PIVOT_HATCH_BRUSH = qtg.QBrush(qtc.Qt.BDiagPattern)
+#the styles of the motion overlay (see MainWindow.setMotionOverlay)
+VELOCITY_PEN = qtg.QPen(qtc.Qt.darkRed, 1.5)
+TRACE_PEN = qtg.QPen(qtc.Qt.darkMagenta, 1)
+#render profiles to choose from with MainWindow.setRenderProfile
+RENDER_PROFILES = {profile.name: profile for profile in (
+    #Qt's defaults, apart from the grid kept in the background cache
+    RenderProfile('default'),
+    #static items cached as pixmaps and only the changed items' bounding rects repainted
+    RenderProfile('cached', pivotCache=qtw.QGraphicsItem.DeviceCoordinateCache,
+                  updateMode=qtw.QGraphicsView.SmartViewportUpdate),
+    #smooth edges, with caching to pay for them
+    RenderProfile('quality', pivotCache=qtw.QGraphicsItem.DeviceCoordinateCache,
+                  updateMode=qtw.QGraphicsView.SmartViewportUpdate, antialiasing=True),
+    #GPU rendering; a GL viewport redraws whole frames anyway, so partial updates gain nothing
+    RenderProfile('opengl', updateMode=qtw.QGraphicsView.FullViewportUpdate, openGL=True, antialiasing=True),
+)}
 #endregion
 
 #region function calls
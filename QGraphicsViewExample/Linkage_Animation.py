@@ -0,0 +1,236 @@
+#region imports
+import argparse
+import math
+import sys
+import numpy as np
+import PyQt5.QtCore as qtc
+from Linkage_Kinematics import FourBar, OPEN
+from Linkage_Storage import MotionDataset, NpyStreamWriter, fourBarMetadata
+#endregion
+
+#region constants
+#the columns of a trajectory file.  A and B are the moving joints of the four-bar (the crank tip and the rocker tip),
+#positions are in scene coordinates, velocities and accelerations in scene units per second (squared) and angles in
+#radians.  Rows where the linkage cannot be assembled are nan.
+COLUMNS = ('t', 'theta2', 'theta3', 'theta4',
+           'xA', 'yA', 'xB', 'yB',
+           'vxA', 'vyA', 'vxB', 'vyB',
+           'axA', 'ayA', 'axB', 'ayB')
+#endregion
+
+#region class definitions
+class TrajectoryRecorder:
+    def __init__(self, fourBar, path, dt, blockSize=4096, dataset=False):
+        """
+        Streams the motion of a four-bar to a .npy file or a MotionDataset (see COLUMNS).  Crank angles are collected in a fixed size
+        buffer; each full buffer is solved in one FourBar.solveBatch call, joint velocities and accelerations are taken
+        by central differences over the fixed time step, and the rows are appended to the file.  The last two samples
+        of a block are carried into the next one so the differences are central across block boundaries too.
+        :param fourBar: the FourBar being driven
+        :param path: .npy file to write, or the folder of the dataset
+        :param dt: time step between samples in seconds
+        :param blockSize: samples per solve and write
+        :param dataset: write a MotionDataset, with the four-bar and dt in its metadata, instead of one .npy file
+        """
+        self.fourBar = fourBar
+        self.dt = dt
+        if dataset:
+            self.writer = MotionDataset.create(path, COLUMNS, {'fourBar': fourBarMetadata(fourBar), 'dt': dt})
+        else:
+            self.writer = NpyStreamWriter(path, len(COLUMNS))
+        self.t = np.empty(blockSize + 2)
+        self.theta2 = np.empty(blockSize + 2)
+        self.count = 0
+        self.first = True
+        #the acceleration of the last row written, for a final flush with nothing past it to take one from
+        self.lastAcceleration = None
+
+    def append(self, t, theta2):
+        """
+        :param t: time or array of times, one step apart
+        :param theta2: crank angle or array of crank angles
+        """
+        t = np.atleast_1d(t)
+        theta2 = np.atleast_1d(theta2)
+        done = 0
+        while done < len(t):
+            n = min(len(t) - done, len(self.t) - self.count)
+            self.t[self.count:self.count + n] = t[done:done + n]
+            self.theta2[self.count:self.count + n] = theta2[done:done + n]
+            self.count += n
+            done += n
+            if self.count == len(self.t):
+                self.flush()
+
+    def flush(self, final=False):
+        """
+        Writes the buffered samples that have both neighbours (all of them when final) and keeps the last two.
+        """
+        n = self.count
+        if n == 0:
+            return
+        t = self.t[:n]
+        poses = self.fourBar.solveBatch(self.theta2[:n])
+        P = np.column_stack((poses.xA, poses.yA, poses.xB, poses.yB))
+        V = np.zeros_like(P)
+        A = np.zeros_like(P)
+        if n > 1:
+            V = np.gradient(P, self.dt, axis=0)
+        if n > 2:
+            A[1:-1] = (P[2:] - 2.0 * P[1:-1] + P[:-2]) / (self.dt * self.dt)
+            A[0] = A[1]
+            A[-1] = A[-2]
+        elif self.lastAcceleration is not None:
+            #only the two samples carried over, so the last row's neighbour is the last row of the previous block
+            A[:] = self.lastAcceleration
+        rows = np.column_stack((t, poses.theta2, poses.theta3, poses.theta4, P, V, A))
+        start = 0 if self.first else 1
+        end = n if final else n - 1
+        self.writer.append(rows[start:end])
+        if end > start:
+            self.lastAcceleration = A[end - 1].copy()
+        if not final and n >= 2:
+            self.t[:2] = self.t[n - 2:n]
+            self.theta2[:2] = self.theta2[n - 2:n]
+            self.count = 2
+            self.first = False
+        elif final:
+            self.count = 0
+
+    def close(self):
+        self.flush(final=True)
+        self.writer.close()
+
+    @property
+    def rows(self):
+        return self.writer.rows
+
+class AnimationScheduler(qtc.QObject):
+    def __init__(self, step, render, dt=1.0/240.0, interval=None, maxStepsPerTick=50, parent=None):
+        """
+        Runs a simulation at a fixed time step independently of how often the screen is redrawn.  A timer ticks at
+        the display rate; each tick measures the real time since the last one and calls step(t, dt) as many times
+        as needed to catch the simulation up, then calls render() once.  The simulation therefore advances by exactly
+        dt per step whatever the frame rate, and slow frames cost rendering, not simulation accuracy.  If the
+        simulation cannot keep up (more than maxStepsPerTick steps are owed) the backlog is dropped rather than
+        letting it grow without bound.
+        :param step: callable(t, dt) that advances the simulation from time t to t + dt
+        :param render: callable() that shows the latest state
+        :param dt: simulation time step in seconds
+        :param interval: render tick in ms, defaults to one frame at the primary screen's refresh rate
+        :param maxStepsPerTick: most steps run in one tick
+        :param parent:
+        """
+        super().__init__(parent)
+        self.step = step
+        self.render = render
+        self.dt = dt
+        self.maxStepsPerTick = maxStepsPerTick
+        if interval is None:
+            import PyQt5.QtGui as qtg
+            screen = qtg.QGuiApplication.primaryScreen()
+            rate = screen.refreshRate() if screen is not None else 0
+            interval = 1000.0/rate if rate > 0 else 1000.0/60.0
+        self.timer = qtc.QTimer(self)
+        self.timer.setTimerType(qtc.Qt.PreciseTimer)
+        self.timer.setInterval(max(int(round(interval)), 1))
+        self.timer.timeout.connect(self.tick)
+        self.clock = qtc.QElapsedTimer()
+        self.t = 0.0
+        self.owed = 0.0
+        self.steps = 0
+        self.frames = 0
+        self.droppedSteps = 0
+
+    def start(self):
+        self.clock.start()
+        self.owed = 0.0
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def isActive(self):
+        return self.timer.isActive()
+
+    def tick(self):
+        self.owed += self.clock.nsecsElapsed() / 1e9
+        self.clock.restart()
+        n = int(self.owed / self.dt)
+        if n > self.maxStepsPerTick:
+            self.droppedSteps += n - self.maxStepsPerTick
+            self.owed -= (n - self.maxStepsPerTick) * self.dt
+            n = self.maxStepsPerTick
+        for i in range(n):
+            self.step(self.t, self.dt)
+            self.t += self.dt
+            self.steps += 1
+        self.owed -= n * self.dt
+        self.render()
+        self.frames += 1
+#endregion
+
+#region function definitions
+def crankAngles(omega, t, theta0):
+    """
+    Integrates a crank angular velocity profile over a block of evenly spaced times with the trapezoid rule.
+    :param omega: angular velocity in rad/s, a number or a function of time that accepts numpy arrays
+    :param t: array of times, the first being the time of theta0
+    :param theta0: crank angle at t[0]
+    :return: array of crank angles at t
+    """
+    w = np.broadcast_to(omega(t) if callable(omega) else omega, t.shape).astype(float)
+    increments = 0.5 * (w[1:] + w[:-1]) * np.diff(t)
+    return theta0 + np.concatenate(([0.0], np.cumsum(increments)))
+
+def simulate(fourBar, omega, duration, dt, path, theta0=0.0, blockSize=4096, dataset=False):
+    """
+    A headless run: drives the crank of a four-bar with an angular velocity profile for duration seconds at a fixed
+    time step and streams the trajectory to a .npy file or a MotionDataset (see COLUMNS).  No QApplication is needed.
+    :param fourBar: a FourBar
+    :param omega: crank angular velocity in rad/s, a number or a function of time that accepts numpy arrays
+    :param duration: seconds
+    :param dt: time step in seconds
+    :param path: .npy file to write, or the folder of the dataset
+    :param theta0: crank angle at t = 0
+    :param blockSize: steps integrated, solved and written at a time
+    :param dataset: write a MotionDataset instead of one .npy file
+    :return: the number of rows written
+    """
+    steps = int(round(duration / dt)) + 1
+    recorder = TrajectoryRecorder(fourBar, path, dt, blockSize, dataset)
+    theta = theta0
+    for k0 in range(0, steps, blockSize):
+        k1 = min(k0 + blockSize, steps)
+        #integrate from the last step of the previous block, which is not written again
+        t = np.arange(max(k0 - 1, 0), k1) * dt
+        angles = crankAngles(omega, t, theta)
+        if k0:
+            t = t[1:]
+            angles = angles[1:]
+        recorder.append(t, angles)
+        theta = angles[-1]
+    recorder.close()
+    return recorder.rows
+#endregion
+
+#region function calls
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drive the crank of the linkage drawn by GraphicsView_App and write "
+                                                 "its trajectory to a .npy file.")
+    parser.add_argument('output', help=".npy file (or dataset folder) for the trajectory")
+    parser.add_argument('--omega', type=float, default=2.0 * math.pi, help="crank speed at t = 0 in rad/s")
+    parser.add_argument('--alpha', type=float, default=0.0, help="constant crank angular acceleration in rad/s^2")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds")
+    parser.add_argument('--dt', type=float, default=1.0 / 240.0, help="time step in seconds")
+    parser.add_argument('--dataset', action='store_true', help="write a memory-mapped MotionDataset folder")
+    parser.add_argument('--theta0', type=float, default=90.0, help="crank angle at t = 0 in degrees")
+    args = parser.parse_args()
+
+    #the four-bar from MainWindow.buildScene
+    template = FourBar(-100, 0, 60, -30, 60, math.hypot(200, 90), math.hypot(40, 120), branch=OPEN)
+    profile = args.omega if args.alpha == 0.0 else (lambda t: args.omega + args.alpha * t)
+    n = simulate(template, profile, args.duration, args.dt, args.output, theta0=math.radians(args.theta0),
+                 dataset=args.dataset)
+    print("wrote {} steps of {} columns to {}".format(n, len(COLUMNS), args.output), file=sys.stderr)
+#endregion
@@ -0,0 +1,1110 @@
+#region imports
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from Linkage_Kinematics import FourBar, FourBarMotionTable, OPEN
+#endregion
+
+#region function definitions
+openWindows = []
+
+def demoFourBar():
+    """
+    The four-bar drawn by MainWindow.buildScene.
+    :return: a FourBar
+    """
+    return FourBar(-100, 0, 60, -30, 60, math.hypot(200, 90), math.hypot(40, 120), branch=OPEN)
+
+def dyadChain(loops):
+    """
+    A one degree of freedom mechanism of 2*loops + 1 moving links: the crank and coupler of a four-bar, then a chain of
+    dyads, each hung from the previous loop's moving joint and a new ground pivot.
+    :param loops: number of closed loops
+    :return: (Mechanism, index of the crank link)
+    """
+    from Linkage_Mechanism import Mechanism
+    m = Mechanism(name='dyadChain{}'.format(loops))
+    ground = m.addJoint(0, 0, fixed=True)
+    previous = m.addJoint(0, -40)
+    crank = m.addLink(ground, previous)
+    for k in range(1, loops + 1):
+        ground = m.addJoint(80 * k, 0, fixed=True)
+        joint = m.addJoint(80 * k + 10, -70)
+        m.addLink(previous, joint)
+        m.addLink(ground, joint)
+        previous = joint
+    m.addDriver(crank)
+    return m, crank
+
+def solveWithFsolve(fourBar, theta2, guess):
+    """
+    The solve that MainWindow.eventFilter used to do on every mouse move: build a closure for the length error of
+    link2 and hand it to scipy.optimize.fsolve starting from the previous rocker angle.
+    :return: the rocker angle, or None if fsolve did not close the loop
+    """
+    from scipy import optimize
+    l2 = fourBar.l2
+    l3 = fourBar.l3
+    x1 = fourBar.pivot0X + fourBar.l1 * math.cos(theta2)
+    y1 = fourBar.pivot0Y - fourBar.l1 * math.sin(theta2)
+    lTest = [l2]
+    def fn1(angle2):
+        x2 = fourBar.pivot1X + l3 * math.cos(angle2[0])
+        y2 = fourBar.pivot1Y - l3 * math.sin(angle2[0])
+        lTest[0] = math.sqrt(math.pow(x2 - x1, 2) + math.pow(y2 - y1, 2))
+        return l2 - lTest[0]
+    result = optimize.fsolve(fn1, [guess])
+    return result[0] if abs(lTest[0] - l2) <= 0.001 else None
+
+def benchSolver(number=2000):
+    """
+    Times one position solve per call for the fsolve path, the closed-form path and the motion table lookup over a
+    sweep of crank angles.
+    :param number: number of solves per path
+    :return: dict of microseconds per solve for each path
+    """
+    fourBar = demoFourBar()
+    angles = [math.pi / 2 + 0.5 * math.sin(2 * math.pi * i / number) for i in range(number)]
+    guess = [fourBar.solve(angles[0])[5]]
+
+    def runFsolve():
+        for theta2 in angles:
+            theta4 = solveWithFsolve(fourBar, theta2, guess[0])
+            if theta4 is not None: guess[0] = theta4
+
+    def runClosedForm():
+        for theta2 in angles:
+            fourBar.solve(theta2)
+
+    table = FourBarMotionTable(fourBar)
+    def runMotionTable():
+        for theta2 in angles:
+            table.solve(theta2)
+
+    results = {}
+    for name, fn in (('usFsolve', runFsolve), ('usClosedForm', runClosedForm), ('usMotionTable', runMotionTable)):
+        best = min(timeit.repeat(fn, number=1, repeat=3))
+        results[name] = best / number * 1e6
+    return results
+
+def benchBatch(resolutionDeg=0.01):
+    """
+    Times a full-revolution sweep of the crank with FourBar.solveBatch.
+    :param resolutionDeg: crank angle step in degrees
+    :return: dict with the number of poses and the time per sweep and per pose
+    """
+    import numpy as np
+    fourBar = demoFourBar()
+    theta2 = np.deg2rad(np.arange(0.0, 360.0, resolutionDeg))
+    best = min(timeit.repeat(lambda: fourBar.solveBatch(theta2), number=1, repeat=5))
+    return {'poses': theta2.size, 'msPerSweep': best * 1e3, 'nsPerPose': best / theta2.size * 1e9}
+
+def makeWindow():
+    """
+    Builds a MainWindow on the offscreen platform (unless QT_QPA_PLATFORM is already set) and lets it paint once.
+    :return: (app, mainWindow)
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import PyQt5.QtWidgets as qtw
+    import GraphicsView_App
+    app = qtw.QApplication.instance() or qtw.QApplication(sys.argv)
+    #eventFilter and mouseMoveEvent look up the module level app that __main__ normally creates
+    GraphicsView_App.app = app
+    #windows from earlier benchmarks are hidden but kept alive: if the garbage collector deleted one while Qt was
+    #painting it, the process would crash
+    for old in openWindows: old.hide()
+    mw = GraphicsView_App.MainWindow()
+    openWindows.append(mw)
+    app.processEvents()
+    return app, mw
+
+def sendMouse(mw, eventType, x, y):
+    """
+    Sends a mouse event at scene position x, y to the viewport of the main graphics view, which turns it into the
+    GraphicsScene* event that MainWindow.eventFilter sees.
+    """
+    import PyQt5.QtGui as qtg
+    import PyQt5.QtCore as qtc
+    import PyQt5.QtWidgets as qtw
+    pos = qtc.QPointF(mw.gv_Main.mapFromScene(qtc.QPointF(x, y)))
+    button = qtc.Qt.NoButton if eventType == qtc.QEvent.MouseMove else qtc.Qt.LeftButton
+    buttons = qtc.Qt.NoButton if eventType == qtc.QEvent.MouseButtonRelease else qtc.Qt.LeftButton
+    event = qtg.QMouseEvent(eventType, pos, button, buttons, qtc.Qt.NoModifier)
+    qtw.QApplication.sendEvent(mw.gv_Main.viewport(), event)
+
+def crankDragPath(mw, steps, sweep=0.5):
+    """
+    Scene positions that swing the crank (link1) back and forth about its starting angle.
+    """
+    x0, y0 = mw.link1.startX, mw.link1.startY
+    r = mw.link1.linkLength()
+    start = mw.link1.linkAngle()
+    return [(x0 + r * math.cos(start + sweep * math.sin(2 * math.pi * i / steps)),
+             y0 - r * math.sin(start + sweep * math.sin(2 * math.pi * i / steps))) for i in range(steps)]
+
+def benchDragRepaint(steps=200):
+    """
+    Drags the crank through a path and counts, per drag step, the paint calls on RigidLink and RigidPivotPoint
+    and the viewport area that was repainted.
+    :param steps: number of mouse moves
+    :return: dict of per-step averages
+    """
+    import PyQt5.QtCore as qtc
+    import GraphicsView_App
+    app, mw = makeWindow()
+    counts = {'RigidLink': 0, 'RigidPivotPoint': 0, 'viewportPaints': 0, 'area': 0.0}
+    originals = {cls: cls.paint for cls in (GraphicsView_App.RigidLink, GraphicsView_App.RigidPivotPoint)}
+
+    def counting(cls):
+        def paint(item, painter, option, widget=None):
+            counts[cls.__name__] += 1
+            return originals[cls](item, painter, option, widget)
+        return paint
+
+    class ViewportSpy(qtc.QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == qtc.QEvent.Paint:
+                counts['viewportPaints'] += 1
+                counts['area'] += sum(r.width() * r.height() for r in event.region().rects())
+            return False
+
+    spy = ViewportSpy()
+    viewport = mw.gv_Main.viewport()
+    viewport.installEventFilter(spy)
+    for cls in originals: cls.paint = counting(cls)
+    try:
+        path = crankDragPath(mw, steps)
+        sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+        app.processEvents()
+        for key in counts: counts[key] = 0
+        for x, y in path:
+            sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+            #handle every move rather than one per frame, so each step is one solve
+            mw.moveCoalescer.flush()
+            app.processEvents()
+        sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+    finally:
+        for cls, paint in originals.items(): cls.paint = paint
+        viewport.removeEventFilter(spy)
+    viewportArea = viewport.width() * viewport.height()
+    return {'linkPaintsPerStep': counts['RigidLink'] / steps,
+            'pivotPaintsPerStep': counts['RigidPivotPoint'] / steps,
+            'viewportPaintsPerStep': counts['viewportPaints'] / steps,
+            'repaintedAreaPerStep': counts['area'] / steps,
+            'repaintedFractionPerStep': counts['area'] / steps / viewportArea}
+
+def benchRenderProfiles(steps=100, extraPivots=200):
+    """
+    Times drag and zoom frames under each of GraphicsView_App.RENDER_PROFILES.  Extra pivots are scattered over the
+    scene as static content.  A frame is one mouse move (or zoom step) followed by the repaint it triggers.
+    :param steps: frames per measurement
+    :param extraPivots: static pivots added to the scene
+    :return: dict
+    """
+    import PyQt5.QtCore as qtc
+    import GraphicsView_App
+    results = {}
+    for name in GraphicsView_App.RENDER_PROFILES:
+        app, mw = makeWindow()
+        for i in range(extraPivots):
+            mw.drawPivot(-190 + 380 * (i % 20) / 19.0, 60 + 130 * (i // 20) / 9.0, 5, 10)
+        results[name + 'OpenGL'] = float(mw.setRenderProfile(name))
+        app.processEvents()
+        path = crankDragPath(mw, steps)
+        sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+        app.processEvents()
+        t0 = time.perf_counter()
+        for x, y in path:
+            sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+            mw.moveCoalescer.flush()
+            app.processEvents()
+        results[name + 'DragFrameMs'] = (time.perf_counter() - t0) / steps * 1e3
+        sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+        t0 = time.perf_counter()
+        for i in range(steps):
+            mw.spnd_Zoom.setValue(1.5 if i % 2 == 0 else 1.0)
+            app.processEvents()
+        results[name + 'ZoomFrameMs'] = (time.perf_counter() - t0) / steps * 1e3
+    return results
+
+def benchRenderer(frames=240, size=400):
+    """
+    Renders a crank revolution with Linkage_Renderer as PNG files and as a raw stream, with one worker and with one
+    per CPU.  Frames per second include starting the worker processes.
+    :param frames: frames per run
+    :param size: frame width and height in pixels
+    :return: dict
+    """
+    from Linkage_Renderer import renderFrames
+    angles = [2.0 * math.pi * i / frames for i in range(frames)]
+    results = {'cpus': os.cpu_count()}
+    with tempfile.TemporaryDirectory() as folder:
+        for workers in sorted({1, os.cpu_count()}):
+            for raw in (False, True):
+                output = os.path.join(folder, 'raw{}'.format(workers) if raw else 'png{}'.format(workers))
+                t0 = time.perf_counter()
+                renderFrames(angles, output, size, size, raw=raw, workers=workers)
+                key = '{}FramesPerSecond{}Workers'.format('raw' if raw else 'png', workers)
+                results[key] = frames / (time.perf_counter() - t0)
+    return results
+
+def benchMouseFlood(rateHz=1000, seconds=1.0):
+    """
+    Replays a drag at a high-polling-rate mouse's event rate, letting Qt process events between moves as it would
+    in the event loop, and reports how many moves were handled and how many were coalesced away.
+    :param rateHz: mouse events per second
+    :param seconds: length of the drag
+    :return: dict
+    """
+    import PyQt5.QtCore as qtc
+    app, mw = makeWindow()
+    steps = int(rateHz * seconds)
+    path = crankDragPath(mw, steps)
+    sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+    received0, delivered0 = mw.moveCoalescer.received, mw.moveCoalescer.delivered
+    t0 = time.perf_counter()
+    for i, (x, y) in enumerate(path):
+        sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+        app.processEvents()
+        #wait for the next mouse report, still processing events (timers, paints) meanwhile
+        while time.perf_counter() < t0 + (i + 1) / rateHz:
+            app.processEvents()
+    elapsed = time.perf_counter() - t0
+    sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+    received = mw.moveCoalescer.received - received0
+    handled = mw.moveCoalescer.delivered - delivered0
+    return {'moves': received, 'handled': handled, 'dropped': received - handled,
+            'handledPerSecond': handled / elapsed, 'tickMs': mw.moveCoalescer.timer.interval()}
+
+def percentiles(samples, *qs):
+    ordered = sorted(samples)
+    return [ordered[min(int(q / 100.0 * len(ordered)), len(ordered) - 1)] for q in qs]
+
+def benchDragSolve(steps=500):
+    """
+    Times MainWindow's handling of one drag event: the coalesced move handler (title update and linkage solve),
+    without painting.
+    :param steps: number of mouse moves
+    :return: dict
+    """
+    import PyQt5.QtCore as qtc
+    app, mw = makeWindow()
+    path = crankDragPath(mw, steps)
+    sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+    times = []
+    for x, y in path:
+        t0 = time.perf_counter()
+        sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+        mw.moveCoalescer.flush()
+        times.append(time.perf_counter() - t0)
+    sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+    app.processEvents()
+    p50, p99 = percentiles(times, 50, 99)
+    return {'usPerEventMean': sum(times) / len(times) * 1e6, 'usPerEventP50': p50 * 1e6, 'usPerEventP99': p99 * 1e6}
+
+def benchMechanism(loops=(1, 5, 25, 50), steps=200):
+    """
+    Times Mechanism.solve (sparse Newton from the previous pose) on dyad chains of increasing size while the crank
+    swings back and forth a degree at a time, and the drag of the app's four-bar through the mechanism model.
+    :param loops: chain sizes
+    :param steps: crank steps per size
+    :return: dict
+    """
+    import PyQt5.QtCore as qtc
+    results = {}
+    for n in loops:
+        m, crank = dyadChain(n)
+        start = m.drivers[crank]
+        m.solve()  # warm up (the first solve imports scipy)
+        times = []
+        for i in range(steps):
+            m.setDriver(crank, start + math.radians(20.0 * math.sin(2.0 * math.pi * i / steps)))
+            t0 = time.perf_counter()
+            if not m.solve():
+                raise RuntimeError("dyad chain of {} loops did not assemble".format(n))
+            times.append(time.perf_counter() - t0)
+        results['usSolve{}Links'.format(len(m.items))] = sum(times) / len(times) * 1e6
+    app, mw = makeWindow()
+    mw.useMechanism = True
+    path = crankDragPath(mw, steps)
+    sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+    t0 = time.perf_counter()
+    for x, y in path:
+        sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+        mw.moveCoalescer.flush()
+    results['usPerDragEvent'] = (time.perf_counter() - t0) / len(path) * 1e6
+    sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+    fourBar = mw.fourBar
+    results['couplerLengthError'] = abs(mw.link2.linkLength() - fourBar.l2)
+    return results
+
+def benchAnimation(duration=60.0, dt=1.0/240.0, seconds=1.0):
+    """
+    Times a headless trajectory export and runs the GUI animation for a while to check the simulation keeps its
+    fixed step while rendering at the display rate.
+    :param duration: simulated seconds for the headless run
+    :param dt: time step in seconds
+    :param seconds: wall-clock seconds of GUI animation
+    :return: dict
+    """
+    import numpy as np
+    from Linkage_Animation import TrajectoryRecorder, crankAngles, simulate
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'trajectory.npy')
+        t0 = time.perf_counter()
+        rows = simulate(demoFourBar(), 2.0 * math.pi, duration, dt, path, theta0=math.pi / 2)
+        elapsed = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        #a run that fills the buffer exactly, so the final flush holds only the two samples carried over, against the
+        #same run written in one block
+        t = np.arange(2 * 64 + 2) * dt
+        angles = crankAngles(2.0 * math.pi, t, math.pi / 2)
+        blocks = []
+        for blockSize in (64, 4096):
+            recorder = TrajectoryRecorder(demoFourBar(), os.path.join(folder, 'block{}.npy'.format(blockSize)), dt,
+                                          blockSize)
+            recorder.append(t, angles)
+            recorder.close()
+            blocks.append(np.load(os.path.join(folder, 'block{}.npy'.format(blockSize))))
+        blocksMatch = blocks[0].shape == blocks[1].shape and np.allclose(blocks[0], blocks[1], equal_nan=True)
+        app, mw = makeWindow()
+        mw.startAnimation(omega=2.0 * math.pi, dt=dt, record=os.path.join(folder, 'live.npy'))
+        t0 = time.perf_counter()
+        while time.perf_counter() < t0 + seconds:
+            app.processEvents()
+        animation = mw.animation
+        mw.stopAnimation()
+        live = np.load(os.path.join(folder, 'live.npy'))
+    return {'headlessStepsPerSecond': rows / elapsed, 'bytesPerStep': size / rows,
+            'simulatedSecondsPerSecond': animation.t / seconds, 'framesPerSecond': animation.frames / seconds,
+            'stepsPerFrame': animation.steps / max(animation.frames, 1), 'droppedSteps': animation.droppedSteps,
+            'recordedSteps': len(live), 'blocksMatch': blocksMatch}
+
+def benchDataset(duration=2000.0, dt=1.0/500.0, frames=2000):
+    """
+    Writes a long headless run as a MotionDataset and times opening it, reading random frames and scrubbing through
+    it in the GUI.
+    :param duration: simulated seconds (rows = duration / dt)
+    :param dt: time step in seconds
+    :param frames: random frames read and scrubbed to
+    :return: dict
+    """
+    import random
+    from Linkage_Animation import simulate
+    from Linkage_Storage import MotionDataset
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'sweep')
+        t0 = time.perf_counter()
+        rows = simulate(demoFourBar(), 2.0 * math.pi, duration, dt, path, theta0=math.pi / 2, dataset=True)
+        writeSeconds = time.perf_counter() - t0
+        size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+        t0 = time.perf_counter()
+        dataset = MotionDataset(path)
+        openMs = (time.perf_counter() - t0) * 1e3
+        indices = [random.randrange(rows) for i in range(frames)]
+        t0 = time.perf_counter()
+        for i in indices:
+            dataset.frame(i, ('xA', 'yA', 'xB', 'yB'))
+        readUs = (time.perf_counter() - t0) / frames * 1e6
+        app, mw = makeWindow()
+        mw.openDataset(path)
+        t0 = time.perf_counter()
+        for i in indices:
+            mw.sld_Frame.setValue(i // mw.datasetStride)
+        scrubUs = (time.perf_counter() - t0) / frames * 1e6
+        mw.closeDataset()
+        del dataset
+        mw.dataset = None
+    return {'rows': rows, 'megabytes': size / 2**20, 'writeMBPerSecond': size / 2**20 / writeSeconds,
+            'msOpen': openMs, 'usReadFrame': readUs, 'usScrubFrame': scrubUs}
+
+def benchLinkStore(count=2000):
+    """
+    Builds many links in a scene and moves them all, one setEndpoints call per link and then with one
+    LinkStore.setEndpoints call.  Each move is timed on its own and together with the turn of the event loop that
+    follows, in which the scene updates its index and repaints the links in view (about one in thirty of them), since
+    that is where the links build what they draw.  Also reports the Python memory held per link (tracemalloc, so
+    Qt's own allocations are not included) before it is first painted.
+    :param count: number of links
+    :return: dict
+    """
+    import tracemalloc
+    import numpy as np
+    from GraphicsView_App import LinkStore, RigidLink
+    app, mw = makeWindow()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    links = [RigidLink(0.0, 3.0 * i, 50.0, 3.0 * i, 5, pen=mw.penLink, brush=mw.brushLink) for i in range(count)]
+    bytesPerLink = (tracemalloc.get_traced_memory()[0] - before) / count
+    tracemalloc.stop()
+    for link in links:
+        mw.scene.addItem(link)
+    app.processEvents()
+    ends = np.array([[0.0, 3.0 * i, 40.0, 3.0 * i + 10.0] for i in range(count)])
+    t0 = time.perf_counter()
+    for link, (sx, sy, ex, ey) in zip(links, ends.tolist()):
+        link.setEndpoints(sx, sy, ex, ey)
+    loopMs = (time.perf_counter() - t0) * 1e3
+    app.processEvents()
+    loopFrameMs = (time.perf_counter() - t0) * 1e3
+    t0 = time.perf_counter()
+    store = LinkStore(links)
+    adoptMs = (time.perf_counter() - t0) * 1e3
+    ends[:, 2] += 5.0
+    t0 = time.perf_counter()
+    store.setEndpoints(np.arange(count), ends)
+    storeMs = (time.perf_counter() - t0) * 1e3
+    app.processEvents()
+    storeFrameMs = (time.perf_counter() - t0) * 1e3
+    results = {'pyBytesPerLink': bytesPerLink, 'storeBytesPerLink': store.array.itemsize,
+               'msMoveEachLink': loopMs, 'msMoveThroughStore': storeMs, 'msMoveEachLinkAndFrame': loopFrameMs,
+               'msMoveThroughStoreAndFrame': storeFrameMs, 'msAdopt': adoptMs,
+               'maxLengthError': float(np.max(np.abs(store.array['length'] - np.hypot(45.0, 10.0))))}
+    for link in links:
+        mw.scene.removeItem(link)
+    return results
+
+def benchHitTest(count=5000, queries=2000):
+    """
+    Finds what is under the mouse among many links scattered over the scene: with the SpatialGrid index, with Qt's
+    scene.items(point) (its BSP tree, then each item's shape) and by measuring the distance to every link.  Then
+    times moving every link a little in the index, and grabbing and dragging a joint of the demo linkage.
+    :param count: number of links
+    :param queries: number of lookups
+    :return: dict
+    """
+    import random
+    import PyQt5.QtCore as qtc
+    from GraphicsView_App import RigidLink
+    from Linkage_SpatialIndex import SpatialGrid
+    app, mw = makeWindow()
+    rng = random.Random(3)
+    ends = []
+    for i in range(count):
+        x, y = rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)
+        a = rng.uniform(0, 2 * math.pi)
+        ends.append((x, y, x + 40 * math.cos(a), y - 40 * math.sin(a)))
+    links = [RigidLink(*end, 5, pen=mw.penLink, brush=mw.brushLink) for end in ends]
+    for link in links:
+        mw.scene.addItem(link)
+    index = SpatialGrid(cellSize=40.0)
+    t0 = time.perf_counter()
+    for k, end in enumerate(ends):
+        index.setSegment(k, *end, 5)
+    buildMs = (time.perf_counter() - t0) * 1e3
+    points = [(rng.uniform(-2000, 2000), rng.uniform(-2000, 2000)) for i in range(queries)]
+    t0 = time.perf_counter()
+    indexHits = [index.query(x, y, 8.0)[:1] for x, y in points]
+    indexUs = (time.perf_counter() - t0) / queries * 1e6
+    t0 = time.perf_counter()
+    for x, y in points:
+        mw.scene.items(qtc.QPointF(x, y))
+    qtUs = (time.perf_counter() - t0) / queries * 1e6
+    t0 = time.perf_counter()
+    bruteHits = []
+    for x, y in points:
+        best = min(index.distance(k, x, y) for k in range(count))
+        bruteHits.append(best if best <= 8.0 else None)
+    bruteUs = (time.perf_counter() - t0) / queries * 1e6
+    t0 = time.perf_counter()
+    for k, (x0, y0, x1, y1) in enumerate(ends):
+        index.setSegment(k, x0 + 0.5, y0, x1 + 0.5, y1, 5)
+    moveUs = (time.perf_counter() - t0) / count * 1e6
+    for link in links:
+        mw.scene.removeItem(link)
+
+    #grab the rocker tip of the demo linkage and drag it along a short arc
+    joint = mw.jointAt(mw.link3.endX, mw.link3.endY)
+    x, y = mw.link3.endX, mw.link3.endY
+    #the first drag loads scipy
+    mw.moveJoint(joint, x, y)
+    times = []
+    for i in range(100):
+        t1 = time.perf_counter()
+        mw.moveJoint(joint, x + 0.3 * i, y + 0.2 * i)
+        times.append(time.perf_counter() - t1)
+    p50, p99 = percentiles(times, 50, 99)
+    return {'usQueryIndex': indexUs, 'usQueryQtItems': qtUs, 'usQueryBruteForce': bruteUs, 'msBuildIndex': buildMs,
+            'usMoveInIndex': moveUs,
+            #lookups where the index found a different nearest distance than the brute force search
+            'mismatches': sum((a[0][0] if a else None) != b for a, b in zip(indexHits, bruteHits)),
+            'usDragJointP50': p50 * 1e6, 'usDragJointP99': p99 * 1e6}
+
+def benchCache(repeat=5):
+    """
+    Cold and warm use of a Linkage_Cache in a temporary folder: building a motion table against reading it back,
+    evaluating a motion summary against reading it back, and a design sweep (Linkage_Explorer.explore with one worker)
+    run twice.  Then fills a small cache past its bound to check the least recently used entries go first.
+    :param repeat: warm reads timed (the best is kept)
+    :return: dict
+    """
+    import numpy as np
+    from Linkage_Cache import LinkageCache
+    from Linkage_Explorer import DesignSpace, explore
+    from Linkage_Kinematics import FourBarMotionTable
+    fourBar = demoFourBar()
+    with tempfile.TemporaryDirectory() as folder:
+        cache = LinkageCache(os.path.join(folder, 'cache'))
+        t0 = time.perf_counter()
+        cache.motionTable(fourBar)
+        coldTableMs = (time.perf_counter() - t0) * 1e3
+        buildMs = min(timeit.repeat(lambda: FourBarMotionTable(fourBar), number=1, repeat=repeat)) * 1e3
+        warmTableMs = min(timeit.repeat(lambda: cache.motionTable(fourBar), number=1, repeat=repeat)) * 1e3
+        warm = cache.motionTable(fourBar)
+        fresh = FourBarMotionTable(fourBar)
+        same = all(np.array_equal(warm.arrays()[name], fresh.arrays()[name]) for name in fresh.arrays())
+        t0 = time.perf_counter()
+        cache.summary(fourBar)
+        coldSummaryMs = (time.perf_counter() - t0) * 1e3
+        warmSummaryMs = min(timeit.repeat(lambda: cache.summary(fourBar), number=1, repeat=repeat)) * 1e3
+
+        space = DesignSpace.aroundFourBar(fourBar, count=4)
+        sweeps = []
+        for run in range(2):
+            t0 = time.perf_counter()
+            explore(space, os.path.join(folder, 'sweep{}.csv'.format(run)), workers=1, cache=cache)
+            sweeps.append(time.perf_counter() - t0)
+        with open(os.path.join(folder, 'sweep0.csv')) as f0, open(os.path.join(folder, 'sweep1.csv')) as f1:
+            sweepsMatch = f0.read() == f1.read()
+
+        #a table is about 86 kB, so about nine fit.  The first table is read after every store, so it stays in while
+        #the second, never read again, is among the first to go.
+        small = LinkageCache(os.path.join(folder, 'small'), maxBytes=800 * 1024)
+        first, second = demoFourBar(), demoFourBar()
+        second.l1 += 1.0
+        small.motionTable(first)
+        time.sleep(0.01)
+        small.motionTable(second)
+        for i in range(20):
+            other = demoFourBar()
+            other.l1 += 2.0 + i
+            time.sleep(0.01)
+            small.motionTable(other)
+            small.motionTable(first)
+        kept = small.hits
+        small.misses = 0
+        small.motionTable(first)
+        firstKept = small.misses == 0
+        small.motionTable(second)
+        secondEvicted = small.misses == 1
+        smallBytes = small.size()
+    return {'msBuildTable': buildMs, 'msColdTable': coldTableMs, 'msWarmTable': warmTableMs,
+            'warmTableMatches': int(same), 'msColdSummary': coldSummaryMs, 'msWarmSummary': warmSummaryMs,
+            'msColdSweep': sweeps[0] * 1e3, 'msWarmSweep': sweeps[1] * 1e3, 'sweepsMatch': int(sweepsMatch),
+            'cacheHits': kept, 'recentKept': int(firstKept), 'oldestEvicted': int(secondEvicted),
+            'withinBound': int(smallBytes <= small.maxBytes)}
+
+def benchSynthesis(samples=2000, starts=8):
+    """
+    Four-bar synthesis to the coupler path of the demo linkage (six precision points on its coupler curve).  Times
+    the vectorized cost of a batch of random candidates against solving the same candidates one crank angle at a
+    time with FourBar.solve, then a multi-start search across the process pool (one worker per cpu) and the same
+    search stopped at a tolerance.
+    :param samples: random candidates for the cost timing
+    :param starts: random starts of the search
+    :return: dict
+    """
+    import numpy as np
+    from Linkage_Synthesis import PathTarget, boundsArrays, synthesize
+    fourBar = demoFourBar()
+    poses = fourBar.solveBatch(np.deg2rad(np.arange(0, 360, 60)))
+    target = PathTarget(np.column_stack(poses.couplerPoint(0.5, 10.0)))
+    low, high = boundsArrays(target.parameters)
+    candidates = low + (high - low) * np.random.default_rng(1).random((samples, len(low)))
+
+    def scalarCost(candidate):
+        curve = []
+        for theta2 in target.theta2.ravel().tolist():
+            pose = FourBar(*candidate[:7], branch=target.branch).solve(theta2)
+            if pose is not None:
+                xA, yA, xB, yB = pose[:4]
+                dx = xB - xA
+                dy = yB - yA
+                length = math.hypot(dx, dy)
+                curve.append((xA + candidate[7]*dx + candidate[8]*dy/length, yA + candidate[7]*dy -
+                              candidate[8]*dx/length))
+        return curve
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vectorized = min(timeit.repeat(lambda: target.cost(candidates[:500]), number=1, repeat=3)) / 500
+    scalar = min(timeit.repeat(lambda: [scalarCost(c) for c in candidates[:20].tolist()], number=1, repeat=3)) / 20
+    search = synthesize(target, starts=starts, seed=1)
+    stopped = synthesize(target, starts=starts, seed=1, tolerance=5.0)
+    return {'usCostVectorized': vectorized * 1e6, 'usCostScalarCurve': scalar * 1e6, 'workers': os.cpu_count(),
+            'sSearch': search.seconds, 'searchCost': search.cost, 'evaluationsPerSecond': search.evaluations /
+            search.seconds, 'sSearchToTolerance': stopped.seconds, 'startsToTolerance': stopped.starts}
+
+def benchThreadedSolver(solveMs=30.0, seconds=1.0, rateHz=120):
+    """
+    Drags the linkage with a solver made artificially slow, once solving on the GUI thread and once on the solver
+    thread, and measures how long the GUI event loop goes without running (its longest stalls) and how many poses
+    are shown per second.
+    :param solveMs: time added to every solve (a sleep, which releases the GIL like numpy and scipy mostly do)
+    :param seconds: length of each drag
+    :param rateHz: mouse report rate
+    :return: dict
+    """
+    import PyQt5.QtCore as qtc
+    app, mw = makeWindow()
+    fast = mw.fourBar.solve
+
+    def slow(theta2, branch=None):
+        time.sleep(solveMs / 1e3)
+        return fast(theta2, branch)
+    mw.fourBar.solve = slow
+    applied = []
+    applyCrank = mw.applyCrank
+    mw.applyCrank = lambda angle, *args: (applied.append(angle), applyCrank(angle, *args))
+    results = {}
+    for threaded in (False, True):
+        mw.setThreadedSolver(threaded)
+        path = crankDragPath(mw, int(seconds * rateHz))
+        del applied[:]
+        sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+        gaps = []
+        t0 = last = time.perf_counter()
+        for i, (x, y) in enumerate(path):
+            sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+            while True:
+                app.processEvents()
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+                if now >= t0 + (i + 1) / rateHz:
+                    break
+        elapsed = time.perf_counter() - t0
+        sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+        name = 'threaded' if threaded else 'guiThread'
+        p99, = percentiles(gaps, 99)
+        results[name + 'StallMsP99'] = p99 * 1e3
+        results[name + 'StallMsMax'] = max(gaps) * 1e3
+        results[name + 'PosesPerSecond'] = len(applied) / elapsed
+        if threaded:
+            results['superseded'] = mw.solverWorker.superseded
+        mw.setThreadedSolver(False)
+    del mw.fourBar.solve
+    del mw.applyCrank
+    return results
+
+def benchItemPaint(number=2000):
+    """
+    Times RigidLink.paint and RigidPivotPoint.paint per call, painting into a QImage.
+    :param number: paint calls per item type
+    :return: dict of microseconds per paint call
+    """
+    app, mw = makeWindow()
+    import PyQt5.QtGui as qtg
+    import PyQt5.QtWidgets as qtw
+    image = qtg.QImage(400, 400, qtg.QImage.Format_ARGB32_Premultiplied)
+    option = qtw.QStyleOptionGraphicsItem()
+    results = {}
+    for name, item in (('usRigidLinkPaint', mw.link2), ('usRigidPivotPointPaint', mw.pivot0)):
+        image.fill(0)
+        painter = qtg.QPainter(image)
+        painter.translate(200, 200)
+        best = min(timeit.repeat(lambda: item.paint(painter, option), number=number, repeat=3))
+        painter.end()
+        results[name] = best / number * 1e6
+    return results
+
+def benchLevelOfDetail(zooms=(1.0, 0.5, 0.25, 0.1), links=600, pivots=300, size=800, repeat=20):
+    """
+    Renders a large mechanism scene into an image at several zooms, with the level-of-detail painting of RigidLink and
+    RigidPivotPoint and with it switched off (both LOD thresholds set to 0, so every item is drawn in full).  The
+    speedups are the gain of the level of detail alone; it is only used once items are a few pixels wide, so expect
+    about 1 down to zoom 0.25 and the gain to show as the view zooms out further.
+    :param zooms: view magnifications; the image always covers zoom times the scene rect of the demo
+    :param links: links scattered over the scene
+    :param pivots: pivots scattered over the scene
+    :param size: image width and height in pixels
+    :param repeat: frames per measurement (the best is kept)
+    :return: dict of ms per frame
+    """
+    import random
+    import PyQt5.QtCore as qtc
+    import PyQt5.QtGui as qtg
+    import GraphicsView_App
+    app, mw = makeWindow()
+    rng = random.Random(5)
+    #spread the items so that at every zoom the view is about as full as the demo scene at zoom 1
+    extent = 200.0 / min(zooms)
+    for i in range(links):
+        x, y = rng.uniform(-extent, extent), rng.uniform(-extent, extent)
+        a = rng.uniform(0, 2 * math.pi)
+        r = rng.uniform(20, 120) / min(zooms) * 0.25
+        mw.drawLinkage(x, y, x + r * math.cos(a), y - r * math.sin(a), 5)
+    for i in range(pivots):
+        mw.drawPivot(rng.uniform(-extent, extent), rng.uniform(-extent, extent), 10, 20)
+    image = qtg.QImage(size, size, qtg.QImage.Format_ARGB32_Premultiplied)
+    target = qtc.QRectF(0, 0, size, size)
+    thresholds = (GraphicsView_App.LOD_SIMPLE_PIXELS, GraphicsView_App.LOD_LINE_PIXELS)
+    results = {}
+    try:
+        for mode, (simple, line) in (('Full', (0, 0)), ('Lod', thresholds)):
+            GraphicsView_App.LOD_SIMPLE_PIXELS, GraphicsView_App.LOD_LINE_PIXELS = simple, line
+            for zoom in zooms:
+                half = 200.0 / zoom
+                source = qtc.QRectF(-half, -half, 2 * half, 2 * half)
+
+                def frame():
+                    image.fill(0xffffffff)
+                    painter = qtg.QPainter(image)
+                    painter.setRenderHint(qtg.QPainter.Antialiasing)
+                    mw.scene.render(painter, target, source)
+                    painter.end()
+                results['ms{}Zoom{:g}'.format(mode, zoom)] = min(timeit.repeat(frame, number=1, repeat=repeat)) * 1e3
+    finally:
+        GraphicsView_App.LOD_SIMPLE_PIXELS, GraphicsView_App.LOD_LINE_PIXELS = thresholds
+    for zoom in zooms:
+        results['speedupZoom{:g}'.format(zoom)] = results['msFullZoom{:g}'.format(zoom)] / \
+                                                  results['msLodZoom{:g}'.format(zoom)]
+    return results
+
+def benchOverlay(counts=(100, 1000, 5000), frames=20):
+    """
+    Updates and renders a field of arrows every frame, as a velocity or force overlay would: with one OverlayItem
+    (numpy arrays written into its point buffers) and with one QGraphicsPathItem per arrow made by drawAnArrow and
+    updated with setPath.  A frame is the update followed by rendering the scene into an image.
+    :param counts: numbers of arrows
+    :param frames: frames per measurement
+    :return: dict
+    """
+    import numpy as np
+    import PyQt5.QtCore as qtc
+    import PyQt5.QtGui as qtg
+    results = {}
+    image = qtg.QImage(400, 400, qtg.QImage.Format_ARGB32_Premultiplied)
+    target = qtc.QRectF(0, 0, 400, 400)
+    source = qtc.QRectF(-200, -200, 400, 400)
+
+    def render(mw):
+        painter = qtg.QPainter(image)
+        mw.scene.render(painter, target, source)
+        painter.end()
+
+    rng = np.random.default_rng(1)
+    for n in counts:
+        positions = rng.uniform(-190, 190, (n, 2))
+        phases = rng.uniform(0, 2 * math.pi, n)
+
+        def vectors(frame):
+            a = phases + 0.1 * frame
+            return 10.0 * np.column_stack((np.cos(a), np.sin(a)))
+
+        app, mw = makeWindow()
+        overlay = mw.overlay('bench', qtg.QPen(qtc.Qt.darkRed))
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            overlay.setArrows(positions, vectors(frame))
+        batchUpdate = (time.perf_counter() - t0) / frames
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            overlay.setArrows(positions, vectors(frame))
+            render(mw)
+        batchFrame = (time.perf_counter() - t0) / frames
+        overlay.clear()
+
+        app, mw = makeWindow()
+        t0 = time.perf_counter()
+        arrows = [mw.drawAnArrow(x, y, x + 10.0, y) for x, y in positions.tolist()]
+        createMs = (time.perf_counter() - t0) * 1e3
+
+        def updateItems(frame):
+            ends = positions + vectors(frame)
+            for arrow, (x, y), (ex, ey) in zip(arrows, positions.tolist(), ends.tolist()):
+                path = qtg.QPainterPath()
+                path.moveTo(x, y)
+                path.lineTo(ex, ey)
+                angleDeg = math.degrees(math.atan2(ey - y, ex - x))
+                path.addPolygon(qtg.QPolygonF([qtc.QPointF(*mw.polarToRect(ex, ey, 5, a + angleDeg))
+                                               for a in (0, 120, 240, 0)]))
+                arrow.setPath(path)
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            updateItems(frame)
+        itemsUpdate = (time.perf_counter() - t0) / frames
+        t0 = time.perf_counter()
+        for frame in range(frames):
+            updateItems(frame)
+            render(mw)
+        itemsFrame = (time.perf_counter() - t0) / frames
+        for arrow in arrows:
+            mw.scene.removeItem(arrow)
+        results.update({'msBatchUpdate{}'.format(n): batchUpdate * 1e3, 'msBatchFrame{}'.format(n): batchFrame * 1e3,
+                        'msItemsCreate{}'.format(n): createMs, 'msItemsUpdate{}'.format(n): itemsUpdate * 1e3,
+                        'msItemsFrame{}'.format(n): itemsFrame * 1e3})
+    return results
+
+def benchGrid(spacings=(20, 10, 5, 2, 1), size=800):
+    """
+    Times setting up the reference grid (drawAGrid) and rendering it, for several grid spacings.
+    :param spacings: grid spacings in scene units
+    :param size: rendered image size in pixels for the 400x400 scene rect
+    :return: dict keyed by spacing
+    """
+    app, mw = makeWindow()
+    import PyQt5.QtGui as qtg
+    import PyQt5.QtCore as qtc
+    image = qtg.QImage(size, size, qtg.QImage.Format_ARGB32_Premultiplied)
+    source = qtc.QRectF(-200, -200, 400, 400)
+    target = qtc.QRectF(0, 0, size, size)
+    results = {}
+    for spacing in spacings:
+        build = min(timeit.repeat(lambda: mw.drawAGrid(DeltaX=spacing, DeltaY=spacing, Height=400, Width=400,
+                                                       Pen=mw.penGridLines, Brush=mw.brushGrid), number=1, repeat=5))
+        def render():
+            painter = qtg.QPainter(image)
+            mw.scene.render(painter, target, source)
+            painter.end()
+        draw = min(timeit.repeat(render, number=1, repeat=5))
+        results['msBuildSpacing{}'.format(spacing)] = build * 1e3
+        results['msRenderSpacing{}'.format(spacing)] = draw * 1e3
+    results['items'] = len(mw.scene.items())
+    mw.buildScene()
+    return results
+
+def benchRebuild(number=50):
+    """
+    Times a full buildScene and the colour-change path of pickAColor (applyStyle plus the repaint it causes).
+    :param number: repetitions
+    :return: dict of milliseconds per call
+    """
+    app, mw = makeWindow()
+    def rebuild():
+        mw.buildScene()
+        app.processEvents()
+    def restyle():
+        mw.penGridLines.setColor(mw.penGridLines.color().lighter(101))
+        mw.applyStyle(pen=mw.penGridLines)
+        app.processEvents()
+    return {'msBuildScene': min(timeit.repeat(rebuild, number=number, repeat=3)) / number * 1e3,
+            'msPickAColorRestyle': min(timeit.repeat(restyle, number=number, repeat=3)) / number * 1e3}
+
+def benchSceneFile(links=10000, pivots=5000, lines=10000, rects=5000):
+    """
+    Builds a large scene (a field of links and pivots around the four-bar, and lines and rectangles as decoration)
+    with one drawLinkage / drawPivot / drawALine / drawARectangle call per item, then saves it with saveScene and
+    loads it back with loadScene, all at once and streamed (the mechanism first, then the decorations from the event
+    loop).  Every build and load ends with a query of the scene's index, so its rebuild is included.  A load at once
+    is then painted (msLoadPaint), since the streamed load's time includes the repaints between its batches and a
+    last one with everything in; the two compare as msLoad + msLoadPaint against msStreamAll.
+    :param links: extra links
+    :param pivots: extra pivots
+    :param lines: decoration lines
+    :param rects: decoration rectangles
+    :return: dict
+    """
+    import random
+    import PyQt5.QtCore as qtc
+    random.seed(1)
+    app, mw = makeWindow()
+    #a query at one point makes the scene build its index, without wrapping every item for Python
+    origin = qtc.QPointF(0, 0)
+
+    def point():
+        return random.uniform(-190, 190), random.uniform(-190, 190)
+
+    t0 = time.perf_counter()
+    for i in range(links):
+        x, y = point()
+        mw.drawLinkage(x, y, x + random.uniform(-20, 20), y + random.uniform(-20, 20), 2)
+    for i in range(pivots):
+        mw.drawPivot(*point(), 4, 8)
+    for i in range(lines):
+        x, y = point()
+        mw.drawALine(x, y, x + 5, y + 5, pen=mw.penGridLines)
+    for i in range(rects):
+        mw.drawARectangle(*point(), 3, 3, pen=mw.penMed, brush=mw.brushGrid)
+    mw.scene.items(origin)
+    drawCalls = time.perf_counter() - t0
+    count = len(mw.scene.items())
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'bench.scene')
+        t0 = time.perf_counter()
+        mw.saveScene(path)
+        save = time.perf_counter() - t0
+        size = os.path.getsize(path)
+        #each load goes into a new window, as the draw calls did, so clearing the big scene is not timed
+        app, mw = makeWindow()
+        t0 = time.perf_counter()
+        mw.loadScene(path)
+        mw.scene.items(origin)
+        load = time.perf_counter() - t0
+        if len(mw.scene.items()) != count:
+            raise RuntimeError("loadScene gave {} items instead of {}".format(len(mw.scene.items()), count))
+        t0 = time.perf_counter()
+        mw.gv_Main.viewport().repaint()
+        loadPaint = time.perf_counter() - t0
+        app, mw = makeWindow()
+        t0 = time.perf_counter()
+        mw.loadScene(path, deferDecorations=True)
+        mechanism = time.perf_counter() - t0
+        while mw.scene.itemIndexMethod() != mw.scene.BspTreeIndex:
+            app.processEvents()
+        mw.scene.items(origin)
+        #the last batch shows the decorations, which the view has yet to paint
+        mw.gv_Main.viewport().repaint()
+        streamed = time.perf_counter() - t0
+    return {'items': count, 'msDrawCalls': drawCalls * 1e3, 'msSave': save * 1e3, 'msLoad': load * 1e3,
+            'msLoadPaint': loadPaint * 1e3, 'msStreamMechanism': mechanism * 1e3, 'msStreamAll': streamed * 1e3,
+            'bytesPerItem': size / count, 'speedup': drawCalls / load}
+
+def benchDragReplay(frames=300):
+    """
+    Replays a synthetic drag one frame at a time and measures the end-to-end frame time: event delivery, solve,
+    geometry update and the repaint of the viewport.
+    :param frames: number of frames
+    :return: dict of frame times in milliseconds
+    """
+    import PyQt5.QtCore as qtc
+    app, mw = makeWindow()
+    path = crankDragPath(mw, frames)
+    sendMouse(mw, qtc.QEvent.MouseButtonPress, *path[0])
+    app.processEvents()
+    times = []
+    for x, y in path:
+        t0 = time.perf_counter()
+        sendMouse(mw, qtc.QEvent.MouseMove, x, y)
+        mw.moveCoalescer.flush()
+        app.processEvents()
+        times.append(time.perf_counter() - t0)
+    sendMouse(mw, qtc.QEvent.MouseButtonRelease, *path[-1])
+    p50, p99 = percentiles(times, 50, 99)
+    return {'msFrameMean': sum(times) / len(times) * 1e3, 'msFrameP50': p50 * 1e3, 'msFrameP99': p99 * 1e3}
+
+#run in a fresh interpreter by benchStartup; %r is this directory
+STARTUP_SCRIPT = r"""
+import time
+t0 = time.perf_counter()
+import json, os, sys
+sys.path.insert(0, %r)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+import GraphicsView_App
+t1 = time.perf_counter()
+import PyQt5.QtWidgets as qtw
+import PyQt5.QtCore as qtc
+app = qtw.QApplication(sys.argv)
+GraphicsView_App.app = app
+painted = []
+class FirstPaint(qtc.QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == qtc.QEvent.Paint and not painted:
+            painted.append(time.perf_counter())
+            qtc.QTimer.singleShot(0, app.quit)
+        return False
+spy = FirstPaint()
+app.installEventFilter(spy)
+mw = GraphicsView_App.MainWindow()
+app.exec()
+print(json.dumps({'msImport': (t1 - t0) * 1e3, 'msFirstPaint': (painted[0] - t0) * 1e3,
+                  'msWindowToFirstPaint': (painted[0] - t1) * 1e3, 'numpyLoaded': 'numpy' in sys.modules}))
+"""
+
+def benchStartup(repeat=3):
+    """
+    Starts the app in fresh interpreters and measures the time to import GraphicsView_App and the time until the
+    window first paints, both from the start of the script.  Also reports whether numpy was loaded by then.
+    :param repeat: number of cold starts; the best of each metric is reported
+    :return: dict
+    """
+    script = STARTUP_SCRIPT % os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    runs = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, env=env, check=True)
+        run = json.loads(out.stdout.strip().splitlines()[-1])
+        run['msProcess'] = (time.perf_counter() - t0) * 1e3
+        runs.append(run)
+    results = {key: min(run[key] for run in runs) for key in ('msImport', 'msFirstPaint', 'msWindowToFirstPaint',
+                                                              'msProcess')}
+    results['numpyLoaded'] = float(any(run['numpyLoaded'] for run in runs))
+    return results
+
+def gitRevision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def runSuite(names=None, log=None):
+    """
+    Runs the benchmarks and collects their results with enough context to compare runs across commits.
+    :param names: benchmark names from BENCHMARKS, defaults to all of them
+    :param log: optional callable(name, result) called as each benchmark finishes
+    :return: dict
+    """
+    results = {'revision': gitRevision(), 'python': platform.python_version(), 'platform': platform.platform(),
+               'qpa': os.environ.get('QT_QPA_PLATFORM', 'offscreen'), 'benchmarks': {}}
+    for name in (names or BENCHMARKS):
+        result = BENCHMARKS[name]()
+        results['benchmarks'][name] = result
+        if log is not None: log(name, result)
+    return results
+
+def compareResults(baseline, current, tolerance=0.2):
+    """
+    Finds timings that got slower than a baseline run by more than tolerance.  Only metrics whose names start with a
+    time unit (us, ms, ns) are compared; lower is better for all of them.
+    :param baseline: results dict from runSuite (e.g. loaded from a previous --json file)
+    :param current: results dict from runSuite
+    :param tolerance: allowed fractional slowdown
+    :return: list of (benchmark, metric, baselineValue, currentValue)
+    """
+    regressions = []
+    for name, metrics in current['benchmarks'].items():
+        old = baseline.get('benchmarks', {}).get(name, {})
+        for metric, value in metrics.items():
+            if metric[:2] in ('us', 'ms', 'ns') and metric in old and value > old[metric] * (1.0 + tolerance):
+                regressions.append((name, metric, old[metric], value))
+    return regressions
+
+#benchmarks by name, in the order they run
+BENCHMARKS = {'solver': benchSolver, 'batch': benchBatch, 'dragSolve': benchDragSolve, 'mechanism': benchMechanism,
+              'animation': benchAnimation, 'dataset': benchDataset, 'cache': benchCache, 'linkStore': benchLinkStore,
+              'synthesis': benchSynthesis, 'threadedSolver': benchThreadedSolver, 'hitTest': benchHitTest,
+              'itemPaint': benchItemPaint, 'levelOfDetail': benchLevelOfDetail, 'overlay': benchOverlay,
+              'grid': benchGrid, 'rebuild': benchRebuild, 'sceneFile': benchSceneFile, 'dragRepaint': benchDragRepaint,
+              'renderProfiles': benchRenderProfiles, 'renderer': benchRenderer, 'dragReplay': benchDragReplay,
+              'mouseFlood': benchMouseFlood, 'startup': benchStartup}
+#endregion
+
+#region function calls
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the linkage solver and scene rendering paths. "
+                                                 "Qt runs on the offscreen platform unless QT_QPA_PLATFORM is set.")
+    parser.add_argument('names', nargs='*', help="benchmarks to run, from: " + ", ".join(BENCHMARKS) + " (default all)")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--compare', help="results file of a previous run to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown against --compare")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmark " + ", ".join(unknown))
+
+    def log(name, result):
+        print(name)
+        for metric, value in result.items():
+            print("    {:28s} {:14.3f}".format(metric, value))
+    results = runSuite(args.names, log)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compareResults(json.load(f), results, args.tolerance)
+        for name, metric, old, new in regressions:
+            print("REGRESSION {}.{}: {:0.3f} -> {:0.3f}".format(name, metric, old, new))
+        status = 1 if regressions else 0
+    sys.exit(status)
+#endregion
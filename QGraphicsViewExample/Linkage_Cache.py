@@ -0,0 +1,226 @@
+#region imports
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+from Linkage_Kinematics import FourBarMotionTable
+#endregion
+
+#region constants
+#where the cache lives unless a folder is given; LINKAGE_CACHE_DIR overrides it
+DEFAULT_FOLDER = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')),
+                              'linkage')
+#the cache is trimmed when a store takes it past this many bytes
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+#a trim deletes entries until the folder is down to this fraction of its bound, so the stores that follow do not
+#each have to trim again
+EVICT_FRACTION = 0.9
+#significant digits of the pivots and lengths in a geometry key, so that the same linkage read back from the scene
+#(with the last bits of its floats disturbed) hashes the same
+KEY_DIGITS = 10
+#the rows of a cached motion table file (see FourBarMotionTable.arrays)
+TABLE_ROWS = ('theta4', 'xA', 'yA', 'xB', 'yB', 'valid')
+#endregion
+
+#region class definitions
+class LinkageCache:
+    def __init__(self, folder=None, maxBytes=DEFAULT_MAX_BYTES):
+        """
+        Solved linkage data kept on disk between sessions, so that reopening a geometry that was seen before costs a
+        file read instead of a solve.  Entries are addressed by a hash of what they were computed from (see
+        geometryKey), so an entry can never be stale: changing a pivot, a length or the branch gives another key.
+        Holds motion tables (FourBarMotionTable), motion summaries (Grashof class, crank range, rocker swing,
+        transmission angles, see Linkage_Explorer.COLUMNS) and the results of sweep chunks (see
+        Linkage_Explorer.explore).
+
+        Each entry is one file.  Files are written to a temporary name and renamed into place, so concurrent sessions
+        and worker processes never see half an entry.  Reading an entry touches its modification time.  The cache
+        keeps a running total of the bytes it has stored; when that passes maxBytes the folder is scanned once and the
+        entries used longest ago are deleted first (see evict).  Entries stored by other processes are only counted
+        at that scan, so several processes sharing a folder can take it past maxBytes until one of them trims it.
+        :param folder: cache folder, defaults to $LINKAGE_CACHE_DIR or DEFAULT_FOLDER
+        :param maxBytes: size bound of the folder
+        """
+        self.folder = folder or os.environ.get('LINKAGE_CACHE_DIR') or DEFAULT_FOLDER
+        self.maxBytes = maxBytes
+        os.makedirs(self.folder, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        #bytes in the folder, found by the first store
+        self.total = None
+
+    def path(self, key, kind):
+        return os.path.join(self.folder, '{}.{}'.format(key, kind))
+
+    def read(self, key, kind, load):
+        """
+        Loads an entry and marks it used.  An entry deleted in between, e.g. evicted by another process, is a miss.
+        :param load: callable(path) that reads the entry's file
+        :return: what load returned, or None if the entry is not cached
+        """
+        path = self.path(key, kind)
+        try:
+            os.utime(path)
+            value = load(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def write(self, key, kind, save):
+        """
+        Stores an entry.
+        :param save: callable(file) that writes the entry to an open binary file
+        """
+        if self.total is None:
+            self.total = self.size()
+        path = self.path(key, kind)
+        fd, temporary = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                save(f)
+                size = f.tell()
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.total += size - replaced
+        if self.total > self.maxBytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the folder is down to EVICT_FRACTION of maxBytes.  One scan of
+        the folder and one stat per entry.
+        """
+        entries = []
+        for e in os.scandir(self.folder):
+            if e.is_file() and not e.name.endswith('.tmp'):
+                try:
+                    stat = e.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, e.path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= EVICT_FRACTION * self.maxBytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total = total
+
+    def size(self):
+        """
+        :return: bytes held in the cache folder
+        """
+        return sum(e.stat().st_size for e in os.scandir(self.folder) if e.is_file())
+
+    def clear(self):
+        for e in os.scandir(self.folder):
+            if e.is_file():
+                os.unlink(e.path)
+        self.total = 0
+
+    def motionTable(self, fourBar, samples=3600):
+        """
+        The FourBarMotionTable of a four-bar, read from the cache or built and stored.
+        :param fourBar: a FourBar
+        :param samples: crank angles over a revolution
+        :return: a FourBarMotionTable
+        """
+        key = geometryKey(fourBar, samples)
+        #one plain float32 array, which loads several times faster than an .npz archive of the same arrays
+        rows = self.read(key, 'table.npy', np.load)
+        if rows is not None:
+            arrays = dict(zip(TABLE_ROWS, rows))
+            arrays['valid'] = arrays['valid'] != 0.0
+            return FourBarMotionTable.fromArrays(fourBar, arrays)
+        table = FourBarMotionTable(fourBar, samples)
+        arrays = table.arrays()
+        self.write(key, 'table.npy', lambda f: np.save(f, np.stack([arrays[name] for name in TABLE_ROWS]).astype(
+            np.float32)))
+        return table
+
+    def summary(self, fourBar, resolutionDeg=1.0):
+        """
+        The range of motion of a four-bar: its Grashof class, crank range, rocker swing, transmission angle extremes
+        and coupler path extents, read from the cache or evaluated and stored.
+        :param fourBar: a FourBar
+        :param resolutionDeg: crank angle step in degrees
+        :return: dict, see summarize
+        """
+        key = geometryKey(fourBar, resolutionDeg)
+        summary = self.read(key, 'summary.json', loadJson)
+        if summary is not None:
+            return summary
+        summary = summarize(fourBar, resolutionDeg)
+        self.write(key, 'summary.json', lambda f: f.write(json.dumps(summary).encode()))
+        return summary
+
+    def chunkResults(self, key):
+        """
+        :param key: from chunkKey
+        :return: the stored results of a sweep chunk, or None
+        """
+        return self.read(key, 'chunk.npy', np.load)
+
+    def storeChunkResults(self, key, results):
+        self.write(key, 'chunk.npy', lambda f: np.save(f, results))
+#endregion
+
+#region function definitions
+def summarize(fourBar, resolutionDeg=1.0):
+    """
+    Evaluates the range of motion of one four-bar with Linkage_Explorer.evaluateChunk.
+    :return: dict keyed by Linkage_Explorer.COLUMNS, with the Grashof class as its name and None for what a linkage
+    that never assembles does not have
+    """
+    from Linkage_Explorer import COLUMNS, PARAMETERS, evaluateChunk
+    from Linkage_Kinematics import GRASHOF_CLASSES
+    row = evaluateChunk(np.array([[getattr(fourBar, name) for name in PARAMETERS]], dtype=float), resolutionDeg,
+                        fourBar.branch)[0]
+    summary = {name: (None if np.isnan(value) else float(value)) for name, value in zip(COLUMNS, row)}
+    summary['grashof'] = GRASHOF_CLASSES[int(row[len(PARAMETERS)])]
+    return summary
+
+def loadJson(path):
+    with open(path) as f:
+        return json.load(f)
+
+def canonical(value):
+    """
+    :return: a float rounded to KEY_DIGITS significant digits, with -0.0 made 0.0
+    """
+    return float('{:.{}g}'.format(float(value), KEY_DIGITS)) + 0.0
+
+def geometryKey(fourBar, *options):
+    """
+    A canonical hash of a four-bar's pivot positions, link lengths and branch, plus anything else the entry depends on
+    (e.g. the number of table samples).  Values are rounded to KEY_DIGITS significant digits first.
+    :param fourBar: a FourBar
+    :param options: more json-serializable values that go into the key
+    :return: hex digest
+    """
+    pivots = [canonical(v) for v in (fourBar.pivot0X, fourBar.pivot0Y, fourBar.pivot1X, fourBar.pivot1Y)]
+    lengths = [canonical(v) for v in (fourBar.l1, fourBar.l2, fourBar.l3)]
+    text = json.dumps(['fourBar', pivots, lengths, int(fourBar.branch)] + list(options))
+    return hashlib.sha1(text.encode()).hexdigest()
+
+def chunkKey(chunk, *options):
+    """
+    A hash of a chunk of sweep candidates (see Linkage_Explorer.DesignSpace.chunks) and the sweep's settings.
+    :return: hex digest
+    """
+    digest = hashlib.sha1(np.ascontiguousarray(chunk, dtype='<f8').tobytes())
+    digest.update(json.dumps(list(options)).encode())
+    return digest.hexdigest()
+#endregion
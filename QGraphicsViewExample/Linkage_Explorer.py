@@ -0,0 +1,227 @@
+#region imports
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import math
+import os
+import sys
+import warnings
+import numpy as np
+from Linkage_Cache import chunkKey
+from Linkage_Kinematics import FourBar, GRASHOF_CLASSES, OPEN, grashofCode
+#endregion
+
+#region constants
+#the design variables of a candidate, in the order they are stored in a chunk
+PARAMETERS = ('pivot0X', 'pivot0Y', 'pivot1X', 'pivot1Y', 'l1', 'l2', 'l3')
+#the columns written for each candidate.  Angles are in degrees.
+COLUMNS = PARAMETERS + ('grashof', 'crankRange', 'rockerSwing', 'minTransmission', 'maxTransmission',
+                        'couplerMinX', 'couplerMaxX', 'couplerMinY', 'couplerMaxY', 'couplerPathLength')
+#endregion
+
+#region class definitions
+class DesignSpace:
+    def __init__(self, **ranges):
+        """
+        A grid of candidate four-bars.  Each design variable in PARAMETERS is given either as a number, which holds it
+        fixed, or as a (low, high, count) tuple, which samples it evenly.  Candidates are generated lazily so the grid
+        can be far larger than memory.
+        :param ranges: one keyword per name in PARAMETERS
+        """
+        missing = [name for name in PARAMETERS if name not in ranges]
+        if missing:
+            raise ValueError("DesignSpace is missing " + ", ".join(missing))
+        self.values = []
+        for name in PARAMETERS:
+            r = ranges[name]
+            self.values.append(np.linspace(r[0], r[1], int(r[2])) if isinstance(r, (tuple, list)) else np.array([r]))
+
+    @classmethod
+    def aroundFourBar(cls, fourBar, spread=0.2, count=5):
+        """
+        Builds a design space centred on an existing linkage, e.g. the one drawn by MainWindow.buildScene.  Pivot
+        coordinates vary by +/- spread times the ground length and link lengths by +/- spread times their length.
+        :param fourBar: the template FourBar
+        :param spread: fraction to vary each design variable by
+        :param count: samples per design variable
+        :return: a DesignSpace
+        """
+        ground = fourBar.groundLength()
+        ranges = {}
+        for name in PARAMETERS:
+            v = getattr(fourBar, name)
+            delta = spread * (ground if name.startswith('pivot') else v)
+            ranges[name] = (v - delta, v + delta, count)
+        return cls(**ranges)
+
+    def __len__(self):
+        return math.prod(v.size for v in self.values)
+
+    def chunks(self, chunkSize):
+        """
+        :param chunkSize: candidates per chunk
+        :return: a generator of (n, len(PARAMETERS)) arrays of candidates
+        """
+        candidates = itertools.product(*self.values)
+        while True:
+            chunk = np.array(list(itertools.islice(candidates, chunkSize)), dtype=float)
+            if chunk.size == 0:
+                return
+            yield chunk
+#endregion
+
+#region function definitions
+def evaluateChunk(chunk, resolutionDeg=1.0, branch=OPEN, couplerAlong=0.5, couplerOffset=0.0):
+    """
+    Evaluates a chunk of candidates in one go by giving FourBar column arrays of design variables, so that
+    solveBatch broadcasts them against a row of crank angles.
+    :param chunk: (n, len(PARAMETERS)) array of candidates
+    :param resolutionDeg: crank angle step in degrees
+    :param branch: OPEN or CROSSED
+    :param couplerAlong: coupler point position along link2 (see FourBarPoses.couplerPoint)
+    :param couplerOffset: coupler point offset from link2
+    :return: (n, len(COLUMNS)) array
+    """
+    columns = [chunk[:, i:i + 1] for i in range(len(PARAMETERS))]
+    fourBar = FourBar(*columns, branch=branch)
+    theta2 = np.deg2rad(np.arange(0.0, 360.0, resolutionDeg))[np.newaxis, :]
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        #rows that never assemble are all nan, which is expected here
+        warnings.simplefilter('ignore', RuntimeWarning)
+        poses = fourBar.solveBatch(theta2)
+        grashof = grashofCode(fourBar.groundLength(), *columns[4:]).ravel()
+        valid = poses.valid
+        anyValid = valid.any(axis=1)
+        crankRange = valid.mean(axis=1) * 360.0
+        #swing of the rocker measured from its mean direction, and a full turn when the rocker is a crank
+        mean = np.arctan2(np.nanmean(np.sin(poses.theta4), axis=1), np.nanmean(np.cos(poses.theta4), axis=1))
+        relative = np.mod(poses.theta4 - mean[:, np.newaxis] + np.pi, 2.0 * np.pi) - np.pi
+        rockerSwing = np.degrees(np.nanmax(np.where(valid, relative, -np.inf), axis=1) -
+                                 np.nanmin(np.where(valid, relative, np.inf), axis=1))
+        rockerSwing = np.where((grashof == 1) | (grashof == 2), 360.0, rockerSwing)
+        mu = np.degrees(poses.transmissionAngle())
+        minTransmission = np.nanmin(np.where(valid, mu, np.inf), axis=1)
+        maxTransmission = np.nanmax(np.where(valid, mu, -np.inf), axis=1)
+        cx, cy = poses.couplerPoint(couplerAlong, couplerOffset)
+        extents = [np.nanmin(np.where(valid, c, np.inf), axis=1) if lo else np.nanmax(np.where(valid, c, -np.inf), axis=1)
+                   for c, lo in ((cx, True), (cx, False), (cy, True), (cy, False))]
+        pathLength = np.nansum(np.hypot(np.diff(cx, axis=1), np.diff(cy, axis=1)), axis=1)
+    results = np.column_stack([chunk, grashof, crankRange, rockerSwing, minTransmission, maxTransmission] + extents +
+                              [pathLength])
+    #candidates that never assemble have no motion to summarize
+    results[~anyValid, len(PARAMETERS) + 2:] = np.nan
+    return results
+
+def explore(space, path, workers=None, chunkSize=1024, resolutionDeg=1.0, branch=OPEN, couplerAlong=0.5,
+            couplerOffset=0.0, progress=None, cache=None):
+    """
+    Evaluates every candidate of a design space across a process pool and streams the results to a csv file as the
+    chunks finish.  Only a few chunks per worker are in flight at a time, so memory stays flat however large the
+    space is.  No QApplication is needed.  With a cache, chunks evaluated by an earlier sweep with the same settings
+    are read back instead of being sent to the pool, and new chunks are stored.
+    :param space: a DesignSpace
+    :param path: csv file to write
+    :param workers: number of processes, defaults to os.cpu_count()
+    :param chunkSize: candidates per task
+    :param resolutionDeg: crank angle step in degrees
+    :param branch: OPEN or CROSSED
+    :param couplerAlong: coupler point position along link2
+    :param couplerOffset: coupler point offset from link2
+    :param progress: optional callable(candidatesDone, candidatesTotal)
+    :param cache: optional Linkage_Cache.LinkageCache
+    :return: the number of candidates written
+    """
+    workers = os.cpu_count() if workers is None else workers
+    total = len(space)
+    done = 0
+    chunks = space.chunks(chunkSize)
+    grashofNames = np.array(GRASHOF_CLASSES)
+    options = (resolutionDeg, int(branch), couplerAlong, couplerOffset)
+    with open(path, 'w', newline='') as f, concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+
+        def write(results):
+            rows = results.astype(object)
+            rows[:, len(PARAMETERS)] = grashofNames[results[:, len(PARAMETERS)].astype(int)]
+            writer.writerows(rows)
+            return len(results)
+
+        #future -> cache key of its chunk
+        pending = {}
+        remaining = True
+        while True:
+            #cached chunks are written straight away and do not take a place in the pool
+            while remaining and len(pending) < 2 * workers:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    remaining = False
+                    break
+                key = None
+                if cache is not None:
+                    key = chunkKey(chunk, *options)
+                    results = cache.chunkResults(key)
+                    if results is not None:
+                        done += write(results)
+                        continue
+                pending[pool.submit(evaluateChunk, chunk, resolutionDeg, branch, couplerAlong, couplerOffset)] = key
+            if not pending:
+                break
+            finished = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)[0]
+            for future in finished:
+                results = future.result()
+                key = pending.pop(future)
+                if key is not None:
+                    cache.storeChunkResults(key, results)
+                done += write(results)
+            if progress is not None:
+                progress(done, total)
+    return done
+
+def parseRange(text):
+    """
+    Parses a command line design variable: 'value' or 'low:high:count'.
+    """
+    parts = text.split(':')
+    if len(parts) == 1:
+        return float(parts[0])
+    if len(parts) == 3:
+        return float(parts[0]), float(parts[1]), int(parts[2])
+    raise argparse.ArgumentTypeError("expected value or low:high:count, got " + text)
+#endregion
+
+#region function calls
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Sweep four-bar designs around the linkage drawn by GraphicsView_App.")
+    parser.add_argument('output', help="csv file for the results")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk', type=int, default=1024, help="candidates per task")
+    parser.add_argument('--resolution', type=float, default=1.0, help="crank angle step in degrees")
+    parser.add_argument('--spread', type=float, default=0.2, help="+/- fraction around the template linkage")
+    parser.add_argument('--count', type=int, default=5, help="samples per design variable around the template")
+    parser.add_argument('--cache', nargs='?', const='', default=None,
+                        help="reuse and store chunk results in a Linkage_Cache folder (default folder if none given)")
+    for name in PARAMETERS:
+        parser.add_argument('--' + name, type=parseRange, default=None, help="value or low:high:count")
+    args = parser.parse_args()
+
+    #the template is the four-bar from MainWindow.buildScene
+    template = FourBar(-100, 0, 60, -30, 60, math.hypot(200, 90), math.hypot(40, 120), branch=OPEN)
+    space = DesignSpace.aroundFourBar(template, args.spread, args.count)
+    overrides = {name: getattr(args, name) for name in PARAMETERS if getattr(args, name) is not None}
+    if overrides:
+        ranges = {name: (v[0], v[-1], v.size) for name, v in zip(PARAMETERS, space.values)}
+        ranges.update(overrides)
+        space = DesignSpace(**ranges)
+
+    def report(done, total):
+        print("\r{} / {} candidates".format(done, total), end='', file=sys.stderr)
+    cache = None
+    if args.cache is not None:
+        from Linkage_Cache import LinkageCache
+        cache = LinkageCache(args.cache or None)
+    n = explore(space, args.output, workers=args.workers, chunkSize=args.chunk, resolutionDeg=args.resolution,
+                progress=report, cache=cache)
+    print("\nwrote {} candidates to {}".format(n, args.output), file=sys.stderr)
+#endregion
@@ -0,0 +1,309 @@
+#region imports
+import math
+#numpy is imported inside the array functions, so that the scalar solver (all the GUI needs to start up and drag)
+#does not pay for loading it
+#endregion
+
+#region constants
+#assembly branches (circuits) of a four-bar.  The branch is the sign of the cross product (A-O4)x(B-O4) measured
+#with y pointing up, which only changes sign at a toggle position, so a linkage that starts on one branch stays on it.
+#OPEN is the circuit that is convex when the crank points up, perpendicular to the ground link (Norton's convention).
+OPEN = -1
+CROSSED = 1
+#Grashof classes, indexed by the codes returned by grashofCode
+GRASHOF_CLASSES = ('crank-rocker', 'double-crank', 'rocker-crank', 'double-rocker', 'change-point', 'triple-rocker')
+#endregion
+
+#region class definitions
+class FourBar:
+    def __init__(self, pivot0X, pivot0Y, pivot1X, pivot1Y, l1, l2, l3, branch=OPEN, name='FourBar'):
+        """
+        This is a closed-form position solver for a planar four-bar linkage.  It uses the same conventions as the
+        scene in GraphicsView_App: coordinates are scene coordinates (y pointing down) and angles are measured
+        counter-clockwise as seen on screen, so a link of length l at angle theta from (x0, y0) ends at
+        (x0 + l*cos(theta), y0 - l*sin(theta)).
+
+        The loop is:  pivot0 --link1 (crank)--> A --link2 (coupler)--> B <--link3 (rocker)-- pivot1.
+        Given the crank angle, A is known and B is an intersection of the circle of radius l2 about A with the
+        circle of radius l3 about pivot1.  There are zero, one or two intersections.  The branch picks one of the
+        two, and no intersection means the linkage cannot be assembled at that crank angle.
+
+        :param pivot0X: x of the crank ground pivot (start of link1)
+        :param pivot0Y: y of the crank ground pivot
+        :param pivot1X: x of the rocker ground pivot (start of link3)
+        :param pivot1Y: y of the rocker ground pivot
+        :param l1: crank length
+        :param l2: coupler length
+        :param l3: rocker length
+        :param branch: OPEN or CROSSED
+        :param name:
+        """
+        self.pivot0X = pivot0X
+        self.pivot0Y = pivot0Y
+        self.pivot1X = pivot1X
+        self.pivot1Y = pivot1Y
+        self.l1 = l1
+        self.l2 = l2
+        self.l3 = l3
+        self.branch = branch
+        self.name = name
+
+    @classmethod
+    def fromLinks(cls, link1, link2, link3, branch=None):
+        """
+        Builds a FourBar from the crank, coupler and rocker RigidLink objects of a scene.  The ground pivots are the
+        start points of link1 and link3.  If no branch is given, the branch of the current pose is used.
+        :param link1: crank
+        :param link2: coupler
+        :param link3: rocker
+        :param branch: OPEN, CROSSED or None
+        :return: a FourBar
+        """
+        if branch is None:
+            branch = branchOf(link1.endX, link1.endY, link3.startX, link3.startY, link3.endX, link3.endY)
+        return cls(link1.startX, link1.startY, link3.startX, link3.startY,
+                   link1.linkLength(), link2.linkLength(), link3.linkLength(), branch=branch)
+
+    def key(self):
+        """
+        :return: a tuple that changes whenever a pivot position, link length or the branch changes
+        """
+        return (self.pivot0X, self.pivot0Y, self.pivot1X, self.pivot1Y, self.l1, self.l2, self.l3, self.branch)
+
+    def groundLength(self):
+        import numpy as np
+        return np.hypot(self.pivot1X - self.pivot0X, self.pivot1Y - self.pivot0Y)
+
+    def grashofClass(self):
+        """
+        :return: one of GRASHOF_CLASSES
+        """
+        return GRASHOF_CLASSES[int(grashofCode(self.groundLength(), self.l1, self.l2, self.l3))]
+
+    def solve(self, theta2, branch=None):
+        """
+        Solves the loop closure for a crank angle.
+        :param theta2: crank (link1) angle in radians
+        :param branch: OPEN or CROSSED, defaults to self.branch
+        :return: (xA, yA, xB, yB, theta3, theta4) in scene coordinates, or None if the linkage cannot be assembled
+        """
+        if branch is None: branch = self.branch
+        #work with y pointing up so that the angles are the usual counter-clockwise angles
+        xA = self.pivot0X + self.l1 * math.cos(theta2)
+        YA = -self.pivot0Y + self.l1 * math.sin(theta2)
+        X1 = self.pivot1X
+        Y1 = -self.pivot1Y
+        dx = xA - X1
+        dy = YA - Y1
+        d = math.hypot(dx, dy)
+        if d == 0.0 or d > self.l2 + self.l3 or d < abs(self.l2 - self.l3):
+            return None
+        #distance from pivot1 along pivot1->A to the chord joining the two intersections, and half the chord
+        a = (self.l3 * self.l3 - self.l2 * self.l2 + d * d) / (2.0 * d)
+        h = math.sqrt(max(self.l3 * self.l3 - a * a, 0.0))
+        ux = dx / d
+        uy = dy / d
+        xB = X1 + a * ux - branch * h * uy
+        YB = Y1 + a * uy + branch * h * ux
+        theta3 = math.atan2(YB - YA, xB - xA)
+        theta4 = math.atan2(YB - Y1, xB - X1)
+        return xA, -YA, xB, -YB, theta3, theta4
+
+    def solveBatch(self, theta2, branch=None):
+        """
+        Solves the loop closure for an array of crank angles at once.  This is the same construction as solve, written
+        as whole-array numpy operations so that a full revolution at fine resolution is a handful of array operations.
+        :param theta2: array-like of crank (link1) angles in radians
+        :param branch: OPEN or CROSSED, defaults to self.branch
+        :return: a FourBarPoses whose arrays have the shape of theta2.  Entries that cannot be assembled are nan and
+        are False in the valid mask.
+        """
+        import numpy as np
+        if branch is None: branch = self.branch
+        theta2 = np.asarray(theta2, dtype=float)
+        xA = self.pivot0X + self.l1 * np.cos(theta2)
+        YA = -self.pivot0Y + self.l1 * np.sin(theta2)
+        X1 = self.pivot1X
+        Y1 = -self.pivot1Y
+        dx = xA - X1
+        dy = YA - Y1
+        d = np.hypot(dx, dy)
+        valid = (d > 0.0) & (d <= self.l2 + self.l3) & (d >= abs(self.l2 - self.l3))
+        #invalid entries become nan here and carry through the rest of the arithmetic
+        d = np.where(valid, d, np.nan)
+        a = (self.l3 * self.l3 - self.l2 * self.l2 + d * d) / (2.0 * d)
+        h = np.sqrt(np.maximum(self.l3 * self.l3 - a * a, 0.0))
+        ux = dx / d
+        uy = dy / d
+        xB = X1 + a * ux - branch * h * uy
+        YB = Y1 + a * uy + branch * h * ux
+        theta3 = np.arctan2(YB - YA, xB - xA)
+        theta4 = np.arctan2(YB - Y1, xB - X1)
+        return FourBarPoses(theta2, xA, -YA, xB, -YB, theta3, theta4, valid)
+
+class FourBarMotionTable:
+    def __init__(self, fourBar, samples=3600):
+        """
+        The full motion of a four-bar precomputed once over an even grid of crank angles, so that a pose is a table
+        lookup and a linear interpolation instead of a solve.  The rocker angle is what gets interpolated; the joints
+        are then placed exactly from the crank and rocker angles, so link1 and link3 keep their lengths and link2 is
+        off by at most the interpolation error.  Near a position where the linkage cannot be assembled (where a grid
+        neighbour is invalid) the exact solver is used instead.
+        :param fourBar: the FourBar to tabulate.  key records its geometry at build time (see isStale).
+        :param samples: number of crank angles over a revolution
+        """
+        import numpy as np
+        self.fourBar = fourBar
+        self.key = fourBar.key()
+        self.samples = samples
+        self.step = 2.0 * math.pi / samples
+        poses = fourBar.solveBatch(np.arange(samples) * self.step)
+        #float32 is plenty for scene coordinates and halves the table
+        self.theta4 = poses.theta4.astype(np.float32)
+        self.xA = poses.xA.astype(np.float32)
+        self.yA = poses.yA.astype(np.float32)
+        self.xB = poses.xB.astype(np.float32)
+        self.yB = poses.yB.astype(np.float32)
+        self.valid = poses.valid
+
+    @classmethod
+    def fromArrays(cls, fourBar, arrays):
+        """
+        Rebuilds a table from the arrays of an earlier one (see arrays), e.g. read back from Linkage_Cache, without
+        solving anything.
+        :param fourBar: the FourBar the arrays were computed for
+        :param arrays: dict from arrays
+        :return: a FourBarMotionTable
+        """
+        table = cls.__new__(cls)
+        table.fourBar = fourBar
+        table.key = fourBar.key()
+        table.samples = len(arrays['valid'])
+        table.step = 2.0 * math.pi / table.samples
+        for name in ('theta4', 'xA', 'yA', 'xB', 'yB', 'valid'):
+            setattr(table, name, arrays[name])
+        return table
+
+    def arrays(self):
+        """
+        :return: the tabulated arrays by name, for fromArrays
+        """
+        return {'theta4': self.theta4, 'xA': self.xA, 'yA': self.yA, 'xB': self.xB, 'yB': self.yB, 'valid': self.valid}
+
+    def isStale(self):
+        """
+        :return: True if the four-bar's pivots, link lengths or branch changed since the table was built
+        """
+        return self.key != self.fourBar.key()
+
+    def solve(self, theta2):
+        """
+        Looks up the pose for a crank angle.  Same interface as FourBar.solve.
+        :param theta2: crank (link1) angle in radians
+        :return: (xA, yA, xB, yB, theta3, theta4) in scene coordinates, or None if the linkage cannot be assembled
+        """
+        u = (theta2 % (2.0 * math.pi)) / self.step
+        i = int(u) % self.samples
+        j = (i + 1) % self.samples
+        if not (self.valid[i] and self.valid[j]):
+            return self.fourBar.solve(theta2)
+        t4i = float(self.theta4[i])
+        #interpolate along the short way round, since theta4 wraps at +/-pi
+        dt4 = (float(self.theta4[j]) - t4i + math.pi) % (2.0 * math.pi) - math.pi
+        theta4 = t4i + (u - int(u)) * dt4
+        fb = self.fourBar
+        xA = fb.pivot0X + fb.l1 * math.cos(theta2)
+        yA = fb.pivot0Y - fb.l1 * math.sin(theta2)
+        xB = fb.pivot1X + fb.l3 * math.cos(theta4)
+        yB = fb.pivot1Y - fb.l3 * math.sin(theta4)
+        theta3 = math.atan2(-(yB - yA), xB - xA)
+        return xA, yA, xB, yB, theta3, theta4
+
+class FourBarPoses:
+    def __init__(self, theta2, xA, yA, xB, yB, theta3, theta4, valid):
+        """
+        The result of FourBar.solveBatch.  Each attribute is a numpy array with one entry per crank angle.
+        :param theta2: crank (link1) angles
+        :param xA: crank tip (start of link2) in scene coordinates
+        :param yA:
+        :param xB: rocker tip (end of link2 and link3) in scene coordinates
+        :param yB:
+        :param theta3: coupler (link2) angles
+        :param theta4: rocker (link3) angles
+        :param valid: True where the linkage can be assembled
+        """
+        self.theta2 = theta2
+        self.xA = xA
+        self.yA = yA
+        self.xB = xB
+        self.yB = yB
+        self.theta3 = theta3
+        self.theta4 = theta4
+        self.valid = valid
+
+    def __len__(self):
+        return self.theta2.size
+
+    def transmissionAngle(self):
+        """
+        The transmission angle is the angle between the coupler and the rocker at B, folded into 0..pi.  It is nan
+        where the linkage cannot be assembled.
+        :return: array of transmission angles in radians
+        """
+        import numpy as np
+        return np.abs(np.mod(self.theta3 - self.theta4 + np.pi, 2.0 * np.pi) - np.pi)
+
+    def couplerPoint(self, along=0.5, offset=0.0):
+        """
+        Traces a point fixed to the coupler.
+        :param along: position along A->B as a fraction of the coupler length
+        :param offset: distance from the line A->B, positive to the left of A->B as seen on screen
+        :return: x, y arrays in scene coordinates
+        """
+        import numpy as np
+        dx = self.xB - self.xA
+        dy = self.yB - self.yA
+        length = np.hypot(dx, dy)
+        #the left normal of (dx, dy) on screen is (dy, -dx) because y points down
+        return (self.xA + along * dx + offset * dy / length,
+                self.yA + along * dy - offset * dx / length)
+#endregion
+
+#region function definitions
+def branchOf(xA, yA, pivot1X, pivot1Y, xB, yB):
+    """
+    Finds the branch of an assembled four-bar pose given in scene coordinates.
+    :param xA: crank tip (end of link1)
+    :param yA:
+    :param pivot1X: rocker ground pivot (start of link3)
+    :param pivot1Y:
+    :param xB: rocker tip (end of link3)
+    :param yB:
+    :return: OPEN or CROSSED
+    """
+    #cross product (A-O4)x(B-O4) with y pointing up is minus the one computed with y pointing down
+    cross = -((xA - pivot1X) * (yB - pivot1Y) - (yA - pivot1Y) * (xB - pivot1X))
+    return CROSSED if cross > 0 else OPEN
+
+def grashofCode(l0, l1, l2, l3):
+    """
+    Classifies a four-bar by the Grashof condition s + l <= p + q and by which link is the shortest.  Works on scalars
+    or on numpy arrays of link lengths.
+    :param l0: ground length (pivot0 to pivot1)
+    :param l1: crank length
+    :param l2: coupler length
+    :param l3: rocker length
+    :return: index into GRASHOF_CLASSES
+    """
+    import numpy as np
+    lengths = np.stack(np.broadcast_arrays(l0, l1, l2, l3))
+    s = lengths.min(axis=0)
+    l = lengths.max(axis=0)
+    pq = lengths.sum(axis=0) - s - l
+    shortest = lengths.argmin(axis=0)
+    #crank-rocker, double-crank, rocker-crank, double-rocker by shortest link: crank, ground, rocker, coupler
+    code = np.choose(shortest, (1, 0, 3, 2))
+    tolerance = 1e-9 * l
+    code = np.where(np.abs(s + l - pq) <= tolerance, 4, code)
+    return np.where(s + l > pq + tolerance, 5, code)
+#endregion
@@ -0,0 +1,410 @@
+#region imports
+import math
+import warnings
+import numpy as np
+#endregion
+
+#region class definitions
+class Mechanism:
+    def __init__(self, name='Mechanism'):
+        """
+        A planar mechanism as a graph: joints are the nodes and rigid links are the edges.  Ground joints are fixed and
+        the rest move.  The position of the mechanism is found by Newton's method on the constraint equations
+
+            link (i, j) of length L:         ((xj-xi)^2 + (yj-yi)^2 - L^2) / (2L) = 0
+            driven link (i, j) at angle a:   xj - xi - L*cos(a) = 0,   yj - yi + L*sin(a) = 0
+            slider joint k on a line:        (xk-px)*uy - (yk-py)*ux = 0
+
+        with an analytic sparse Jacobian, so the cost of a solve grows with the number of links and loops rather than
+        with its square.  Every solve starts from the current joint positions (the last pose solved), so dragging
+        takes one or two iterations per move and stays on the assembly branch it started on.
+
+        Coordinates and angles follow the scene in GraphicsView_App: y points down and a link at angle a from (x0, y0)
+        ends at (x0 + L*cos(a), y0 - L*sin(a)).
+
+        :param name:
+        """
+        self.name = name
+        #joints
+        self.positions = np.zeros((0, 2))
+        self.fixed = np.zeros(0, dtype=bool)
+        #links: the start and end joint of each, their lengths and the RigidLink items they came from (or None)
+        self.linkStart = np.zeros(0, dtype=int)
+        self.linkEnd = np.zeros(0, dtype=int)
+        self.linkLength = np.zeros(0)
+        self.items = []
+        #the link index of each RigidLink item, for linkIndex
+        self.itemIndex = {}
+        #driven links and their angles, and slider joints with a point and unit direction of their line
+        self.drivers = {}
+        self.sliders = {}
+        self.iterations = 0
+
+    @classmethod
+    def fromItems(cls, links, pivots=(), tolerance=1e-6, name='Mechanism'):
+        """
+        Builds a mechanism from the RigidLink and RigidPivotPoint items of a scene.  Link end points closer than
+        tolerance are the same joint, and a joint at a pivot is fixed to the ground (see
+        Linkage_SpatialIndex.mergeJoints).
+        :param links: RigidLink items
+        :param pivots: RigidPivotPoint items
+        :param tolerance: distance at which end points are merged into one joint
+        :param name:
+        :return: a Mechanism
+        """
+        from Linkage_SpatialIndex import mergeJoints
+        links = list(links)
+        return cls.fromJoints(*mergeJoints(links, pivots, tolerance), items=links, name=name)
+
+    @classmethod
+    def fromJoints(cls, positions, fixed, starts, ends, items=None, name='Mechanism'):
+        """
+        Builds a mechanism from its joints and links all at once, so each array is allocated once however many links
+        there are (addJoint and addLink grow them one row at a time).  Link lengths are the distances between their
+        joints.
+        :param positions: (x, y) of each joint
+        :param fixed: True for each ground joint
+        :param starts: start joint of each link
+        :param ends: end joint of each link
+        :param items: the RigidLink drawn for each link, or None
+        :param name:
+        :return: a Mechanism
+        """
+        mechanism = cls(name=name)
+        mechanism.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        mechanism.fixed = np.array(fixed, dtype=bool)
+        mechanism.linkStart = np.array(starts, dtype=int)
+        mechanism.linkEnd = np.array(ends, dtype=int)
+        d = mechanism.positions[mechanism.linkEnd] - mechanism.positions[mechanism.linkStart]
+        mechanism.linkLength = np.hypot(d[:, 0], d[:, 1])
+        mechanism.items = list(items) if items is not None else [None] * len(mechanism.linkStart)
+        mechanism.itemIndex = {item: k for k, item in enumerate(mechanism.items) if item is not None}
+        return mechanism
+
+    def addJoint(self, x, y, fixed=False):
+        """
+        :return: the index of the new joint
+        """
+        self.positions = np.vstack((self.positions, (x, y)))
+        self.fixed = np.append(self.fixed, fixed)
+        return len(self.fixed) - 1
+
+    def addLink(self, start, end, length=None, item=None):
+        """
+        :param start: index of the start joint
+        :param end: index of the end joint
+        :param length: defaults to the current distance between the joints
+        :param item: the RigidLink drawn for it, moved by applyToItems
+        :return: the index of the new link
+        """
+        if length is None:
+            length = math.hypot(*(self.positions[end] - self.positions[start]))
+        self.linkStart = np.append(self.linkStart, start)
+        self.linkEnd = np.append(self.linkEnd, end)
+        self.linkLength = np.append(self.linkLength, length)
+        self.items.append(item)
+        if item is not None:
+            self.itemIndex[item] = len(self.items) - 1
+        return len(self.items) - 1
+
+    def addDriver(self, link, angle=None):
+        """
+        Drives a link's angle, e.g. the crank turned by the mouse.  Change the angle with setDriver.
+        :param link: link index or the RigidLink item
+        :param angle: in radians, defaults to the link's current angle
+        :return: the link index
+        """
+        link = self.linkIndex(link)
+        self.drivers[link] = self.linkAngle(link) if angle is None else angle
+        return link
+
+    def setDriver(self, link, angle):
+        self.drivers[self.linkIndex(link)] = angle
+
+    def addSlider(self, joint, angle=0.0, pointX=None, pointY=None):
+        """
+        Constrains a joint to slide on a straight line, e.g. the piston of a slider-crank.
+        :param joint: joint index
+        :param angle: direction of the line in radians
+        :param pointX: a point on the line, defaults to the joint's current position
+        :param pointY:
+        """
+        if pointX is None: pointX = self.positions[joint, 0]
+        if pointY is None: pointY = self.positions[joint, 1]
+        self.sliders[joint] = (pointX, pointY, math.cos(angle), -math.sin(angle))
+
+    def linkAngle(self, link, positions=None):
+        """
+        :return: the angle of a link in radians, measured as in the scene (y down)
+        """
+        p = self.positions if positions is None else positions
+        dx, dy = p[self.linkEnd[link]] - p[self.linkStart[link]]
+        return math.atan2(-dy, dx)
+
+    def linkIndex(self, link):
+        """
+        :param link: link index or the RigidLink item it was built from
+        """
+        if isinstance(link, (int, np.integer)):
+            return int(link)
+        return self.itemIndex[link]
+
+    def degreesOfFreedom(self):
+        """
+        Gruebler count of the mobility left after the drivers: free coordinates minus constraint equations.
+        """
+        return self.variableCount() - self.equationCount()
+
+    def variableCount(self):
+        return 2 * int(np.count_nonzero(~self.fixed))
+
+    def equationCount(self):
+        links = self.linkMask()
+        driven = np.zeros(len(self.items), dtype=bool)
+        driven[list(self.drivers)] = True
+        return int(np.count_nonzero(links & ~driven)) + 2 * int(np.count_nonzero(links & driven)) + len(self.sliders)
+
+    def linkMask(self):
+        """
+        :return: True for the links that have a moving joint, i.e., the ones that give an equation
+        """
+        return ~(self.fixed[self.linkStart] & self.fixed[self.linkEnd])
+
+    def residual(self, positions=None):
+        """
+        :param positions: joint positions, defaults to the current ones
+        :return: the constraint equations evaluated at the positions, in the order of the Jacobian's rows
+        """
+        return self.equations(positions, jacobian=False)[0]
+
+    def jacobian(self, positions=None):
+        """
+        :return: the sparse Jacobian (scipy.sparse csr_matrix) of the residual with respect to the free coordinates,
+        which are x, y of each moving joint in joint order
+        """
+        return self.equations(positions, jacobian=True)[1]
+
+    def equations(self, positions=None, jacobian=True, targets=None, weight=1.0):
+        """
+        Evaluates all constraint equations, and optionally their Jacobian, with whole-array numpy operations: one
+        pass per kind of constraint however many links there are.
+        :param targets: optional dict {joint: (x, y)} of points joints are pulled towards (see dragJoint); these add
+        the rows weight*(xk - x) and weight*(yk - y) after the constraints
+        :param weight: weight of the target rows
+        :return: (residual, Jacobian or None)
+        """
+        p = self.positions if positions is None else positions
+        #column of each joint's x and y in the Jacobian, or -1 for fixed joints
+        column = np.full((len(self.fixed), 2), -1)
+        column[~self.fixed] = 2 * np.arange(np.count_nonzero(~self.fixed))[:, np.newaxis] + (0, 1)
+        driven = np.zeros(len(self.items), dtype=bool)
+        driven[list(self.drivers)] = True
+        mask = self.linkMask()
+        residuals = []
+        rows, cols, vals = [], [], []
+        row = 0
+
+        #link lengths
+        lengthLinks = np.flatnonzero(mask & ~driven)
+        i = self.linkStart[lengthLinks]
+        j = self.linkEnd[lengthLinks]
+        L = self.linkLength[lengthLinks]
+        d = p[j] - p[i]
+        residuals.append((d[:, 0] ** 2 + d[:, 1] ** 2 - L ** 2) / (2.0 * L))
+        if jacobian:
+            r = row + np.arange(len(L))
+            g = d / L[:, np.newaxis]
+            for joint, sign in ((i, -1.0), (j, 1.0)):
+                for axis in (0, 1):
+                    rows.append(r)
+                    cols.append(column[joint, axis])
+                    vals.append(sign * g[:, axis])
+        row += len(L)
+
+        #driven links: both components of the link vector are set
+        drivenLinks = np.flatnonzero(mask & driven)
+        i = self.linkStart[drivenLinks]
+        j = self.linkEnd[drivenLinks]
+        L = self.linkLength[drivenLinks]
+        a = np.array([self.drivers[k] for k in drivenLinks], dtype=float)
+        d = p[j] - p[i]
+        residuals.append(np.column_stack((d[:, 0] - L * np.cos(a), d[:, 1] + L * np.sin(a))).ravel())
+        if jacobian:
+            for axis in (0, 1):
+                r = row + 2 * np.arange(len(L)) + axis
+                for joint, sign in ((i, -1.0), (j, 1.0)):
+                    rows.append(r)
+                    cols.append(column[joint, axis])
+                    vals.append(np.full(len(L), sign))
+        row += 2 * len(L)
+
+        #sliders
+        k = np.array(list(self.sliders), dtype=int)
+        line = np.array(list(self.sliders.values()), dtype=float).reshape(-1, 4)
+        residuals.append((p[k, 0] - line[:, 0]) * line[:, 3] - (p[k, 1] - line[:, 1]) * line[:, 2])
+        if jacobian:
+            r = row + np.arange(len(k))
+            rows += [r, r]
+            cols += [column[k, 0], column[k, 1]]
+            vals += [line[:, 3], -line[:, 2]]
+        row += len(k)
+
+        #targets
+        if targets:
+            k = np.array(list(targets), dtype=int)
+            goal = np.array(list(targets.values()), dtype=float).reshape(-1, 2)
+            residuals.append((weight * (p[k] - goal)).ravel())
+            if jacobian:
+                for axis in (0, 1):
+                    rows.append(row + 2 * np.arange(len(k)) + axis)
+                    cols.append(column[k, axis])
+                    vals.append(np.full(len(k), weight))
+            row += 2 * len(k)
+
+        residual = np.concatenate(residuals)
+        if not jacobian:
+            return residual, None
+        from scipy import sparse
+        rows = np.concatenate(rows)
+        cols = np.concatenate(cols)
+        vals = np.concatenate(vals)
+        #fixed joints are not variables
+        keep = cols >= 0
+        J = sparse.csr_matrix((vals[keep], (rows[keep], cols[keep])), shape=(row, self.variableCount()))
+        return residual, J
+
+    def solve(self, maxIterations=20, tolerance=1e-9, damping=1e-6):
+        """
+        Newton's method from the current joint positions.  When there are as many equations as free coordinates the
+        sparse system is solved directly; otherwise (an under- or over-constrained mechanism, or a singular Jacobian
+        at a toggle position) a damped least squares step is taken instead.  If the solve fails the joints are left
+        where they were.
+        :param maxIterations:
+        :param tolerance: largest residual accepted, in scene units
+        :param damping: Levenberg-Marquardt damping for the least squares step
+        :return: True if the constraints are satisfied
+        """
+        from scipy import sparse
+        from scipy.sparse import linalg
+        start = self.positions.copy()
+        free = ~self.fixed
+        solved = False
+        for iteration in range(maxIterations + 1):
+            r = self.residual()
+            if r.size == 0 or np.max(np.abs(r)) <= tolerance:
+                solved = True
+                break
+            if iteration == maxIterations:
+                break
+            J = self.jacobian()
+            step = None
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                if J.shape[0] == J.shape[1]:
+                    step = linalg.spsolve(J.tocsc(), -r)
+                if step is None or not np.all(np.isfinite(step)):
+                    JT = J.T.tocsr()
+                    A = (JT @ J + damping * sparse.identity(J.shape[1], format='csr')).tocsc()
+                    step = linalg.spsolve(A, -(JT @ r))
+            if not np.all(np.isfinite(step)):
+                break
+            self.positions[free] += step.reshape(-1, 2)
+        self.iterations = iteration
+        if solved:
+            return True
+        self.positions = start
+        return False
+
+    def dragJoint(self, joint, x, y, weight=0.1, iterations=2, tolerance=1e-9, damping=1e-6):
+        """
+        Moves the mechanism so that a joint follows the mouse as closely as the links allow, e.g. dragging the rocker
+        tip of a four-bar, which turns the crank.  The drivers are released and a few damped Gauss-Newton steps are
+        taken on the constraints together with a weighted pull of the joint towards x, y; then the drivers are set to
+        the angles their links reached and the pose is projected back onto the exact constraints with solve.  The
+        target rows carry a small weight so the constraints win wherever the point cannot be reached.
+        :param joint: index of a moving joint
+        :param x: target in scene coordinates
+        :param y:
+        :param weight: weight of the target against the constraints
+        :param iterations: least squares steps towards the target.  The target moves little between mouse moves, so
+        a couple of steps from the last pose get within a fraction of a scene unit.
+        :param tolerance: as for solve
+        :param damping: Levenberg-Marquardt damping of the least squares steps
+        :return: True if the mechanism moved to a valid pose; otherwise it is left where it was
+        """
+        from scipy import sparse
+        from scipy.sparse import linalg
+        start = self.positions.copy()
+        drivers = self.drivers
+        free = ~self.fixed
+        self.drivers = {}
+        try:
+            for i in range(iterations):
+                r, J = self.equations(targets={joint: (x, y)}, weight=weight)
+                JT = J.T.tocsr()
+                A = (JT @ J + damping * sparse.identity(J.shape[1], format='csr')).tocsc()
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    step = linalg.spsolve(A, -(JT @ r))
+                if not np.all(np.isfinite(step)):
+                    break
+                self.positions[free] += step.reshape(-1, 2)
+                if np.max(np.abs(step), initial=0.0) <= tolerance:
+                    break
+        finally:
+            self.drivers = drivers
+        for link in drivers:
+            drivers[link] = self.linkAngle(link)
+        if self.solve(tolerance=tolerance, damping=damping):
+            return True
+        self.positions = start
+        for link in drivers:
+            drivers[link] = self.linkAngle(link)
+        return False
+
+    def readItems(self):
+        """
+        Takes the joint positions from the RigidLink items, for when the items were moved by something else (e.g. the
+        closed-form four-bar solve) since the last solve.  It reads the items, so call it on the GUI thread; a solver
+        thread is handed the end points instead (see setLinkPositions).
+        """
+        for k, item in enumerate(self.items):
+            if item is not None:
+                self.positions[self.linkStart[k]] = (item.startX, item.startY)
+                self.positions[self.linkEnd[k]] = (item.endX, item.endY)
+        for link in self.drivers:
+            self.drivers[link] = self.linkAngle(link)
+
+    def setLinkPositions(self, ends):
+        """
+        Moves the joints to where the links end, the inverse of linkPositions, and takes the drivers' angles from
+        there.
+        :param ends: (n, 4) array-like of startX, startY, endX, endY of every link
+        """
+        ends = np.asarray(ends, dtype=float).reshape(-1, 4)
+        self.positions[self.linkStart] = ends[:, 0:2]
+        self.positions[self.linkEnd] = ends[:, 2:4]
+        for link in self.drivers:
+            self.drivers[link] = self.linkAngle(link)
+
+    def linkPositions(self):
+        """
+        :return: (n, 4) array of startX, startY, endX, endY of every link
+        """
+        return np.hstack((self.positions[self.linkStart], self.positions[self.linkEnd]))
+
+    def applyToItems(self, ends=None):
+        """
+        Moves the RigidLink items to the solved pose.  Links with both joints on the ground are left alone.  When the
+        items share a LinkStore they are all moved with one LinkStore.setEndpoints call.
+        :param ends: link end points from linkPositions, defaults to the current pose
+        """
+        if ends is None: ends = self.linkPositions()
+        moving = [k for k in np.flatnonzero(self.linkMask()) if self.items[k] is not None]
+        store = self.items[moving[0]].store if moving else None
+        if store is not None and all(self.items[k].store is store for k in moving):
+            store.setEndpoints([self.items[k].row for k in moving], ends[moving])
+            return
+        for k in moving:
+            self.items[k].setEndpoints(*ends[k].tolist())
+#endregion
@@ -0,0 +1,96 @@
+#region imports
+import collections
+import json
+from time import perf_counter_ns
+#endregion
+
+#region class definitions
+class Profiler:
+    def __init__(self, capacity=20000):
+        """
+        A low-overhead timing recorder for the app's hot paths.  Each record is (name, start, duration) in
+        nanoseconds and goes into a ring buffer that keeps the last capacity records, so profiling can be left on
+        for as long as needed.  The hooks in GraphicsView_App all look like
+
+            t0 = perf_counter_ns() if PROFILER.enabled else 0
+            ...
+            if t0: PROFILER.record('name', t0)
+
+        so that when the profiler is disabled they cost one attribute test each.
+        :param capacity: number of records kept
+        """
+        self.enabled = False
+        self.records = collections.deque(maxlen=capacity)
+
+    def record(self, name, start, end=None):
+        """
+        :param name: what was timed, e.g. 'solve' or 'paint RigidLink'
+        :param start: perf_counter_ns() at the start
+        :param end: perf_counter_ns() at the end, defaults to now
+        """
+        if end is None: end = perf_counter_ns()
+        self.records.append((name, start, end - start))
+
+    def clear(self):
+        self.records.clear()
+
+    def durations(self, name, since=None):
+        """
+        :param name: record name
+        :param since: only records that started at or after this perf_counter_ns() value
+        :return: list of durations in ns
+        """
+        return [d for n, s, d in self.records if n == name and (since is None or s >= since)]
+
+    def percentiles(self, name, qs=(50, 99), since=None):
+        """
+        :return: list of duration percentiles in ns, or None for each when there are no records
+        """
+        ordered = sorted(self.durations(name, since))
+        if not ordered:
+            return [None for q in qs]
+        return [ordered[min(int(q / 100.0 * len(ordered)), len(ordered) - 1)] for q in qs]
+
+    def count(self, name, since=None):
+        return sum(1 for n, s, d in self.records if n == name and (since is None or s >= since))
+
+    def summary(self, window=1.0):
+        """
+        The numbers shown by the on-screen overlay, over the last window seconds.
+        :return: dict with fps, solve p50/p99 in us and paint calls per frame
+        """
+        since = perf_counter_ns() - int(window * 1e9)
+        frames = self.count('frame', since)
+        p50, p99 = self.percentiles('solve', since=since)
+        paints = {name: self.count(name, since) for name in ('paint RigidLink', 'paint RigidPivotPoint')}
+        return {'fps': frames / window,
+                'solveP50us': None if p50 is None else p50 / 1e3,
+                'solveP99us': None if p99 is None else p99 / 1e3,
+                'linkPaintsPerFrame': paints['paint RigidLink'] / frames if frames else 0.0,
+                'pivotPaintsPerFrame': paints['paint RigidPivotPoint'] / frames if frames else 0.0}
+
+    def summaryText(self, window=1.0):
+        s = self.summary(window)
+        solve = "n/a" if s['solveP50us'] is None else "{:0.1f} / {:0.1f} us".format(s['solveP50us'], s['solveP99us'])
+        return ("FPS: {:0.1f}\nsolve p50/p99: {}\npaints/frame: {:0.1f} links, {:0.1f} pivots"
+                .format(s['fps'], solve, s['linkPaintsPerFrame'], s['pivotPaintsPerFrame']))
+
+    def exportTrace(self, path):
+        """
+        Writes the buffer as a Chrome trace (the JSON trace event format read by chrome://tracing and Perfetto).
+        :param path: file to write
+        :return: the number of events written
+        """
+        records = list(self.records)
+        origin = min((s for n, s, d in records), default=0)
+        events = [{'name': n, 'ph': 'X', 'ts': (s - origin) / 1e3, 'dur': d / 1e3, 'pid': 0, 'tid': 0}
+                  for n, s, d in records]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events)
+#endregion
+
+#region globals
+#the profiler the app's hooks report to
+PROFILER = Profiler()
+#endregion
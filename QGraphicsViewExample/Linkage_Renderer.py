@@ -0,0 +1,205 @@
+#region imports
+import argparse
+import concurrent.futures
+import itertools
+import math
+import multiprocessing
+import os
+import sys
+#endregion
+
+#region constants
+#bytes per pixel of a raw frame (QImage.Format_ARGB32_Premultiplied)
+RAW_PIXEL_BYTES = 4
+#endregion
+
+#region globals
+#the window each worker process renders with, built once by initWorker
+WORKER = {}
+#endregion
+
+#region function definitions
+def initWorker(width, height, zoom, antialiasing, fourBar=None, dataset=None):
+    """
+    Runs once in each worker process: starts a QApplication on the offscreen platform and builds the same scene as
+    GraphicsView_App (a MainWindow that is never put on a screen), so the frames are drawn by the very same
+    RigidLink.paint, RigidPivotPoint.paint and grid code.
+    :param fourBar: optional FourBar to put in the scene instead of the demo linkage (see MainWindow.loadFourBar)
+    :param dataset: optional MotionDataset folder whose rows are the frames.  It is opened with
+    MainWindow.openDataset, so it is drawn on the four-bar in its metadata, or on the demo linkage if it has none and
+    its joint columns fit it.
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import PyQt5.QtGui as qtg
+    import PyQt5.QtCore as qtc
+    import PyQt5.QtWidgets as qtw
+    import GraphicsView_App
+    app = qtw.QApplication.instance() or qtw.QApplication([])
+    GraphicsView_App.app = app
+    mw = GraphicsView_App.MainWindow()
+    mw.hide()
+    mw.drawDecorations()
+    if dataset is not None:
+        mw.openDataset(dataset)
+    elif fourBar is not None:
+        mw.loadFourBar(fourBar)
+    rect = mw.scene.sceneRect()
+    #zoom about the center of the scene
+    source = qtc.QRectF(rect.center().x() - rect.width() / (2 * zoom), rect.center().y() - rect.height() / (2 * zoom),
+                        rect.width() / zoom, rect.height() / zoom)
+    WORKER.update(app=app, window=mw, source=source, target=qtc.QRectF(0, 0, width, height), width=width,
+                  height=height, antialiasing=antialiasing, dataset=dataset is not None, qtg=qtg, qtc=qtc)
+
+def renderFrame(frame):
+    """
+    Poses the worker's linkage and draws the scene into a new QImage.
+    :param frame: crank angle in radians, or the row index when the worker renders a dataset
+    :return: the QImage
+    """
+    qtg = WORKER['qtg']
+    mw = WORKER['window']
+    if WORKER['dataset']:
+        mw.showDatasetFrame(frame)
+    else:
+        mw.moveCrank(frame)
+    image = qtg.QImage(WORKER['width'], WORKER['height'], qtg.QImage.Format_ARGB32_Premultiplied)
+    image.fill(WORKER['qtc'].Qt.white)
+    painter = qtg.QPainter(image)
+    painter.setRenderHint(qtg.QPainter.Antialiasing, WORKER['antialiasing'])
+    mw.scene.render(painter, WORKER['target'], WORKER['source'])
+    painter.end()
+    return image
+
+def renderChunk(first, angles, output, raw):
+    """
+    Renders consecutive frames in a worker.  PNG frames go to their own files; raw frames are written straight into
+    their slot of the shared stream file, so no pixels travel back to the parent process.
+    :param first: index of the first frame
+    :param angles: crank angles of the frames, or dataset rows (see renderFrame)
+    :param output: folder for PNG frames, or the raw stream file
+    :param raw: write raw frames
+    :return: the number of frames rendered
+    """
+    if raw:
+        frameBytes = WORKER['width'] * WORKER['height'] * RAW_PIXEL_BYTES
+        fd = os.open(output, os.O_WRONLY)
+        try:
+            for i, angle in enumerate(angles):
+                #keep the image referenced while its bits are read: the pointer does not keep it alive
+                image = renderFrame(angle)
+                bits = image.constBits()
+                bits.setsize(frameBytes)
+                os.pwrite(fd, bits.asstring(), (first + i) * frameBytes)
+        finally:
+            os.close(fd)
+    else:
+        for i, angle in enumerate(angles):
+            renderFrame(angle).save(os.path.join(output, 'frame{:06d}.png'.format(first + i)), 'PNG')
+    return len(angles)
+
+def renderFrames(angles, output, width=800, height=800, zoom=1.0, raw=False, workers=None, chunkSize=32,
+                 antialiasing=True, progress=None, fourBar=None):
+    """
+    Renders the linkage of GraphicsView_App at a sequence of crank angles, across a pool of worker processes that
+    each hold their own offscreen scene.  Frames are handed out in chunks, a few chunks per worker at a time.  No
+    QApplication is needed in the calling process, and the workers are started with 'spawn', so this is also safe to
+    call from a running GUI.
+    :param angles: crank angles in radians, one per frame: any sequence that can be sliced, e.g. the memory-mapped
+    theta2 column of a MotionDataset, which is only read a chunk at a time
+    :param output: a folder for frameNNNNNN.png files, or with raw a file for the frames as one stream of
+    width*height ARGB32 premultiplied pixels each
+    :param width: frame width in pixels
+    :param height: frame height in pixels
+    :param zoom: magnification about the center of the scene rect
+    :param raw: write a raw frame stream instead of PNG files
+    :param workers: number of processes, defaults to os.cpu_count()
+    :param chunkSize: frames per task
+    :param antialiasing:
+    :param progress: optional callable(framesDone, framesTotal)
+    :param fourBar: the FourBar to draw, defaults to the linkage GraphicsView_App builds
+    :return: the number of frames rendered
+    """
+    return renderPool(angles, output, width, height, zoom, raw, workers, chunkSize, antialiasing, progress,
+                      (fourBar, None))
+
+def renderDataset(folder, output, width=800, height=800, zoom=1.0, raw=False, workers=None, chunkSize=32,
+                  antialiasing=True, progress=None, step=1):
+    """
+    Renders the rows of a MotionDataset (see Linkage_Storage), posing the links from its xA, yA, xB, yB columns on
+    the four-bar stored in its metadata, as MainWindow.openDataset shows it.  Each worker memory-maps the dataset
+    itself, so only the row indices are handed out.  The options are as for renderFrames.
+    :param folder: the dataset folder
+    :param step: render every step-th row
+    :return: the number of frames rendered
+    """
+    from Linkage_Storage import MotionDataset
+    rows = range(0, len(MotionDataset(folder)), step)
+    return renderPool(rows, output, width, height, zoom, raw, workers, chunkSize, antialiasing, progress,
+                      (None, os.path.abspath(folder)))
+
+def renderPool(frames, output, width, height, zoom, raw, workers, chunkSize, antialiasing, progress, scene):
+    """
+    The process pool behind renderFrames and renderDataset.
+    :param frames: crank angles or dataset rows (see renderFrame), a sequence that can be sliced
+    :param scene: (fourBar, dataset) for initWorker
+    :return: the number of frames rendered
+    """
+    workers = os.cpu_count() if workers is None else workers
+    if raw:
+        with open(output, 'wb') as f:
+            f.truncate(len(frames) * width * height * RAW_PIXEL_BYTES)
+    else:
+        os.makedirs(output, exist_ok=True)
+    done = 0
+
+    def sliceChunk(first):
+        #sliced out (and read, for a memory-mapped column) only when it is handed out, as plain Python numbers
+        frameSlice = frames[first:first + chunkSize]
+        return first, frameSlice.tolist() if hasattr(frameSlice, 'tolist') else list(frameSlice)
+    chunks = (sliceChunk(first) for first in range(0, len(frames), chunkSize))
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initWorker,
+                                                initargs=(width, height, zoom, antialiasing) + scene) as pool:
+        pending = set()
+        while True:
+            for first, chunk in itertools.islice(chunks, 2 * workers - len(pending)):
+                pending.add(pool.submit(renderChunk, first, chunk, output, raw))
+            if not pending:
+                break
+            finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                done += future.result()
+            if progress is not None:
+                progress(done, len(frames))
+    return done
+#endregion
+
+#region function calls
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Render frames of the linkage drawn by GraphicsView_App turning "
+                                                 "through its crank angles.")
+    parser.add_argument('output', help="folder for PNG frames, or a file for --raw")
+    parser.add_argument('--frames', type=int, default=360, help="frames over the sweep")
+    parser.add_argument('--turns', type=float, default=1.0, help="crank revolutions over the sweep")
+    parser.add_argument('--start', type=float, default=90.0, help="crank angle of the first frame in degrees")
+    parser.add_argument('--dataset', default=None, help="render the rows of a MotionDataset folder instead")
+    parser.add_argument('--step', type=int, default=1, help="with --dataset, render every step-th row")
+    parser.add_argument('--width', type=int, default=800)
+    parser.add_argument('--height', type=int, default=800)
+    parser.add_argument('--zoom', type=float, default=1.0)
+    parser.add_argument('--raw', action='store_true', help="write one raw ARGB32 frame stream")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    def report(done, total):
+        print("\r{} / {} frames".format(done, total), end='', file=sys.stderr)
+    if args.dataset is not None:
+        n = renderDataset(args.dataset, args.output, args.width, args.height, args.zoom, args.raw, args.workers,
+                          progress=report, step=args.step)
+    else:
+        frameAngles = [math.radians(args.start) + 2.0 * math.pi * args.turns * i / args.frames
+                       for i in range(args.frames)]
+        n = renderFrames(frameAngles, args.output, args.width, args.height, args.zoom, args.raw, args.workers,
+                         progress=report)
+    print("\nwrote {} frames to {}".format(n, args.output), file=sys.stderr)
+#endregion
@@ -0,0 +1,238 @@
+#region imports
+import json
+import numpy as np
+import PyQt5.QtGui as qtg
+import PyQt5.QtCore as qtc
+#endregion
+
+#region constants
+SCENE_FILE_VERSION = 1
+#the columns of each item table, one row per item.  Positions are in scene coordinates.  A polygon's row points into
+#the shared points table; paths are kept as one QDataStream of QPainterPaths, in row order.
+ITEM_COLUMNS = {'pivots': ('x', 'y', 'height', 'width', 'rotation', 'z'),
+                'links': ('startX', 'startY', 'endX', 'endY', 'radius', 'z'),
+                'lines': ('x1', 'y1', 'x2', 'y2', 'z'),
+                'rects': ('left', 'top', 'width', 'height', 'z'),
+                'ellipses': ('left', 'top', 'width', 'height', 'z'),
+                'polygons': ('first', 'count', 'z'),
+                'paths': ('z',)}
+#the mechanism, which a streaming load shows first.  Everything else is decoration.
+MECHANISM_KINDS = ('pivots', 'links')
+DECORATION_KINDS = ('lines', 'rects', 'ellipses', 'polygons', 'paths')
+#endregion
+
+#region class definitions
+class SceneFile:
+    def __init__(self):
+        """
+        A scene in a compact file: one float table per kind of item (see ITEM_COLUMNS), and for each table a matching
+        (n, 2) int table of the item's pen and brush as indices into the file's list of pens and brushes (-1 for
+        none).  Items drawn with the same pen share one entry, so styles cost almost nothing however many items there
+        are.  The lists of styles, the grid, the scene rect and the roles of items (e.g. which link is the crank) go in
+        a small JSON header.  All of it is written with numpy.savez_compressed, so a file reads back as a few arrays
+        instead of one record per item.
+
+        Build a file with add, addPen and addBrush and write it with save, or read one with load.
+        """
+        #kind -> list of rows while building, an (n, len(ITEM_COLUMNS[kind])) array once loaded or saved
+        self.tables = {kind: [] for kind in ITEM_COLUMNS}
+        #kind -> pen and brush indices of each row, same layout
+        self.styles = {kind: [] for kind in ITEM_COLUMNS}
+        #polygon corners, (n, 2)
+        self.points = []
+        self.pointCount = 0
+        self.pathData = qtc.QByteArray()
+        self.pathStream = None
+        self.pens = []
+        self.brushes = []
+        #(name, QPen or QBrush, index) of the styles added so far, so equal pens and brushes are stored once.  A scene
+        #has few distinct styles, so they are looked up by comparing with each in turn.
+        self.styleIndex = []
+        #role name (e.g. 'link1') -> (kind, row)
+        self.roles = {}
+        #dict(rect, dx, dy, pen, brush) or None
+        self.grid = None
+        self.sceneRect = None
+
+    def __len__(self):
+        return sum(len(self.tables[kind]) for kind in ITEM_COLUMNS)
+
+    def add(self, kind, row, pen=-1, brush=-1, role=None):
+        """
+        Adds an item.
+        :param kind: a key of ITEM_COLUMNS
+        :param row: the item's values in the order of ITEM_COLUMNS[kind]
+        :param pen: index from addPen, or -1
+        :param brush: index from addBrush, or -1
+        :param role: optional name the item is loaded back under
+        :return: the item's row
+        """
+        self.tables[kind].append(row)
+        self.styles[kind].append((pen, brush))
+        if role is not None:
+            self.roles[role] = (kind, len(self.tables[kind]) - 1)
+        return len(self.tables[kind]) - 1
+
+    def addPolygon(self, polygon, z=0.0, pen=-1, brush=-1):
+        """
+        :param polygon: a QPolygonF in scene coordinates
+        """
+        first = self.pointCount
+        self.points.extend((p.x(), p.y()) for p in polygon)
+        self.pointCount = len(self.points)
+        return self.add('polygons', (first, polygon.count(), z), pen, brush)
+
+    def addPath(self, path, z=0.0, pen=-1, brush=-1):
+        """
+        :param path: a QPainterPath in scene coordinates
+        """
+        if self.pathStream is None:
+            self.pathStream = qtc.QDataStream(self.pathData, qtc.QIODevice.WriteOnly)
+        self.pathStream << path
+        return self.add('paths', (z,), pen, brush)
+
+    def addPen(self, pen, name=None):
+        """
+        :param pen: a QPen or None
+        :param name: the window attribute the pen is, if it is one (e.g. 'penLink')
+        :return: the pen's index, -1 for None
+        """
+        return -1 if pen is None else self.addStyle(self.pens, pen, name, penToDict)
+
+    def addBrush(self, brush, name=None):
+        """
+        :param brush: a QBrush or None
+        :param name: the window attribute the brush is, if it is one (e.g. 'brushPivot')
+        :return: the brush's index, -1 for None
+        """
+        return -1 if brush is None else self.addStyle(self.brushes, brush, name, brushToDict)
+
+    def addStyle(self, styles, value, name, toDict):
+        for styleName, style, index in self.styleIndex:
+            if styleName == name and type(style) is type(value) and style == value:
+                return index
+        index = len(styles)
+        styles.append(toDict(value, name))
+        self.styleIndex.append((name, type(value)(value), index))
+        return index
+
+    def setGrid(self, rect, dx, dy, pen=-1, brush=-1):
+        self.grid = {'rect': [rect.left(), rect.top(), rect.width(), rect.height()], 'dx': dx, 'dy': dy, 'pen': pen,
+                     'brush': brush}
+
+    def save(self, path):
+        """
+        Writes the file.  The name is used as given (numpy would otherwise add .npz).
+        """
+        header = {'version': SCENE_FILE_VERSION, 'pens': self.pens, 'brushes': self.brushes, 'roles': self.roles,
+                  'grid': self.grid, 'sceneRect': self.sceneRect}
+        arrays = {'header': np.frombuffer(json.dumps(header).encode(), dtype=np.uint8),
+                  'points': np.array(self.points, dtype=float).reshape(-1, 2),
+                  'pathData': np.frombuffer(bytes(self.pathData), dtype=np.uint8)}
+        for kind, columns in ITEM_COLUMNS.items():
+            arrays[kind] = np.array(self.tables[kind], dtype=float).reshape(-1, len(columns))
+            arrays[kind + 'Styles'] = np.array(self.styles[kind], dtype=np.int32).reshape(-1, 2)
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a file written by save.
+        :return: a SceneFile whose tables and styles are numpy arrays
+        """
+        sceneFile = cls()
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(data['header'].tobytes().decode())
+            if header['version'] > SCENE_FILE_VERSION:
+                raise ValueError("{} is a version {} scene file, newer than this program reads".format(
+                    path, header['version']))
+            for kind in ITEM_COLUMNS:
+                sceneFile.tables[kind] = data[kind]
+                sceneFile.styles[kind] = data[kind + 'Styles']
+            sceneFile.points = data['points']
+            sceneFile.pathData = qtc.QByteArray(data['pathData'].tobytes())
+        sceneFile.pens = header['pens']
+        sceneFile.brushes = header['brushes']
+        sceneFile.roles = {role: (kind, int(row)) for role, (kind, row) in header['roles'].items()}
+        sceneFile.grid = header['grid']
+        sceneFile.sceneRect = header['sceneRect']
+        return sceneFile
+
+    def missingRoles(self, roles):
+        """
+        :param roles: dict of role -> the kind of item it has to be, e.g. {'pivot0': 'pivots', 'link1': 'links'}
+        :return: the roles the file does not name an item of that kind for, in the order of roles
+        """
+        return [role for role, kind in roles.items()
+                if self.roles.get(role, (None, 0))[0] != kind or not 0 <= self.roles[role][1] < len(self.tables[kind])]
+
+    def makeStyles(self, named=None):
+        """
+        Builds the QPen and QBrush objects of the file, one per entry, so the items that shared a pen when saved
+        share one again.  A style saved under a name that is in named is applied to that object in place and the
+        object is used, so e.g. MainWindow.applyStyle keeps working on the window's own pens after a load.
+        :param named: dict of name -> QPen or QBrush, e.g. vars(window)
+        :return: list of QPen, list of QBrush
+        """
+        named = {} if named is None else named
+        pens = [penFromDict(style, named.get(style.get('name'))) for style in self.pens]
+        brushes = [brushFromDict(style, named.get(style.get('name'))) for style in self.brushes]
+        return pens, brushes
+
+    def paths(self):
+        """
+        :return: a generator of the QPainterPaths of the paths table, in row order
+        """
+        stream = qtc.QDataStream(self.pathData, qtc.QIODevice.ReadOnly)
+        for i in range(len(self.tables['paths'])):
+            path = qtg.QPainterPath()
+            stream >> path
+            yield path
+#endregion
+
+#region function definitions
+def penToDict(pen, name=None):
+    style = {'color': pen.color().name(qtg.QColor.HexArgb), 'width': pen.widthF(), 'style': int(pen.style()),
+             'cap': int(pen.capStyle()), 'join': int(pen.joinStyle()), 'cosmetic': pen.isCosmetic()}
+    if name is not None:
+        style['name'] = name
+    return style
+
+def penFromDict(style, pen=None):
+    """
+    :param pen: a QPen to set, or None for a new one
+    :return: the pen
+    """
+    pen = qtg.QPen() if not isinstance(pen, qtg.QPen) else pen
+    pen.setColor(qtg.QColor(style['color']))
+    pen.setWidthF(style['width'])
+    pen.setStyle(qtc.Qt.PenStyle(style['style']))
+    pen.setCapStyle(qtc.Qt.PenCapStyle(style['cap']))
+    pen.setJoinStyle(qtc.Qt.PenJoinStyle(style['join']))
+    pen.setCosmetic(style['cosmetic'])
+    return pen
+
+def brushToDict(brush, name=None):
+    """
+    Only the colour and the pattern are kept; gradient and texture brushes come back as their colour.
+    """
+    brushStyle = brush.style()
+    if brushStyle in (qtc.Qt.LinearGradientPattern, qtc.Qt.RadialGradientPattern, qtc.Qt.ConicalGradientPattern,
+                      qtc.Qt.TexturePattern):
+        brushStyle = qtc.Qt.SolidPattern
+    style = {'color': brush.color().name(qtg.QColor.HexArgb), 'style': int(brushStyle)}
+    if name is not None:
+        style['name'] = name
+    return style
+
+def brushFromDict(style, brush=None):
+    """
+    :param brush: a QBrush to set, or None for a new one
+    :return: the brush
+    """
+    brush = qtg.QBrush() if not isinstance(brush, qtg.QBrush) else brush
+    brush.setColor(qtg.QColor(style['color']))
+    brush.setStyle(qtc.Qt.BrushStyle(style['style']))
+    return brush
+#endregion
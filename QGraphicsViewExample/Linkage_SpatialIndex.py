@@ -0,0 +1,163 @@
+#region imports
+import math
+#endregion
+
+#region class definitions
+class SpatialGrid:
+    def __init__(self, cellSize=20.0):
+        """
+        A uniform grid index of points (joints) and thick segments (links) for answering "what is under the cursor"
+        without looking at everything in the scene.  Each entry is filed under the grid cells its shape overlaps, so a
+        query only looks at the entries in the few cells around the query point.  Moving an entry only re-files it
+        when the set of cells it covers changes, which for small moves is usually not at all.
+        :param cellSize: cell width and height in scene units.  About the size of a link is a good choice.
+        """
+        self.cellSize = cellSize
+        self.cells = {}
+        #key -> (shape, cells) where shape is (x, y) for a point or (x0, y0, x1, y1, radius) for a segment
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def cellRange(self, left, top, right, bottom):
+        s = self.cellSize
+        return [(i, j) for i in range(math.floor(left / s), math.floor(right / s) + 1)
+                for j in range(math.floor(top / s), math.floor(bottom / s) + 1)]
+
+    def setPoint(self, key, x, y):
+        """
+        Adds a point or moves it.  A point is in the one cell that holds it.
+        """
+        s = self.cellSize
+        self.file(key, (x, y), [(math.floor(x / s), math.floor(y / s))])
+
+    def setSegment(self, key, x0, y0, x1, y1, radius=0.0):
+        """
+        Adds a segment or moves it.  The segment is filed under the cells of its bounding box grown by radius.
+        :param radius: half the thickness of the segment (a link's end radius)
+        """
+        self.file(key, (x0, y0, x1, y1, radius),
+                  self.cellRange(min(x0, x1) - radius, min(y0, y1) - radius, max(x0, x1) + radius,
+                                 max(y0, y1) + radius))
+
+    def file(self, key, shape, cells):
+        old = self.entries.get(key)
+        if old is not None and old[1] == cells:
+            self.entries[key] = (shape, old[1])
+            return
+        if old is not None:
+            self.unfile(key, old[1])
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(key)
+        self.entries[key] = (shape, cells)
+
+    def unfile(self, key, cells):
+        for cell in cells:
+            bucket = self.cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def remove(self, key):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.unfile(key, old[1])
+
+    def distance(self, key, x, y):
+        """
+        :return: distance from x, y to the point, or to the edge of the thick segment (0 inside it)
+        """
+        shape = self.entries[key][0]
+        if len(shape) == 2:
+            return math.hypot(x - shape[0], y - shape[1])
+        x0, y0, x1, y1, radius = shape
+        dx = x1 - x0
+        dy = y1 - y0
+        lengthSquared = dx * dx + dy * dy
+        t = 0.0 if lengthSquared == 0.0 else max(0.0, min(1.0, ((x - x0) * dx + (y - y0) * dy) / lengthSquared))
+        return max(math.hypot(x - x0 - t * dx, y - y0 - t * dy) - radius, 0.0)
+
+    def query(self, x, y, tolerance=0.0, kind=None):
+        """
+        Finds the entries within tolerance of x, y.
+        :param x: scene x
+        :param y: scene y
+        :param tolerance: search radius in scene units
+        :param kind: only points ('point') or only segments ('segment'), default both
+        :return: list of (distance, key), nearest first
+        """
+        found = set()
+        for cell in self.cellRange(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+            found.update(self.cells.get(cell, ()))
+        hits = []
+        for key in found:
+            if kind is not None and (len(self.entries[key][0]) == 2) != (kind == 'point'):
+                continue
+            d = self.distance(key, x, y)
+            if d <= tolerance:
+                hits.append((d, key))
+        hits.sort(key=lambda hit: hit[0])
+        return hits
+
+    def nearest(self, x, y, tolerance, kind=None):
+        """
+        :return: the key of the nearest entry within tolerance, or None
+        """
+        hits = self.query(x, y, tolerance, kind)
+        return hits[0][1] if hits else None
+#endregion
+
+#region function definitions
+def mergeJoints(links, pivots=(), tolerance=1e-6):
+    """
+    Finds the joints of a linkage drawn as RigidLink and RigidPivotPoint items: link end points closer than tolerance
+    are one joint, and a joint at a pivot is fixed to the ground.  End points are hashed to a grid of cells tolerance
+    wide and only the cells around a point are searched for a joint to merge it with, so this is one pass over the
+    items with no numpy.  A point is merged with the nearest joint found within tolerance of it, measured from the
+    first end point that made the joint.  Linkage_Mechanism.Mechanism.fromItems builds its model
+    from the result, and MainWindow.spatialIndex its hit test index, so both number the joints the same way.
+    :param links: RigidLink items
+    :param pivots: RigidPivotPoint items
+    :param tolerance: distance at which end points are merged into one joint
+    :return: (positions, fixed, starts, ends): a list of (x, y) and a list of bool per joint, and the start and end
+    joint of each link
+    """
+    #cell -> joints in it
+    cells = {}
+    positions = []
+    fixed = []
+
+    def jointAt(x, y):
+        #a joint within tolerance is in this cell or one of the eight around it
+        i = round(x / tolerance)
+        j = round(y / tolerance)
+        best = None
+        bestDistance = tolerance
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for joint in cells.get((i + di, j + dj), ()):
+                    jx, jy = positions[joint]
+                    d = math.hypot(x - jx, y - jy)
+                    if d <= bestDistance:
+                        best = joint
+                        bestDistance = d
+        if best is None:
+            best = len(positions)
+            cells.setdefault((i, j), []).append(best)
+            positions.append((x, y))
+            fixed.append(False)
+        return best
+
+    for pivot in pivots:
+        fixed[jointAt(pivot.x, pivot.y)] = True
+    starts = []
+    ends = []
+    for link in links:
+        starts.append(jointAt(link.startX, link.startY))
+        ends.append(jointAt(link.endX, link.endY))
+    return positions, fixed, starts, ends
+#endregion
@@ -0,0 +1,173 @@
+#region imports
+import json
+import os
+import numpy as np
+#endregion
+
+#region constants
+#bytes reserved for the .npy preamble and header, so that the final shape can be written over the placeholder
+NPY_HEADER_SIZE = 256
+#the file in a MotionDataset folder that describes it
+HEADER_NAME = 'header.json'
+#endregion
+
+#region class definitions
+class NpyStreamWriter:
+    def __init__(self, path, width, dtype='<f8'):
+        """
+        Writes a 2-D array to a .npy file a block of rows at a time, so a long run never has to be held in memory.
+        The header is written first with room to spare and rewritten with the real number of rows on close, so the
+        result is an ordinary .npy file that np.load(path, mmap_mode='r') opens without reading it.
+        :param path: file to write
+        :param width: number of columns, or None for a 1-D array
+        :param dtype: numpy dtype of the array
+        """
+        self.path = path
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self.file = open(path, 'wb')
+        self.file.write(npyHeader(self.dtype, self.shape()))
+
+    def shape(self):
+        return (self.rows,) if self.width is None else (self.rows, self.width)
+
+    def append(self, rows):
+        """
+        :param rows: array-like of shape (n, width), or (width,) for one row.  Any shape of n values for a 1-D array.
+        """
+        rows = np.asarray(rows, dtype=self.dtype).reshape(-1 if self.width is None else (-1, self.width))
+        self.file.write(np.ascontiguousarray(rows).tobytes())
+        self.rows += len(rows)
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(npyHeader(self.dtype, self.shape()))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+class MotionDataset:
+    def __init__(self, folder):
+        """
+        A stored motion, e.g. the poses of a long animation or a design sweep, opened without reading it.  A dataset
+        is a folder holding header.json and one .npy file per column.  The header lists the columns and the number of
+        rows and carries metadata such as the link lengths and pivot positions (see MotionDatasetWriter).  Every column
+        is memory-mapped, so opening takes the same few milliseconds whatever the size, and reading a frame only
+        touches the pages that hold it.  Storing columns separately means a reader that only needs, say, xA and yA
+        never pages in the rest.
+        :param folder: the dataset folder
+        """
+        self.folder = folder
+        with open(os.path.join(folder, HEADER_NAME)) as f:
+            self.header = json.load(f)
+        self.columns = tuple(self.header['columns'])
+        self.metadata = self.header.get('metadata', {})
+        self.arrays = {name: np.load(os.path.join(folder, name + '.npy'), mmap_mode='r') for name in self.columns}
+
+    @classmethod
+    def create(cls, folder, columns, metadata=None, dtype='<f8'):
+        """
+        :return: a MotionDatasetWriter for a new dataset in folder
+        """
+        return MotionDatasetWriter(folder, columns, metadata, dtype)
+
+    def __len__(self):
+        return self.header['rows']
+
+    def __getitem__(self, name):
+        """
+        :return: the memory-mapped column
+        """
+        return self.arrays[name]
+
+    def frame(self, index, names=None):
+        """
+        Reads one row.
+        :param index: row index
+        :param names: columns to read, defaults to all
+        :return: tuple of floats in the order of names
+        """
+        return tuple(float(self.arrays[name][index]) for name in (self.columns if names is None else names))
+
+    def fourBar(self):
+        """
+        :return: the FourBar stored in the metadata (see MotionDatasetWriter), or None
+        """
+        if 'fourBar' not in self.metadata:
+            return None
+        from Linkage_Kinematics import FourBar
+        return FourBar(**self.metadata['fourBar'])
+
+class MotionDatasetWriter:
+    def __init__(self, folder, columns, metadata=None, dtype='<f8'):
+        """
+        Streams rows into a new MotionDataset, one NpyStreamWriter per column.  header.json is written on close, so an
+        unfinished dataset does not open.  Same append interface as NpyStreamWriter, so either can be handed to
+        TrajectoryRecorder.
+        :param folder: folder for the dataset, created if needed
+        :param columns: column names
+        :param metadata: json-serializable dict stored in the header.  A 'fourBar' entry holding FourBar's constructor
+        arguments (see fourBarMetadata) lets MotionDataset.fourBar rebuild the linkage.
+        :param dtype: numpy dtype of every column
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.columns = tuple(columns)
+        self.metadata = {} if metadata is None else metadata
+        self.dtype = np.dtype(dtype)
+        self.writers = [NpyStreamWriter(os.path.join(folder, name + '.npy'), None, dtype) for name in self.columns]
+        self.rows = 0
+
+    def append(self, rows):
+        """
+        :param rows: array-like of shape (n, len(columns)), or (len(columns),) for one row
+        """
+        rows = np.asarray(rows).reshape(-1, len(self.columns))
+        for i, writer in enumerate(self.writers):
+            writer.append(rows[:, i])
+        self.rows += len(rows)
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+        header = {'columns': list(self.columns), 'rows': self.rows, 'dtype': self.dtype.str, 'metadata': self.metadata}
+        with open(os.path.join(self.folder, HEADER_NAME), 'w') as f:
+            json.dump(header, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+#endregion
+
+#region function definitions
+def fourBarMetadata(fourBar):
+    """
+    :return: the link lengths, pivot positions and branch of a FourBar as a dict for a MotionDataset header
+    """
+    names = ('pivot0X', 'pivot0Y', 'pivot1X', 'pivot1Y', 'l1', 'l2', 'l3', 'branch')
+    return {name: float(getattr(fourBar, name)) if name != 'branch' else int(fourBar.branch) for name in names}
+
+def npyHeader(dtype, shape):
+    """
+    Builds a version 1.0 .npy preamble and header padded to NPY_HEADER_SIZE bytes.
+    :param dtype: numpy dtype
+    :param shape: tuple
+    :return: bytes
+    """
+    header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(np.dtype(dtype).str, tuple(shape))
+    #magic, version and the header length take 10 bytes and the header ends with a newline
+    padding = NPY_HEADER_SIZE - 10 - len(header) - 1
+    if padding < 0:
+        raise ValueError("npy header does not fit in {} bytes".format(NPY_HEADER_SIZE))
+    header += ' ' * padding + '\n'
+    return b'\x93NUMPY\x01\x00' + (len(header)).to_bytes(2, 'little') + header.encode('latin1')
+#endregion
@@ -0,0 +1,338 @@
+#region imports
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import sys
+import time
+import warnings
+import numpy as np
+from Linkage_Explorer import PARAMETERS
+from Linkage_Kinematics import CROSSED, FourBar, OPEN
+#endregion
+
+#region constants
+#the design variables of a path synthesis: the four-bar's, then the coupler point (see FourBarPoses.couplerPoint)
+PATH_PARAMETERS = PARAMETERS + ('couplerAlong', 'couplerOffset')
+#where the design variables are sampled and kept, unless a synthesis is given other bounds.  The pivots stay in the
+#scene rect of GraphicsView_App.
+DEFAULT_BOUNDS = {'pivot0X': (-200.0, 200.0), 'pivot0Y': (-200.0, 200.0), 'pivot1X': (-200.0, 200.0),
+                  'pivot1Y': (-200.0, 200.0), 'l1': (10.0, 300.0), 'l2': (10.0, 300.0), 'l3': (10.0, 300.0),
+                  'couplerAlong': (-1.0, 2.0), 'couplerOffset': (-150.0, 150.0)}
+#cost of a candidate that cannot be assembled anywhere it is needed.  Finite, so the simplex can still compare two
+#such candidates by their other penalties.
+UNASSEMBLED_COST = 1e6
+#random candidates screened at once, which bounds the memory of one batch to a few MB
+SCREEN_BATCH = 500
+#endregion
+
+#region class definitions
+class PathTarget:
+    def __init__(self, points, resolutionDeg=2.0, branch=OPEN, fullRotation=True):
+        """
+        Path generation: a coupler point that passes through precision points, in any order and at whatever crank
+        angles it gets there.  The cost of a candidate is the root mean square of each point's distance to the
+        coupler curve, with the curve sampled over a whole crank revolution in one solveBatch.
+        :param points: (k, 2) array-like of precision points in scene coordinates
+        :param resolutionDeg: crank angle step of the sampled curve in degrees
+        :param branch: OPEN or CROSSED
+        :param fullRotation: penalize candidates whose crank cannot turn all the way round
+        """
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.theta2 = np.deg2rad(np.arange(0.0, 360.0, resolutionDeg))[np.newaxis, :]
+        self.branch = branch
+        self.fullRotation = fullRotation
+        self.parameters = PATH_PARAMETERS
+        #a missed revolution costs as much as missing every point by the size of the target
+        extent = np.ptp(self.points, axis=0).max() if len(self.points) > 1 else 1.0
+        self.rotationPenalty = max(extent, 1.0)
+
+    def cost(self, candidates):
+        """
+        :param candidates: (n, len(PATH_PARAMETERS)) array
+        :return: (n,) array of costs in scene units
+        """
+        columns = [candidates[:, i:i + 1] for i in range(len(PATH_PARAMETERS))]
+        poses = FourBar(*columns[:len(PARAMETERS)], branch=self.branch).solveBatch(self.theta2)
+        cx, cy = poses.couplerPoint(columns[-2], columns[-1])
+        #squared distance of every sample of every curve to every point: (n, samples, k)
+        d2 = (cx[:, :, np.newaxis] - self.points[:, 0]) ** 2 + (cy[:, :, np.newaxis] - self.points[:, 1]) ** 2
+        d2 = np.where(np.isfinite(d2), d2, np.inf)
+        cost = np.sqrt(d2.min(axis=1).mean(axis=1))
+        if self.fullRotation:
+            cost = cost + self.rotationPenalty * (1.0 - poses.valid.mean(axis=1))
+        return np.where(np.isfinite(cost), cost, UNASSEMBLED_COST)
+
+class FunctionTarget:
+    def __init__(self, theta2, theta4, branch=OPEN, relative=False, fullRotation=True, resolutionDeg=2.0):
+        """
+        Function generation: the rocker (link3) angle as a function of the crank (link1) angle.  The cost of a
+        candidate is the root mean square of the rocker angle errors at the target crank angles, all solved in one
+        solveBatch.  Angles are the link angles of GraphicsView_App (counter-clockwise as seen on screen).
+        :param theta2: target crank angles in radians
+        :param theta4: the rocker angles wanted at them, in radians
+        :param branch: OPEN or CROSSED
+        :param relative: match the rocker's turn from the first target instead of its absolute angle, so the frame
+        of the linkage is free
+        :param fullRotation: penalize candidates whose crank cannot turn all the way round
+        :param resolutionDeg: crank angle step of the full rotation check in degrees
+        """
+        self.theta2 = np.asarray(theta2, dtype=float).ravel()[np.newaxis, :]
+        self.theta4 = np.asarray(theta4, dtype=float).ravel()[np.newaxis, :]
+        if self.theta2.shape != self.theta4.shape:
+            raise ValueError("FunctionTarget needs as many rocker angles as crank angles")
+        self.branch = branch
+        self.relative = relative
+        self.fullRotation = fullRotation
+        self.revolution = np.deg2rad(np.arange(0.0, 360.0, resolutionDeg))[np.newaxis, :]
+        self.parameters = PARAMETERS
+
+    def cost(self, candidates):
+        """
+        :param candidates: (n, len(PARAMETERS)) array
+        :return: (n,) array of costs in radians
+        """
+        fourBar = FourBar(*[candidates[:, i:i + 1] for i in range(len(PARAMETERS))], branch=self.branch)
+        theta4 = fourBar.solveBatch(self.theta2).theta4
+        target = self.theta4
+        if self.relative:
+            theta4 = theta4 - theta4[:, :1]
+            target = target - target[:, :1]
+        error = np.mod(theta4 - target + np.pi, 2.0 * np.pi) - np.pi
+        #a target the linkage cannot reach counts as the largest possible miss
+        error = np.where(np.isfinite(error), error, np.pi)
+        cost = np.sqrt((error ** 2).mean(axis=1))
+        if self.fullRotation:
+            cost = cost + np.pi * (1.0 - fourBar.solveBatch(self.revolution).valid.mean(axis=1))
+        return cost
+
+class SynthesisResult:
+    def __init__(self, parameters, values, cost, starts, evaluations, seconds, stopped=None, branch=OPEN):
+        """
+        The best design found by synthesize.
+        :param parameters: names of the design variables
+        :param values: their values
+        :param cost: its cost (see PathTarget.cost and FunctionTarget.cost)
+        :param starts: random starts refined
+        :param evaluations: candidates evaluated in all
+        :param seconds: wall time
+        :param stopped: 'tolerance' or 'timeout' if the search was cut short, else None
+        :param branch: the assembly branch (OPEN or CROSSED) of the target the design was found for
+        """
+        self.values = dict(zip(parameters, (float(v) for v in values)))
+        self.cost = float(cost)
+        self.starts = starts
+        self.evaluations = evaluations
+        self.seconds = seconds
+        self.stopped = stopped
+        self.branch = branch
+
+    def fourBar(self, branch=None):
+        """
+        :param branch: defaults to the branch the design was found on, the only one it is known to meet the target on
+        :return: the design as a FourBar, e.g. for MainWindow.loadFourBar
+        """
+        return FourBar(*[self.values[name] for name in PARAMETERS], branch=self.branch if branch is None else branch)
+
+    def couplerPoint(self):
+        """
+        :return: (along, offset) of the coupler point of a path synthesis, or None
+        """
+        if 'couplerAlong' not in self.values:
+            return None
+        return self.values['couplerAlong'], self.values['couplerOffset']
+#endregion
+
+#region function definitions
+def boundsArrays(parameters, bounds=None):
+    """
+    :param bounds: dict of name -> (low, high) that overrides DEFAULT_BOUNDS
+    :return: low, high arrays in the order of parameters
+    """
+    merged = dict(DEFAULT_BOUNDS)
+    merged.update(bounds or {})
+    low = np.array([merged[name][0] for name in parameters], dtype=float)
+    high = np.array([merged[name][1] for name in parameters], dtype=float)
+    return low, high
+
+def runStarts(target, low, high, seed, samples, starts, maxEvaluations=3000, tolerance=None):
+    """
+    One task of a synthesis.  Screens samples random candidates inside the bounds in a few vectorized batches, then
+    refines the best starts of them with Nelder-Mead.  The simplex works in the unit box of the bounds, so every
+    design variable moves on the same scale; a candidate outside the bounds is clamped to them and pays for the
+    distance.
+    :param target: a PathTarget or FunctionTarget
+    :param low: lower bounds of the design variables
+    :param high: upper bounds
+    :param seed: random seed (an int or numpy SeedSequence)
+    :param samples: random candidates to screen
+    :param starts: best candidates to refine
+    :param maxEvaluations: evaluations per refinement
+    :param tolerance: stop after a start that reaches this cost
+    :return: (cost, values, starts refined, candidates evaluated) of the best design
+    """
+    from scipy import optimize
+    rng = np.random.default_rng(seed)
+    span = high - low
+    with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+        #candidates that do not assemble are nan, which the targets handle
+        warnings.simplefilter('ignore', RuntimeWarning)
+        unit = rng.random((samples, len(low)))
+        screened = np.concatenate([target.cost(low + span * unit[i:i + SCREEN_BATCH])
+                                   for i in range(0, samples, SCREEN_BATCH)])
+        evaluations = samples
+        best = (np.inf, None)
+        refined = 0
+        for index in np.argsort(screened)[:starts]:
+            def cost(u):
+                clamped = np.clip(u, 0.0, 1.0)
+                outside = np.abs(u - clamped).sum()
+                return float(target.cost((low + span * clamped)[np.newaxis, :])[0]) + UNASSEMBLED_COST * outside
+            result = optimize.minimize(cost, unit[index], method='Nelder-Mead',
+                                       options={'maxfev': maxEvaluations, 'xatol': 1e-6, 'fatol': 1e-9,
+                                                'adaptive': True})
+            evaluations += result.nfev
+            refined += 1
+            if result.fun < best[0]:
+                best = (result.fun, low + span * np.clip(result.x, 0.0, 1.0))
+            if tolerance is not None and best[0] <= tolerance:
+                break
+    return best[0], best[1], refined, evaluations
+
+def synthesize(target, bounds=None, starts=64, startsPerTask=4, samplesPerStart=500, workers=None,
+               maxEvaluations=3000, tolerance=None, timeout=None, seed=None, progress=None):
+    """
+    Searches for the four-bar that best meets a target from many random starts, across a process pool.  Each task
+    screens a batch of random candidates and refines the best few (see runStarts); a few tasks per worker are in
+    flight at a time.  The search is cut short once a design within tolerance is found or the timeout has passed:
+    the tasks not yet started are cancelled and the ones running are terminated with the worker processes (see
+    terminatePool), so it returns at the deadline rather than when the last task finishes.  No QApplication is
+    needed.
+    :param target: a PathTarget or FunctionTarget
+    :param bounds: dict of name -> (low, high) overriding DEFAULT_BOUNDS
+    :param starts: random starts to refine in all
+    :param startsPerTask: starts refined per task
+    :param samplesPerStart: random candidates screened per start
+    :param workers: number of processes, defaults to os.cpu_count()
+    :param maxEvaluations: evaluations per refinement
+    :param tolerance: stop once a design's cost is at most this
+    :param timeout: stop after this many seconds, with the best design finished by then
+    :param seed: random seed, for repeatable searches
+    :param progress: optional callable(startsDone, startsTotal, bestCost)
+    :return: a SynthesisResult
+    """
+    workers = os.cpu_count() if workers is None else workers
+    low, high = boundsArrays(target.parameters, bounds)
+    tasks = math.ceil(starts / startsPerTask)
+    seeds = iter(np.random.SeedSequence(seed).spawn(tasks))
+    t0 = time.perf_counter()
+    best = (np.inf, None)
+    done = 0
+    evaluations = 0
+    stopped = None
+    pending = set()
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        submitted = 0
+        while True:
+            while stopped is None and submitted < tasks and len(pending) < 2 * workers:
+                count = min(startsPerTask, starts - submitted * startsPerTask)
+                pending.add(pool.submit(runStarts, target, low, high, next(seeds), count * samplesPerStart, count,
+                                        maxEvaluations, tolerance))
+                submitted += 1
+            if not pending:
+                break
+            remaining = None if timeout is None else max(t0 + timeout - time.perf_counter(), 0.0)
+            finished, pending = concurrent.futures.wait(pending, timeout=remaining,
+                                                        return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                cost, values, refined, evaluated = future.result()
+                done += refined
+                evaluations += evaluated
+                if cost < best[0]:
+                    best = (cost, values)
+            if progress is not None:
+                progress(done, starts, best[0])
+            if stopped is None and tolerance is not None and best[0] <= tolerance:
+                stopped = 'tolerance'
+            elif stopped is None and timeout is not None and time.perf_counter() - t0 >= timeout:
+                stopped = 'timeout'
+            if stopped is not None:
+                break
+    finally:
+        if pending:
+            #stopped early, or by an exception: the results of the tasks left are not wanted
+            terminatePool(pool)
+        else:
+            pool.shutdown()
+    if best[1] is None:
+        raise RuntimeError("synthesis finished no start" + ("" if stopped is None else " before the " + stopped))
+    return SynthesisResult(target.parameters, best[1], best[0], done, evaluations, time.perf_counter() - t0, stopped,
+                           target.branch)
+
+def terminatePool(pool):
+    """
+    Stops a ProcessPoolExecutor now: the tasks not started are cancelled and the worker processes are terminated
+    with the tasks they are running, instead of shutdown waiting for those to finish.
+    ProcessPoolExecutor.terminate_workers does this from Python 3.14; before that the processes are reached through
+    the executor's _processes.
+    :param pool: a ProcessPoolExecutor
+    """
+    terminate = getattr(pool, 'terminate_workers', None)
+    if terminate is not None:
+        terminate()
+        return
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+def parsePair(text):
+    """
+    Parses a command line pair 'a,b'.
+    """
+    parts = text.split(',')
+    if len(parts) != 2:
+        raise argparse.ArgumentTypeError("expected a,b, got " + text)
+    return float(parts[0]), float(parts[1])
+#endregion
+
+#region function calls
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Synthesize a four-bar for GraphicsView_App: a coupler point through "
+                                                 "precision points, or a rocker angle as a function of the crank "
+                                                 "angle.  Prints the design as JSON, for MainWindow.loadFourBar.")
+    targets = parser.add_mutually_exclusive_group(required=True)
+    targets.add_argument('--points', type=parsePair, nargs='+', help="precision points x,y in scene coordinates")
+    targets.add_argument('--function', type=parsePair, nargs='+',
+                         help="crank,rocker angle pairs in degrees (counter-clockwise as seen on screen)")
+    parser.add_argument('--relative', action='store_true', help="match rocker turns rather than absolute angles")
+    parser.add_argument('--crossed', action='store_true', help="synthesize on the crossed branch")
+    parser.add_argument('--partial', action='store_true', help="allow cranks that cannot turn all the way round")
+    parser.add_argument('--starts', type=int, default=64)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--tolerance', type=float, default=None, help="stop at a design with this cost or less")
+    parser.add_argument('--timeout', type=float, default=None, help="stop after this many seconds")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    branch = CROSSED if args.crossed else OPEN
+    if args.points is not None:
+        goal = PathTarget(args.points, branch=branch, fullRotation=not args.partial)
+    else:
+        angles = np.radians(np.array(args.function))
+        goal = FunctionTarget(angles[:, 0], angles[:, 1], branch=branch, relative=args.relative,
+                              fullRotation=not args.partial)
+
+    def report(done, total, bestCost):
+        print("\r{} / {} starts, best cost {:0.6g}".format(done, total, bestCost), end='', file=sys.stderr)
+    found = synthesize(goal, starts=args.starts, workers=args.workers, tolerance=args.tolerance, timeout=args.timeout,
+                       seed=args.seed, progress=report)
+    print("\n{} starts and {} evaluations in {:0.2f} s{}".format(
+        found.starts, found.evaluations, found.seconds, "" if found.stopped is None else ", stopped: " + found.stopped),
+        file=sys.stderr)
+    print(json.dumps(dict(found.values, cost=found.cost, branch=found.branch), indent=2))
+#endregion